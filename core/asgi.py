@@ -12,5 +12,8 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+# As views async das páginas de leitura (website/async_views.py) são opcionais:
+# ASYNC_VIEWS=1 uvicorn core.asgi:application
+os.environ.setdefault('ASYNC_VIEWS', '0')
 
 application = get_asgi_application()
@@ -0,0 +1,90 @@
+"""
+Perfis de base de dados, escolhidos pela variável de ambiente DB_PROFILE.
+ImigrAIMA - usado em core/settings.py (DATABASES = database_settings(BASE_DIR)).
+
+Perfis:
+    sqlite          (por omissão) SQLite afinado para vários pedidos em simultâneo:
+                    WAL (leitores não bloqueiam o escritor), synchronous=NORMAL,
+                    busy_timeout (espera pelo lock em vez de falhar logo), mmap e
+                    transações BEGIN IMMEDIATE (o lock de escrita é pedido no início,
+                    onde o busy_timeout se aplica, e não a meio da transação).
+    sqlite-basic    SQLite com as opções de origem do Django (para comparar no benchmark).
+    postgres        PostgreSQL com ligações persistentes (CONN_MAX_AGE) e health checks.
+    postgres-pool   PostgreSQL com pool de ligações do psycopg (requer psycopg[pool]).
+                    Nos perfis postgres a pesquisa usa o DatabaseLikeBackend (ver
+                    SEARCH_BACKEND e website/search.py): o índice FTS5 só existe em SQLite.
+
+Outras variáveis: DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT, DB_CONN_MAX_AGE,
+DB_BUSY_TIMEOUT_MS, DB_MMAP_BYTES, DB_POOL_MIN, DB_POOL_MAX, DB_POOL_TIMEOUT.
+Benchmark de escrita concorrente: python manage.py bench_db_contention.
+"""
+
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+PROFILES = ('sqlite', 'sqlite-basic', 'postgres', 'postgres-pool')
+
+
+def _int(environ, name, default):
+    value = environ.get(name)
+    if value in (None, ''):
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise ImproperlyConfigured(f"{name} tem de ser um número inteiro (recebido {value!r}).")
+
+
+def sqlite_init_command(busy_timeout_ms, mmap_bytes):
+    """PRAGMAs aplicados a cada ligação nova (OPTIONS['init_command'] do Django)."""
+    return ';'.join([
+        'PRAGMA journal_mode=WAL',
+        'PRAGMA synchronous=NORMAL',
+        f'PRAGMA busy_timeout={busy_timeout_ms}',
+        f'PRAGMA mmap_size={mmap_bytes}',
+        'PRAGMA temp_store=MEMORY',
+    ])
+
+
+def database_settings(base_dir, environ=os.environ):
+    """Dicionário DATABASES para o perfil indicado em DB_PROFILE."""
+    profile = environ.get('DB_PROFILE', 'sqlite')
+    if profile not in PROFILES:
+        raise ImproperlyConfigured(f"DB_PROFILE desconhecido: {profile!r} (use um de {', '.join(PROFILES)}).")
+
+    if profile.startswith('sqlite'):
+        default = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': environ.get('DB_NAME') or base_dir / 'db.sqlite3',
+        }
+        if profile == 'sqlite':
+            busy_timeout_ms = _int(environ, 'DB_BUSY_TIMEOUT_MS', 5000)
+            default['CONN_MAX_AGE'] = _int(environ, 'DB_CONN_MAX_AGE', 60)
+            default['OPTIONS'] = {
+                'init_command': sqlite_init_command(busy_timeout_ms, _int(environ, 'DB_MMAP_BYTES', 128 * 1024 * 1024)),
+                'transaction_mode': 'IMMEDIATE',
+                'timeout': busy_timeout_ms / 1000,
+            }
+        return {'default': default}
+
+    default = {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': environ.get('DB_NAME', 'imigraima'),
+        'USER': environ.get('DB_USER', 'imigraima'),
+        'PASSWORD': environ.get('DB_PASSWORD', ''),
+        'HOST': environ.get('DB_HOST', 'localhost'),
+        'PORT': environ.get('DB_PORT', '5432'),
+        'CONN_HEALTH_CHECKS': True,
+    }
+    if profile == 'postgres':
+        default['CONN_MAX_AGE'] = _int(environ, 'DB_CONN_MAX_AGE', 60)
+    else:
+        # Com pool, as ligações são reutilizadas pelo pool (o Django exige CONN_MAX_AGE = 0)
+        default['CONN_MAX_AGE'] = 0
+        default['OPTIONS'] = {'pool': {
+            'min_size': _int(environ, 'DB_POOL_MIN', 2),
+            'max_size': _int(environ, 'DB_POOL_MAX', 10),
+            'timeout': _int(environ, 'DB_POOL_TIMEOUT', 10),
+        }}
+    return {'default': default}
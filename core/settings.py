@@ -6,6 +6,10 @@ ImigrAIMA - Sistema de Gestão de Imigração
 from pathlib import Path
 from django.contrib.messages import constants as messages
 import os
+import sys
+import tempfile
+
+from .database import database_settings
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -32,6 +36,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Primeiro, para medir o pedido inteiro (só ativo com REQUEST_PROFILING; ver mais abaixo)
+    'website.profiling.RequestProfilingMiddleware',
+    'website.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -41,11 +48,15 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
-ROOT_URLCONF = 'core.urls'
+# Com ASYNC_VIEWS=1 (opcional, sob ASGI: ver core/asgi.py) as páginas de leitura
+# usam as versões async de website/async_views.py
+ASYNC_VIEWS = os.environ.get('ASYNC_VIEWS', '0') == '1'
+ROOT_URLCONF = 'core.urls_asgi' if ASYNC_VIEWS else 'core.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates com medição do tempo de render (website/profiling.py)
+        'BACKEND': 'website.profiling.TimedDjangoTemplates',
         'DIRS': [], # Deixar vazio pois estamos a usar templates dentro da app
         'APP_DIRS': True,
         'OPTIONS': {
@@ -61,12 +72,9 @@ TEMPLATES = [
 WSGI_APPLICATION = 'core.wsgi.application'
 
 # Database
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
-}
+# Perfil escolhido pela variável de ambiente DB_PROFILE (sqlite, sqlite-basic, postgres,
+# postgres-pool); por omissão SQLite com WAL e busy_timeout. Ver core/database.py.
+DATABASES = database_settings(BASE_DIR)
 
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
@@ -95,6 +103,117 @@ MEDIA_ROOT = BASE_DIR / 'media'
 # Limite de Upload (ex: 5MB) para não sobrecarregar
 DATA_UPLOAD_MAX_MEMORY_SIZE = 5242880 
 
+# --- API Pública (Paginação por Cursor) ---
+API_PAGE_SIZE = 10          # Resultados por página quando o cliente não indica page_size
+API_MAX_PAGE_SIZE = 500     # Limite máximo aceite em page_size
+API_STREAM_THRESHOLD = 200  # A partir deste page_size a resposta é enviada em streaming
+
+# --- Dashboard do Utilizador ---
+# True: paginação "anterior/seguinte" sem COUNT(*); False: Paginator clássico do Django
+DASHBOARD_COUNT_FREE_PAGINATION = True
+
+# --- Pesquisa de Processos ---
+# 'website.search.SQLiteFTS5Backend' (índice FTS5) ou 'website.search.DatabaseLikeBackend' (LIKE);
+# None = escolhido pela BD: FTS5 em SQLite, LIKE nas outras (perfis postgres do DB_PROFILE)
+SEARCH_BACKEND = None
+
+# --- Cache de PDFs (Senhas de Agendamento) ---
+# Pasta privada (fora de MEDIA_ROOT e do código) e espaço máximo antes de apagar os menos usados
+PDF_CACHE_DIR = Path(os.environ.get('PDF_CACHE_DIR') or Path(tempfile.gettempdir()) / 'imigraima' / 'tickets')
+PDF_CACHE_MAX_BYTES = 256 * 1024 * 1024  # 256MB
+# Processos que pré-geram as senhas ao marcar o agendamento (0 = gerar no próprio pedido)
+TICKET_RENDER_WORKERS = 2
+# Segundos após os quais uma senha "a gerar" é considerada perdida e gerada no download
+TICKET_RENDER_TIMEOUT = 60
+# Agendamentos carregados por query ao enviar senhas em massa para o pool (aprovações em lote)
+TICKET_PRERENDER_BATCH_SIZE = 200
+
+# --- Agendamentos (Vagas de Atendimento) ---
+APPOINTMENT_LOCATIONS = ["Loja AIMA Lisboa - Campus de Justiça"]
+APPOINTMENT_OPENING_HOURS = ('09:00', '17:00')  # Horário de atendimento
+APPOINTMENT_SLOT_MINUTES = 30                   # Duração de cada vaga
+APPOINTMENT_SLOT_CAPACITY = 4                   # Pessoas atendidas por vaga, em cada local
+APPOINTMENT_LEAD_DAYS = 10                      # Antecedência mínima
+APPOINTMENT_HORIZON_DAYS = 365                  # Até onde se procuram vagas
+
+# --- Ações em Massa do Backoffice (website/transitions.py) ---
+# Processos alterados por transação ao aprovar/rejeitar em massa (transações curtas não bloqueiam o site)
+TRANSITION_CHUNK_SIZE = 500
+
+# --- Exportação de Processos (website/exports.py) ---
+EXPORT_CHUNK_SIZE = 2000  # Linhas lidas da BD de cada vez durante a exportação
+
+# --- Estatísticas do Backoffice (website/analytics.py) ---
+ANALYTICS_DEFAULT_DAYS = 30              # Período mostrado por omissão
+ANALYTICS_MAX_DAYS = 365                 # Período máximo aceite em ?days=
+ANALYTICS_CHUNK_SIZE = 20000             # Linhas lidas da BD por bloco
+ANALYTICS_CACHE_TIMEOUT = 24 * 60 * 60   # Validade (segundos) das métricas de cada dia passado
+
+# --- Normalização das Imagens Enviadas (website/ingest.py) ---
+INGEST_ENABLED = True
+INGEST_MAX_DIMENSION = 2400  # Lado maior, em píxeis (A4 a ~200dpi: continua legível)
+INGEST_JPEG_QUALITY = 82
+
+# --- Pré-visualizações dos Anexos (website/previews.py) ---
+PREVIEW_MAX_SIZE = 480  # Lado maior, em píxeis
+PREVIEW_FORMAT = 'WEBP'  # WEBP ou JPEG (usa JPEG se o Pillow não tiver WebP)
+PREVIEW_QUALITY = 70
+# Processos que geram as pré-visualizações depois do upload (0 = gerar no próprio pedido)
+PREVIEW_WORKERS = 1
+PREVIEW_CACHE_MAX_AGE = 7 * 24 * 3600  # Segundos em cache no browser (privada)
+
+# --- Catálogo de Serviços em Memória (website/catalog.py) ---
+# A versão do catálogo fica na cache do Django: com vários processos, usar uma cache partilhada
+# (Redis/Memcached). Este limite (segundos) obriga a recarregar mesmo sem mudança de versão.
+CATALOG_MAX_AGE = 300
+# Um id desconhecido só força um recarregamento se a cópia em memória tiver pelo menos estes segundos
+CATALOG_MISS_RELOAD_INTERVAL = 5
+
+# --- Instrumentação dos Pedidos (website/profiling.py) ---
+# Queries SQL, tempo de BD e de templates e tamanho de cada resposta, no logger
+# 'website.profiling'. Sempre ligada nos testes, onde exceder um orçamento faz falhar
+# o teste; em produção (REQUEST_PROFILING=1) exceder um orçamento é só um aviso.
+RUNNING_TESTS = sys.argv[1:2] == ['test']
+REQUEST_PROFILING = RUNNING_TESTS or os.environ.get('REQUEST_PROFILING', '0') == '1'
+QUERY_BUDGET_STRICT = RUNNING_TESTS
+REQUEST_PROFILING_SLOWEST = 3     # Queries mais lentas mostradas no aviso
+REQUEST_PROFILING_DUPLICATES = 3  # A mesma query repetida tantas vezes num pedido = suspeita de N+1
+# Máximo de queries por pedido, por nome do URL (inclui sessão e utilizador); None = sem limite
+QUERY_BUDGET_DEFAULT = None
+QUERY_BUDGETS = {
+    # Leitura: número fixo, não pode crescer com o nº de processos/anexos
+    'home': 3,
+    'api_get_processes': 2,
+    'signup': 3,
+    'dashboard': 5,
+    'edit_profile': 6,
+    'process_detail': 6,
+    'document_preview': 4,
+    'generate_pdf': 4,
+    'manager_dashboard': 4,
+    'manager_analytics': 6,
+    'manager_export': 4,
+    # Escrita: também número fixo (os anexos de um processo são libertados de uma vez).
+    # Pior caso: catálogo por carregar, primeira linha de um contador e limpeza
+    # dos ficheiros sem referências depois do commit
+    'create_process': 18,
+    'upload_document': 19,
+    'submit_process_final': 21,
+    'cancel_process': 19,
+    'delete_document': 9,
+    'generate_appointment': 12,
+    'metrics': 2,
+}
+
+# --- Métricas Prometheus (website/metrics.py, em /metrics) ---
+METRICS_ENABLED = True
+# Acesso sem sessão (Authorization: Bearer <token>); vazio = só staff com sessão iniciada
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+# Com vários processos (gunicorn --workers N): pasta partilhada onde cada processo grava os
+# seus valores, esvaziada ao arrancar o servidor. None = só os valores do próprio processo.
+METRICS_DIR = os.environ.get('METRICS_DIR') or None
+METRICS_FLUSH_INTERVAL = 1.0  # Segundos entre gravações do ficheiro de cada processo
+
 # --- Configurações de Login/Logout ---
 LOGIN_REDIRECT_URL = 'dashboard'
 LOGOUT_REDIRECT_URL = 'home'
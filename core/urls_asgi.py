@@ -0,0 +1,11 @@
+# core/urls_asgi.py (URLs usados sob ASGI, com ASYNC_VIEWS=1)
+# As rotas async (website/urls_async.py) vêm primeiro e têm os mesmos caminhos
+# que as síncronas, por isso são elas que respondem; o resto é igual a core/urls.py.
+
+from django.urls import path, include
+
+from .urls import urlpatterns as sync_urlpatterns
+
+urlpatterns = [
+    path('', include('website.urls_async')),
+] + sync_urlpatterns
@@ -1,5 +1,11 @@
-from django.contrib import admin
-from .models import ServiceType, RequiredDoc, Profile, Process, Attachment, Appointment
+from django.contrib import admin, messages
+from django.urls import reverse
+from django.utils.html import format_html
+from .models import (
+    ServiceType, RequiredDoc, Profile, Process, ProcessStatusChange, Attachment, Appointment, AppointmentSlot, StoredBlob,
+)
+from .transitions import transition_processes
+from .search import search_processes
 
 # 1. Configuração dos Tipos de Serviço
 class RequiredDocInline(admin.TabularInline):
@@ -21,29 +27,83 @@ class ProfileAdmin(admin.ModelAdmin):
 class AttachmentInline(admin.TabularInline):
     model = Attachment
     extra = 0
-    readonly_fields = ('uploaded_at',)
+    readonly_fields = ('preview', 'uploaded_at', 'original_size', 'stored_size')
+
+    @admin.display(description='Pré-visualização')
+    def preview(self, obj):
+        # Miniatura (website/previews.py) com ligação para o original
+        if not obj.pk or not obj.has_preview:
+            return '—'
+        return format_html(
+            '<a href="{}" target="_blank"><img src="{}" alt="" loading="lazy" style="max-height: 120px;"></a>',
+            obj.file.url, reverse('document_preview', args=[obj.pk]),
+        )
+
+class StatusChangeInline(admin.TabularInline):
+    model = ProcessStatusChange
+    extra = 0
+    can_delete = False
+    readonly_fields = ('from_status', 'to_status', 'changed_by', 'changed_at')
+
+    def has_add_permission(self, request, obj=None):
+        return False
 
 @admin.register(Process)
 class ProcessAdmin(admin.ModelAdmin):
     list_display = ('id', 'user', 'service_type', 'status', 'submission_date')
     list_filter = ('status', 'service_type', 'submission_date')
     search_fields = ('user__username', 'id')
-    inlines = [AttachmentInline]
+    search_help_text = 'Pesquisa por referência (PT/AAAA/NNNN), serviço, utilizador, passaporte ou NIF.'
+    inlines = [AttachmentInline, StatusChangeInline]
+
+    def get_search_results(self, request, queryset, search_term):
+        # Usa o índice de pesquisa em vez de LIKE '%x%' nos search_fields
+        if not search_term:
+            return queryset, False
+        return search_processes(queryset, search_term), False
     
     # Ações rápidas para aprovar/rejeitar em massa
     actions = ['mark_as_approved', 'mark_as_rejected']
 
     @admin.action(description='Aprovar processos selecionados')
     def mark_as_approved(self, request, queryset):
-        queryset.update(status='approved')
+        self._transition(request, queryset, 'approved')
 
     @admin.action(description='Rejeitar processos selecionados')
     def mark_as_rejected(self, request, queryset):
-        queryset.update(status='rejected')
+        self._transition(request, queryset, 'rejected')
+
+    def _transition(self, request, queryset, status):
+        # Em blocos curtos, com histórico e agendamentos (ver website/transitions.py)
+        report = transition_processes(queryset, status, user=request.user)
+        self.message_user(request, report.summary(), messages.SUCCESS if report.changed else messages.WARNING)
+        if report.error:
+            self.message_user(request, f"Operação interrompida: {report.error}", messages.ERROR)
 
 # 4. Configuração dos Agendamentos
 @admin.register(Appointment)
 class AppointmentAdmin(admin.ModelAdmin):
     list_display = ('ticket_number', 'appointment_date', 'process', 'location')
     list_filter = ('location', 'appointment_date')
-    search_fields = ('ticket_number', 'process__user__username')
\ No newline at end of file
+    search_fields = ('ticket_number', 'process__user__username')
+    # A vaga (e a data/local que vêm dela) só muda pelo alocador, que acerta os lugares ocupados
+    readonly_fields = ('slot', 'appointment_date', 'location')
+
+    def has_add_permission(self, request):
+        return False  # Criados ao aprovar o processo (website/scheduling.py)
+
+@admin.register(AppointmentSlot)
+class AppointmentSlotAdmin(admin.ModelAdmin):
+    list_display = ('date', 'start_time', 'location', 'booked', 'capacity')
+    list_filter = ('location', 'date')
+    readonly_fields = ('booked',) # Só o alocador mexe nas vagas ocupadas
+
+# 5. Ficheiros Armazenados (só leitura: geridos pela contagem de referências)
+@admin.register(StoredBlob)
+class StoredBlobAdmin(admin.ModelAdmin):
+    list_display = ('name', 'size', 'ref_count', 'created_at')
+    readonly_fields = ('name', 'size', 'ref_count', 'created_at')
+    search_fields = ('name',)
+
+    def has_add_permission(self, request):
+        return False
@@ -0,0 +1,284 @@
+# ==============================================================================
+# IMIGRAÁGIL - ANALYTICS.PY (SÉRIES TEMPORAIS DO BACKOFFICE)
+# ==============================================================================
+# Métricas diárias por tipo de serviço para o painel dos gestores:
+#   - processos submetidos, aprovados e rejeitados por dia;
+#   - tempo da submissão até à decisão (mediana e p90, em dias).
+#
+# Como se calcula:
+#   - Os processos são lidos em colunas (values_list, por blocos de
+#     ANALYTICS_CHUNK_SIZE linhas), nunca como objetos do ORM.
+#   - Cada bloco é agregado de forma vetorizada com NumPy (searchsorted para
+#     o dia, unique para as contagens). Sem NumPy instalado usa-se a
+#     mesma lógica em Python puro, com resultados iguais (só mais lenta).
+#   - O resultado de cada dia fica em cache. Os dias passados não voltam a
+#     ser calculados (até expirarem); o dia de hoje é sempre recalculado.
+#
+# As datas são Process.submitted_at e Process.decided_at, marcadas quando o
+# processo chega ao estado e que não mudam com gravações posteriores: um dia
+# passado já em cache continua certo (o updated_at mudava a cada gravação).
+
+import datetime
+from bisect import bisect_right
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Process, ServiceType
+
+try:
+    import numpy as np
+except ImportError:  # NumPy é opcional
+    np = None
+
+CACHE_PREFIX = 'analytics:v2:'
+DECISIONS = ['approved', 'rejected']
+SECONDS_PER_DAY = 86400
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+# ==========================================
+# 1. AGREGAÇÃO (NUMPY OU PYTHON PURO)
+# ==========================================
+
+def _day_bounds(first, last):
+    """Meia-noite local de cada dia de first..last+1, em segundos (acerta a hora de verão)."""
+    bounds = []
+    day = first
+    while day <= last + datetime.timedelta(days=1):
+        bounds.append(timezone.make_aware(datetime.datetime.combine(day, datetime.time.min)).timestamp())
+        day += datetime.timedelta(days=1)
+    return bounds
+
+
+def _count_by_day(bounds, timestamps, services):
+    """{(índice do dia, service_type_id): total} para as linhas dentro de bounds."""
+    if not len(timestamps):
+        return {}
+    if np is not None:
+        days = np.searchsorted(np.asarray(bounds), np.asarray(timestamps, dtype=float), side='right') - 1
+        services = np.asarray(services, dtype=np.int64)
+        inside = (days >= 0) & (days < len(bounds) - 1)
+        pairs, totals = np.unique(np.stack([days[inside], services[inside]]), axis=1, return_counts=True)
+        return {(int(d), int(s)): int(n) for (d, s), n in zip(pairs.T, totals)}
+
+    counts = Counter()
+    for ts, service in zip(timestamps, services):
+        day = bisect_right(bounds, ts) - 1
+        if 0 <= day < len(bounds) - 1:
+            counts[(day, service)] += 1
+    return dict(counts)
+
+
+def _durations_by_day(bounds, decided, submitted, services):
+    """{(índice do dia da decisão, service_type_id): [dias até à decisão, ...]}."""
+    grouped = defaultdict(list)
+    if np is not None:
+        decided = np.asarray(decided, dtype=float)
+        days = np.searchsorted(np.asarray(bounds), decided, side='right') - 1
+        durations = np.round((decided - np.asarray(submitted, dtype=float)) / SECONDS_PER_DAY, 2)
+        services = np.asarray(services, dtype=np.int64)
+        inside = (days >= 0) & (days < len(bounds) - 1)
+        days, services, durations = days[inside], services[inside], durations[inside]
+        # Ordena por (dia, serviço) e corta nos pontos onde o grupo muda
+        order = np.lexsort((services, days))
+        days, services, durations = days[order], services[order], durations[order]
+        if len(days):
+            cuts = np.flatnonzero((np.diff(days) != 0) | (np.diff(services) != 0)) + 1
+            starts = np.concatenate([[0], cuts])
+            for start, chunk in zip(starts, np.split(durations, cuts)):
+                grouped[(int(days[start]), int(services[start]))].extend(chunk.tolist())
+        return dict(grouped)
+
+    for dec, sub, service in zip(decided, submitted, services):
+        day = bisect_right(bounds, dec) - 1
+        if 0 <= day < len(bounds) - 1:
+            grouped[(day, service)].append(round((dec - sub) / SECONDS_PER_DAY, 2))
+    return dict(grouped)
+
+
+def percentiles(values, qs=(50, 90)):
+    """Percentis com interpolação linear (o mesmo método por omissão de numpy.percentile)."""
+    if not values:
+        return [None for _ in qs]
+    if np is not None:
+        return [float(v) for v in np.percentile(np.asarray(values, dtype=float), qs)]
+    ordered = sorted(values)
+    result = []
+    for q in qs:
+        pos = (len(ordered) - 1) * q / 100
+        low = int(pos)
+        high = min(low + 1, len(ordered) - 1)
+        result.append(ordered[low] + (ordered[high] - ordered[low]) * (pos - low))
+    return result
+
+
+# ==========================================
+# 2. EXTRAÇÃO POR BLOCOS
+# ==========================================
+
+def _chunks(queryset):
+    """Lê o queryset (values_list) em blocos de listas, sem criar objetos do ORM."""
+    size = _setting('ANALYTICS_CHUNK_SIZE', 20000)
+    chunk = []
+    for row in queryset.iterator(chunk_size=size):
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _empty_bucket():
+    return {'submitted': {}, 'approved': {}, 'rejected': {}, 'durations': {}}
+
+
+def submitted_rows(start, end):
+    """(serviço, submitted_at) dos processos submetidos em [start, end)."""
+    # Rascunhos não têm submitted_at: só contam no dia em que são submetidos
+    return (
+        Process.objects.filter(submitted_at__gte=start, submitted_at__lt=end)
+        .order_by()
+        .values_list('service_type_id', 'submitted_at')
+    )
+
+
+def decided_rows(start, end):
+    """(serviço, estado, submetido em, decided_at) das decisões tomadas em [start, end)."""
+    since = Coalesce('submitted_at', 'submission_date')
+    return (
+        Process.objects.filter(status__in=DECISIONS, decided_at__gte=start, decided_at__lt=end)
+        .order_by()
+        .values_list('service_type_id', 'status', since, 'decided_at')
+    )
+
+
+def compute_days(first, last):
+    """Calcula as métricas de cada dia de first..last (inclusive) diretamente da BD."""
+    bounds = _day_bounds(first, last)
+    start = datetime.datetime.fromtimestamp(bounds[0], tz=datetime.timezone.utc)
+    end = datetime.datetime.fromtimestamp(bounds[-1], tz=datetime.timezone.utc)
+    buckets = [_empty_bucket() for _ in range(len(bounds) - 1)]
+
+    def add(metric, counts):
+        for (day, service), total in counts.items():
+            target = buckets[day][metric]
+            target[service] = target.get(service, 0) + total
+
+    for chunk in _chunks(submitted_rows(start, end)):
+        services = [row[0] for row in chunk]
+        add('submitted', _count_by_day(bounds, [row[1].timestamp() for row in chunk], services))
+
+    for chunk in _chunks(decided_rows(start, end)):
+        services = [row[0] for row in chunk]
+        decided_ts = [row[3].timestamp() for row in chunk]
+        for status in DECISIONS:
+            picked = [i for i, row in enumerate(chunk) if row[1] == status]
+            add(status, _count_by_day(bounds, [decided_ts[i] for i in picked], [services[i] for i in picked]))
+        submitted_ts = [row[2].timestamp() for row in chunk]
+        for (day, service), values in _durations_by_day(bounds, decided_ts, submitted_ts, services).items():
+            buckets[day]['durations'].setdefault(service, []).extend(values)
+
+    return {first + datetime.timedelta(days=i): bucket for i, bucket in enumerate(buckets)}
+
+
+def daily_buckets(first, last):
+    """
+    Métricas de cada dia, vindas da cache sempre que possível.
+    Só os dias em falta (e o dia de hoje) são calculados, numa única passagem.
+    """
+    today = timezone.localdate()
+    days = [first + datetime.timedelta(days=i) for i in range((last - first).days + 1)]
+    keys = {day: f"{CACHE_PREFIX}{day.isoformat()}" for day in days}
+    cached = cache.get_many([keys[day] for day in days if day < today])
+    result = {day: cached[keys[day]] for day in days if keys[day] in cached}
+
+    missing = [day for day in days if day not in result]
+    if missing:
+        fresh = compute_days(missing[0], missing[-1])
+        cache.set_many(
+            {keys[day]: bucket for day, bucket in fresh.items() if day < today},
+            timeout=_setting('ANALYTICS_CACHE_TIMEOUT', 24 * 3600),
+        )
+        for day in missing:
+            result[day] = fresh[day]
+    return result
+
+
+# ==========================================
+# 3. RELATÓRIO (JSON PARA O CHART.JS)
+# ==========================================
+
+def _round(value):
+    return None if value is None else round(value, 1)
+
+
+def service_rows(service_id=None):
+    """(id, nome) dos serviços do relatório, opcionalmente só de um."""
+    services = ServiceType.objects.order_by('name').values_list('id', 'name')
+    if service_id is not None:
+        services = services.filter(id=service_id)
+    return services
+
+
+def build_report(days, service_id=None):
+    """
+    Relatório dos últimos `days` dias (incluindo hoje), opcionalmente só de um serviço.
+    As séries vêm já no formato de datasets do Chart.js ({'label', 'data'}).
+    """
+    last = timezone.localdate()
+    first = last - datetime.timedelta(days=days - 1)
+    buckets = daily_buckets(first, last)
+    ordered_days = sorted(buckets)
+
+    services = list(service_rows(service_id))
+
+    series = {}
+    for metric in ['submitted', 'approved', 'rejected']:
+        series[metric] = [
+            {'label': name, 'data': [buckets[day][metric].get(pk, 0) for day in ordered_days]}
+            for pk, name in services
+        ]
+
+    daily_median, daily_p90 = [], []
+    by_service = {pk: [] for pk, _ in services}
+    for day in ordered_days:
+        values = []
+        for pk, _ in services:
+            durations = buckets[day]['durations'].get(pk, [])
+            values.extend(durations)
+            by_service[pk].extend(durations)
+        median, p90 = percentiles(values)
+        daily_median.append(_round(median))
+        daily_p90.append(_round(p90))
+
+    all_durations = [value for values in by_service.values() for value in values]
+    median, p90 = percentiles(all_durations)
+    decision_days = {
+        'median': _round(median),
+        'p90': _round(p90),
+        'count': len(all_durations),
+        'daily_median': daily_median,
+        'daily_p90': daily_p90,
+        'by_service': [],
+    }
+    for pk, name in services:
+        s_median, s_p90 = percentiles(by_service[pk])
+        decision_days['by_service'].append({
+            'label': name, 'median': _round(s_median), 'p90': _round(s_p90), 'count': len(by_service[pk]),
+        })
+
+    return {
+        'start': first.isoformat(),
+        'end': last.isoformat(),
+        'labels': [day.isoformat() for day in ordered_days],
+        'series': series,
+        'decision_days': decision_days,
+    }
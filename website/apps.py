@@ -3,4 +3,8 @@ from django.apps import AppConfig
 class WebsiteConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'website'
-    verbose_name = 'Gestão de Imigração'
\ No newline at end of file
+    verbose_name = 'Gestão de Imigração'
+
+    def ready(self):
+        # Liga os sinais (índice de pesquisa, etc.)
+        from . import signals  # noqa: F401
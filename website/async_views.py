@@ -0,0 +1,146 @@
+# ==============================================================================
+# IMIGRAÁGIL - ASYNC_VIEWS.PY (VERSÕES ASYNC DAS PÁGINAS DE LEITURA)
+# ==============================================================================
+# Sob ASGI (uvicorn/daphne), uma view síncrona ocupa uma thread por pedido
+# (sync_to_async). Estas versões das páginas mais lidas usam o ORM async
+# (aget, aexists, iteração async) e correm no event loop.
+#
+# São ativadas com ASYNC_VIEWS=1 (desligado por omissão, também sob ASGI), que
+# troca o ROOT_URLCONF para core/urls_asgi.py. A lógica (queries, paginação,
+# JSON) é a mesma de website/views.py; só muda a forma de ler a BD.
+#
+# Nota: no Django, o ORM async ainda executa as queries numa thread (não há
+# driver async); o ganho está em não prender uma thread durante o pedido inteiro.
+
+import json
+
+from django.conf import settings
+from django.contrib.auth.decorators import login_required, user_passes_test
+from django.core.exceptions import PermissionDenied
+from django.http import JsonResponse, StreamingHttpResponse
+from django.shortcuts import aget_object_or_404, render
+
+from asgiref.sync import sync_to_async
+
+from .counters import astatus_totals
+from .models import Process
+from .pagination import InvalidCursor, encode_cursor
+from .views import (
+    _api_page_query, _dashboard_paginator, _manager_context, _next_url, _page_payload,
+    _serialize_process_row, is_manager,
+)
+
+
+async def _auth_user(request):
+    """
+    Utilizador autenticado, lido de forma async. Fica também em request.user,
+    para os templates (context processor 'auth') não fazerem uma query síncrona.
+    """
+    user = await request.auser()
+    request.user = user
+    return user
+
+
+# ==============================================================================
+# 1. API PÚBLICA
+# ==============================================================================
+
+async def api_get_processes(request):
+    """Versão async de views.api_get_processes (mesmos parâmetros e formato)."""
+    try:
+        page_size, rows = _api_page_query(request)
+    except InvalidCursor as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+
+    if page_size >= getattr(settings, 'API_STREAM_THRESHOLD', 200):
+        # async for lê a página de uma vez numa thread (no máximo API_MAX_PAGE_SIZE + 1 linhas):
+        # o aiterator() de values_list() ainda abre o cursor de forma síncrona no Django
+        return StreamingHttpResponse(
+            _astream_process_page(request, rows, page_size),
+            content_type='application/json',
+        )
+
+    rows = [row async for row in rows]
+    return JsonResponse(_page_payload(request, rows, page_size))
+
+
+async def _astream_process_page(request, rows, page_size):
+    """Versão async de views._stream_process_page."""
+    yield '{"results": ['
+    count = 0
+    last = None
+    has_more = False
+    async for row in rows:
+        if count == page_size:
+            has_more = True
+            break
+        yield (',' if count else '') + json.dumps(_serialize_process_row(row), ensure_ascii=False)
+        last = row
+        count += 1
+
+    next_cursor = encode_cursor(last[3], last[0]) if has_more else None
+    yield '], "count": %d, "next_cursor": %s, "next": %s}' % (
+        count, json.dumps(next_cursor), json.dumps(_next_url(request, next_cursor))
+    )
+
+
+# ==============================================================================
+# 2. ÁREA DO UTILIZADOR
+# ==============================================================================
+
+@login_required
+async def dashboard(request):
+    """Versão async de views.dashboard."""
+    user = await _auth_user(request)
+    paginator = _dashboard_paginator(request, user)
+    page = request.GET.get('page')
+    if hasattr(paginator, 'aget_page'):
+        processos_paginados = await paginator.aget_page(page)
+    else:
+        # Paginator clássico (DASHBOARD_COUNT_FREE_PAGINATION = False): não tem versão async
+        processos_paginados = await sync_to_async(paginator.get_page)(page)
+
+    if len(processos_paginados):
+        pode_criar_novo = not processos_paginados[0].user_has_open
+    else:
+        pode_criar_novo = not await (
+            Process.objects.filter(user=user).exclude(status__in=Process.CLOSED_STATUSES).aexists()
+        )
+
+    return render(request, 'dashboard.html', {
+        'processos': processos_paginados,
+        'pode_criar_novo': pode_criar_novo,
+    })
+
+
+@login_required
+async def process_detail(request, process_id):
+    """Versão async de views.process_detail."""
+    user = await _auth_user(request)
+    process = await aget_object_or_404(
+        Process.objects.select_related('service_type', 'appointment'),
+        id=process_id
+    )
+
+    # 🔒 MEDIDA DE SEGURANÇA (IDOR)
+    if process.user_id != user.id and not user.is_staff:
+        raise PermissionDenied("Acesso Negado: Não tem permissão para visualizar este processo.")
+
+    documents_status, docs_summary = await process.adocument_checklist()
+    return render(request, 'process_detail.html', {
+        'process': process,
+        'documents_status': documents_status,
+        'docs_summary': docs_summary,
+    })
+
+
+# ==============================================================================
+# 3. ÁREA DE GESTÃO
+# ==============================================================================
+
+@login_required
+@user_passes_test(is_manager)
+async def manager_dashboard(request):
+    """Versão async de views.manager_dashboard."""
+    await _auth_user(request)
+    return render(request, 'manager_dashboard.html', _manager_context(await astatus_totals()))
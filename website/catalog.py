@@ -0,0 +1,202 @@
+# ==============================================================================
+# IMIGRAÁGIL - CATALOG.PY (CACHE DO CATÁLOGO DE SERVIÇOS)
+# ==============================================================================
+# O catálogo (ServiceType + RequiredDoc) muda raramente, mas era lido da BD em
+# quase todos os pedidos (formulário de novo processo, checklist de documentos,
+# uploads, __str__ dos modelos). Aqui fica em memória, no próprio processo:
+#
+#   - registos imutáveis com __slots__ (ServiceRecord, RequirementRecord),
+#     partilhados por todas as threads sem cópias;
+#   - uma "versão" guardada na cache do Django (CATALOG_VERSION_KEY), mudada
+#     sempre que o catálogo é gravado ou apagado (sinais em signals.py);
+#   - cada processo compara a sua versão com a da cache e só recarrega da BD
+#     (2 queries) quando mudou. Em regime normal: zero queries.
+#
+# Nota: para vários processos (gunicorn) verem a mesma versão, a cache do Django
+# tem de ser partilhada (Redis/Memcached). Com a LocMemCache por omissão, cada
+# processo recarrega no máximo a cada CATALOG_MAX_AGE segundos.
+#
+# Um id que não está no catálogo (ex: doc_type_id inventado num upload) só
+# provoca um recarregamento se a cópia atual tiver mais de
+# CATALOG_MISS_RELOAD_INTERVAL segundos; até lá a resposta é "não existe".
+
+import threading
+import time
+import uuid
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import RequiredDoc, ServiceType
+
+CATALOG_VERSION_KEY = 'catalog:version'
+
+
+class _Record:
+    """Registo imutável: os atributos só são definidos no construtor."""
+    __slots__ = ()
+
+    def __init__(self, **values):
+        for name in self.__slots__:
+            object.__setattr__(self, name, values[name])
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} é só de leitura")
+
+    def __repr__(self):
+        return f"<{type(self).__name__} {self.id}: {self}>"
+
+
+class RequirementRecord(_Record):
+    """Documento exigido por um serviço (mesmos atributos usados de RequiredDoc nos templates)."""
+    __slots__ = ('id', 'service_type_id', 'doc_name', 'is_mandatory')
+
+    def __str__(self):
+        return self.doc_name
+
+
+class ServiceRecord(_Record):
+    """Tipo de serviço com a lista (tuplo) dos documentos exigidos."""
+    __slots__ = ('id', 'name', 'description', 'estimated_wait_time', 'requirements')
+
+    def __str__(self):
+        return self.name
+
+    def as_model(self):
+        """ServiceType equivalente, sem query (ex: para atribuir a Process.service_type)."""
+        service = ServiceType(
+            id=self.id, name=self.name, description=self.description,
+            estimated_wait_time=self.estimated_wait_time,
+        )
+        service._state.adding = False
+        service._state.db = 'default'
+        return service
+
+
+class Catalog:
+    """Fotografia do catálogo numa dada versão."""
+    __slots__ = ('version', 'loaded_at', 'services', 'requirements')
+
+    def __init__(self, version, services):
+        self.version = version
+        self.loaded_at = time.monotonic()
+        self.services = {service.id: service for service in services}
+        self.requirements = {req.id: req for service in services for req in service.requirements}
+
+    def service(self, pk):
+        return self.services.get(pk)
+
+    def requirement(self, pk):
+        return self.requirements.get(pk)
+
+    def choices(self):
+        """(id, nome) de todos os serviços, por nome (opções do formulário)."""
+        return sorted(((s.id, s.name) for s in self.services.values()), key=lambda item: item[1])
+
+
+_lock = threading.Lock()
+_current = None
+
+
+def _current_version():
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        # Primeira leitura (ou a chave expirou): cria uma versão nova
+        cache.add(CATALOG_VERSION_KEY, uuid.uuid4().hex, timeout=None)
+        version = cache.get(CATALOG_VERSION_KEY)
+    return version
+
+
+def _load(version):
+    """Lê o catálogo da BD (2 queries) e monta os registos."""
+    requirements = {}
+    for pk, service_type_id, doc_name, is_mandatory in RequiredDoc.objects.order_by('id').values_list(
+        'id', 'service_type_id', 'doc_name', 'is_mandatory'
+    ):
+        requirements.setdefault(service_type_id, []).append(RequirementRecord(
+            id=pk, service_type_id=service_type_id, doc_name=doc_name, is_mandatory=is_mandatory,
+        ))
+    services = [
+        ServiceRecord(
+            id=pk, name=name, description=description, estimated_wait_time=wait,
+            requirements=tuple(requirements.get(pk, ())),
+        )
+        for pk, name, description, wait in ServiceType.objects.order_by('id').values_list(
+            'id', 'name', 'description', 'estimated_wait_time'
+        )
+    ]
+    return Catalog(version, services)
+
+
+def _is_fresh(catalog, version, stale=None):
+    return (
+        catalog is not None and catalog is not stale and catalog.version == version
+        and time.monotonic() - catalog.loaded_at < getattr(settings, 'CATALOG_MAX_AGE', 300)
+    )
+
+
+def get_catalog(stale=None):
+    """
+    Catálogo atual; só recarrega se a versão mudou ou se expirou.
+    `stale`: uma cópia que se sabe estar desatualizada (recarrega se ainda for a atual).
+    """
+    global _current
+    version = _current_version()
+    catalog = _current
+    if _is_fresh(catalog, version, stale):
+        return catalog
+    with _lock:
+        # Outra thread pode ter recarregado enquanto esperávamos
+        if _is_fresh(_current, version, stale):
+            return _current
+        _current = _load(version)
+        return _current
+
+
+def _lookup(pk, find):
+    """
+    find(catalog, pk) no catálogo atual. Se falhar (ex: criado noutro processo e a
+    versão ainda não chegou aqui), recarrega uma vez, mas no máximo uma vez por
+    CATALOG_MISS_RELOAD_INTERVAL segundos: ids inventados não obrigam a ler a BD.
+    """
+    catalog = get_catalog()
+    record = find(catalog, pk)
+    if record is None and time.monotonic() - catalog.loaded_at >= getattr(settings, 'CATALOG_MISS_RELOAD_INTERVAL', 5):
+        record = find(get_catalog(stale=catalog), pk)
+    return record
+
+
+def get_service(pk):
+    """ServiceRecord pelo id (None se não existir)."""
+    return _lookup(pk, Catalog.service)
+
+
+async def aget_service(pk):
+    """Versão async de get_service(): sem sair do event loop quando o catálogo está atualizado."""
+    catalog = _current
+    if _is_fresh(catalog, await cache.aget(CATALOG_VERSION_KEY)):
+        record = catalog.service(pk)
+        if record is not None:
+            return record
+    # Recarregar lê a BD: corre numa thread, como o resto do ORM síncrono
+    return await sync_to_async(get_service)(pk)
+
+
+def get_requirement(pk):
+    """RequirementRecord pelo id, com a mesma regra de get_service()."""
+    return _lookup(pk, Catalog.requirement)
+
+
+def bump_catalog_version():
+    """
+    Marca o catálogo como alterado. Muda a versão já (para este pedido ver as
+    alterações) e outra vez depois do commit (para nenhum processo ficar com
+    uma cópia lida antes do commit).
+    """
+    def bump():
+        cache.set(CATALOG_VERSION_KEY, uuid.uuid4().hex, timeout=None)
+
+    bump()
+    transaction.on_commit(bump)
@@ -0,0 +1,119 @@
+# ==============================================================================
+# IMIGRAÁGIL - COUNTERS.PY (CONTADORES DE PROCESSOS POR ESTADO)
+# ==============================================================================
+# O painel dos gestores mostra quantos processos há em cada estado. Em vez de
+# um COUNT/GROUP BY sobre toda a tabela a cada refresh, mantemos a tabela
+# ProcessStatusCount, uma linha por (estado, tipo de serviço):
+#   - save()/delete() de um Process: sinais em signals.py;
+#   - mudanças em massa (queryset.update, que não dispara sinais): pelo
+#     serviço de transições (transitions.py), que aplica status_deltas().
+# O comando "reconcile_status_counts" reconstrói a tabela de raiz.
+
+from collections import Counter
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+
+from .models import Process, ProcessStatusCount
+
+
+def apply_deltas(deltas):
+    """
+    Aplica variações {(estado, service_type_id): +n/-n} aos contadores,
+    numa só transação (a do chamador, se existir).
+    """
+    with transaction.atomic():
+        for (status, service_type_id), delta in sorted(deltas.items()):
+            if not delta:
+                continue
+            updated = ProcessStatusCount.objects.filter(
+                status=status, service_type_id=service_type_id
+            ).update(total=F('total') + delta)
+            if updated:
+                continue
+            try:
+                with transaction.atomic():
+                    ProcessStatusCount.objects.create(
+                        status=status, service_type_id=service_type_id, total=delta
+                    )
+            except IntegrityError:
+                # Criado em simultâneo por outro pedido: basta incrementar
+                ProcessStatusCount.objects.filter(
+                    status=status, service_type_id=service_type_id
+                ).update(total=F('total') + delta)
+
+
+def record_change(previous, current):
+    """
+    Regista a passagem de um processo de `previous` para `current`, cada um
+    um par (estado, service_type_id) ou None (criado / apagado).
+    """
+    if previous == current:
+        return
+    deltas = Counter()
+    if previous is not None:
+        deltas[previous] -= 1
+    if current is not None:
+        deltas[current] += 1
+    apply_deltas(deltas)
+
+
+def status_deltas(rows, status):
+    """Variações dos contadores quando os processos `rows` (id, estado, service_type_id) passam a `status`."""
+    deltas = Counter()
+    for _, old_status, service_type_id in rows:
+        deltas[(old_status, service_type_id)] -= 1
+        deltas[(status, service_type_id)] += 1
+    return deltas
+
+
+def _totals_rows():
+    return (
+        ProcessStatusCount.objects.filter(total__gt=0)
+        .values('status')
+        .annotate(total_sum=Sum('total'))
+        .order_by()
+    )
+
+
+def status_totals():
+    """{estado: total} lido dos contadores (uma linha por estado e serviço, não por processo)."""
+    return {row['status']: row['total_sum'] for row in _totals_rows()}
+
+
+async def astatus_totals():
+    """Versão async de status_totals() (website/async_views.py)."""
+    return {row['status']: row['total_sum'] async for row in _totals_rows()}
+
+
+def rebuild_counts():
+    """
+    Reconstrói os contadores a partir da tabela de processos.
+    Devolve {(estado, service_type_id): (antes, depois)} das entradas que estavam erradas.
+    """
+    with transaction.atomic():
+        actual = {
+            (row['status'], row['service_type_id']): row['total']
+            for row in Process.objects.values('status', 'service_type_id')
+            .annotate(total=Count('id'))
+            .order_by()
+        }
+        stored = {
+            (status, service_type_id): total
+            for status, service_type_id, total in ProcessStatusCount.objects.select_for_update()
+            .values_list('status', 'service_type_id', 'total')
+        }
+        drift = {
+            key: (stored.get(key, 0), actual.get(key, 0))
+            for key in set(actual) | set(stored)
+            if stored.get(key, 0) != actual.get(key, 0)
+        }
+        ProcessStatusCount.objects.all().delete()
+        ProcessStatusCount.objects.bulk_create(
+            [
+                ProcessStatusCount(status=status, service_type_id=service_type_id, total=total)
+                for (status, service_type_id), total in actual.items()
+            ],
+            batch_size=1000,
+        )
+    return drift
@@ -0,0 +1,137 @@
+# ==============================================================================
+# IMIGRAÁGIL - EXPORTS.PY (EXPORTAÇÃO DE PROCESSOS PARA O STAFF)
+# ==============================================================================
+# Exporta processos (com serviço, perfil e agendamento) em CSV ou JSONL.
+# Pensado para milhões de linhas:
+#   - uma só query com JOINs, lida com iterator(chunk_size) (sem cache do queryset);
+#   - cada linha é convertida em texto por um gerador e enviada logo
+#     (StreamingHttpResponse), por isso a memória não cresce com o tamanho.
+#
+# Os filtros usam colunas indexadas: estado (process_status_service_idx),
+# serviço (FK) e datas como intervalo em submission_date (process_date_id_idx).
+
+import csv
+import datetime
+import json
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from .models import Process
+from .search import process_reference
+
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+}
+
+# Colunas exportadas, pela ordem do CSV
+COLUMNS = [
+    'id', 'reference', 'status', 'service', 'username', 'full_name', 'passport', 'nif', 'nationality',
+    'submission_date', 'updated_at', 'appointment_date', 'appointment_location', 'ticket_number',
+]
+
+# Campos lidos da BD (um só SELECT com JOIN a serviço, utilizador, perfil e agendamento)
+_FIELDS = [
+    'id', 'status', 'service_type__name', 'user__username', 'user__first_name', 'user__last_name',
+    'user__profile__passport', 'user__profile__nif', 'user__profile__nationality',
+    'submission_date', 'updated_at',
+    'appointment__appointment_date', 'appointment__location', 'appointment__ticket_number',
+]
+
+
+class InvalidExportFilter(ValueError):
+    """Filtro inválido no pedido de exportação."""
+
+
+def _local_midnight(day):
+    return timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+
+
+def export_queryset(status=None, service=None, date_from=None, date_to=None):
+    """
+    Processos a exportar, já filtrados, como values_list (tuplos, sem modelos).
+    Os filtros chegam como texto (query string) e são validados aqui.
+    """
+    queryset = Process.objects.all()
+
+    if status:
+        statuses = status.split(',')
+        valid = dict(Process.STATUS_CHOICES)
+        if any(value not in valid for value in statuses):
+            raise InvalidExportFilter(f"Estado inválido: {status}")
+        queryset = queryset.filter(status__in=statuses)
+
+    if service:
+        if not service.isdigit():
+            raise InvalidExportFilter(f"Serviço inválido: {service}")
+        queryset = queryset.filter(service_type_id=int(service))
+
+    # Intervalo [from, to] em dias locais, convertido em limites de submission_date
+    # (comparar com __date aplicaria uma função à coluna e não usaria o índice)
+    for value, label in [(date_from, 'from'), (date_to, 'to')]:
+        if value and parse_date(value) is None:
+            raise InvalidExportFilter(f"Data inválida em '{label}': {value} (use AAAA-MM-DD)")
+    if date_from:
+        queryset = queryset.filter(submission_date__gte=_local_midnight(parse_date(date_from)))
+    if date_to:
+        next_day = parse_date(date_to) + datetime.timedelta(days=1)
+        queryset = queryset.filter(submission_date__lt=_local_midnight(next_day))
+
+    return queryset.order_by('-submission_date', '-id').values_list(*_FIELDS)
+
+
+def _record(row):
+    """Tuplo do values_list -> dicionário com as colunas exportadas (já em texto/JSON)."""
+    (pk, status, service, username, first_name, last_name, passport, nif, nationality,
+     submission_date, updated_at, appointment_date, location, ticket) = row
+    return {
+        'id': pk,
+        'reference': process_reference(pk, submission_date),
+        'status': status,
+        'service': service,
+        'username': username,
+        'full_name': f"{first_name} {last_name}".strip(),
+        'passport': passport,
+        'nif': nif,
+        'nationality': nationality,
+        'submission_date': submission_date.isoformat(),
+        'updated_at': updated_at.isoformat(),
+        'appointment_date': appointment_date.isoformat() if appointment_date else None,
+        'appointment_location': location,
+        'ticket_number': ticket,
+    }
+
+
+class _Echo:
+    """Pseudo-ficheiro: csv.writer "escreve" e nós devolvemos a linha ao gerador."""
+
+    def write(self, value):
+        return value
+
+
+def _safe_cell(value):
+    # Evita que folhas de cálculo interpretem campos do utilizador como fórmulas
+    if isinstance(value, str) and value[:1] in ('=', '+', '-', '@'):
+        return "'" + value
+    return '' if value is None else value
+
+
+def csv_lines(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(COLUMNS)
+    for row in rows:
+        record = _record(row)
+        yield writer.writerow([_safe_cell(record[name]) for name in COLUMNS])
+
+
+def jsonl_lines(rows):
+    for row in rows:
+        yield json.dumps(_record(row), ensure_ascii=False) + '\n'
+
+
+def stream_export(queryset, fmt):
+    """Gerador com o conteúdo do ficheiro, lendo a BD por blocos."""
+    rows = queryset.iterator(chunk_size=getattr(settings, 'EXPORT_CHUNK_SIZE', 2000))
+    return csv_lines(rows) if fmt == 'csv' else jsonl_lines(rows)
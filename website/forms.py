@@ -1,27 +1,44 @@
 from django import forms
 from django.contrib.auth.models import User
 from django.contrib.auth.forms import UserCreationForm
+from .catalog import get_catalog, get_service
 from .models import Process, Profile
 
 # ==============================================================================
 # 1. INICIAR NOVO PROCESSO
 # ==============================================================================
 
-class ProcessForm(forms.ModelForm):
+class ProcessForm(forms.Form):
     """
     Formulário simples para iniciar um processo.
     Apenas pede o tipo de serviço; o resto é preenchido depois.
+    As opções vêm do catálogo em memória (website/catalog.py), sem queries:
+    por isso não é um ModelForm (a validação do modelo voltaria a confirmar
+    na BD que o serviço existe).
     """
-    class Meta:
-        model = Process
-        fields = ['service_type']
-        labels = {
-            'service_type': 'Qual o tipo de Visto ou Serviço?',
-        }
-        # Widgets para aplicar estilo específico (Select Menu)
-        widgets = {
-            'service_type': forms.Select(attrs={'class': 'form-select form-select-lg'}),
-        }
+    service_type = forms.TypedChoiceField(
+        coerce=int,
+        label='Qual o tipo de Visto ou Serviço?',
+        widget=forms.Select(attrs={'class': 'form-select form-select-lg'}),
+    )
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['service_type'].choices = [('', '---------')] + get_catalog().choices()
+
+    def clean_service_type(self):
+        # O id já foi validado contra as opções; devolve o ServiceType sem ir à BD
+        service = get_service(self.cleaned_data['service_type'])
+        if service is None:
+            raise forms.ValidationError('Serviço inválido.')
+        return service.as_model()
+
+    def save(self, commit=True):
+        """Mesma interface do ModelForm: devolve o Process (gravado se commit=True)."""
+        process = Process(service_type=self.cleaned_data['service_type'])
+        if commit:
+            process.save()
+        return process
 
 
 # ==============================================================================
@@ -0,0 +1,384 @@
+# ==============================================================================
+# IMIGRAÁGIL - IMPORTERS.PY (IMPORTAÇÃO EM MASSA)
+# ==============================================================================
+# Usado pelo comando "import_data" para carregar, a partir de CSV ou JSONL:
+#   - o catálogo de serviços (ServiceType + RequiredDoc), uma linha por documento;
+#   - processos históricos de uma nova loja.
+#
+# O ficheiro é lido em streaming (linha a linha, nunca todo em memória).
+# As linhas válidas são juntas em blocos de `chunk_size`, e cada bloco é gravado
+# numa transação com bulk_create (em lotes de `batch_size`). As chaves
+# estrangeiras (serviço, utilizador) são resolvidas com mapas em memória, sem
+# uma query por linha.
+#
+# Depois de cada bloco gravado é escrito um checkpoint (nº de linhas já
+# tratadas), que permite retomar a importação após uma falha (--resume).
+
+import csv
+import json
+import os
+from abc import ABC, abstractmethod
+from collections import Counter
+from contextlib import contextmanager
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .catalog import bump_catalog_version
+from .counters import apply_deltas
+from .models import Process, RequiredDoc, ServiceType
+from .search import get_search_backend
+
+
+class RowError(ValueError):
+    """Linha inválida (a mensagem é mostrada ao utilizador com o nº da linha)."""
+
+
+# ==========================================
+# 1. LEITURA EM STREAMING
+# ==========================================
+
+def detect_format(path):
+    ext = os.path.splitext(path)[1].lower()
+    if ext in ('.jsonl', '.ndjson'):
+        return 'jsonl'
+    if ext == '.csv':
+        return 'csv'
+    raise ValueError(f"Formato desconhecido para {path}: use .csv ou .jsonl (ou indique --format).")
+
+
+def read_rows(path, fmt):
+    """Gera (nº da linha, dicionário) sem carregar o ficheiro todo em memória."""
+    with open(path, encoding='utf-8-sig', newline='') as fh:
+        if fmt == 'csv':
+            reader = csv.DictReader(fh)
+            for row in reader:
+                yield reader.line_num, row
+            return
+        for line_no, line in enumerate(fh, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError as exc:
+                row = exc  # Reportado como linha inválida pelo importador
+            yield line_no, row
+
+
+def _text(row, field, required=True, max_length=None):
+    value = row.get(field)
+    value = '' if value is None else str(value).strip()
+    if required and not value:
+        raise RowError(f"campo '{field}' em falta")
+    if max_length and len(value) > max_length:
+        raise RowError(f"campo '{field}' tem mais de {max_length} caracteres")
+    return value
+
+
+def _bool(row, field, default=True):
+    value = row.get(field)
+    if value in (None, ''):
+        return default
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in ('1', 'true', 'sim', 's', 'yes', 'y'):
+        return True
+    if text in ('0', 'false', 'nao', 'não', 'n', 'no'):
+        return False
+    raise RowError(f"campo '{field}' não é verdadeiro/falso: {value!r}")
+
+
+def _datetime(row, field, required=True):
+    value = _text(row, field, required=required)
+    if not value:
+        return None
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise RowError(f"campo '{field}' não é uma data ISO válida: {value!r}")
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+# ==========================================
+# 2. CHECKPOINT
+# ==========================================
+
+class Checkpoint:
+    """Ficheiro JSON com o número de linhas do ficheiro de origem já gravadas."""
+
+    def __init__(self, path, source):
+        self.path = path
+        self.source = os.path.abspath(source)
+
+    def load(self):
+        """Devolve a última linha gravada (0 se não houver checkpoint deste ficheiro)."""
+        try:
+            with open(self.path, encoding='utf-8') as fh:
+                data = json.load(fh)
+        except FileNotFoundError:
+            return 0
+        if data.get('source') != self.source:
+            raise ValueError(f"O checkpoint {self.path} pertence a outro ficheiro ({data.get('source')}).")
+        return data['line']
+
+    def save(self, line, stats):
+        tmp = f"{self.path}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as fh:
+            json.dump({'source': self.source, 'line': line, 'stats': stats}, fh)
+        os.replace(tmp, self.path)  # Atómico: nunca fica um checkpoint a meio
+
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+# ==========================================
+# 3. IMPORTADORES
+# ==========================================
+
+@contextmanager
+def historical_dates():
+    """
+    Desliga o auto_now/auto_now_add das datas do Process enquanto dura o bloco,
+    para o bulk_create gravar as datas históricas em vez de "agora".
+    Só para comandos (altera o campo para todo o processo Python).
+    """
+    fields = [Process._meta.get_field('submission_date'), Process._meta.get_field('updated_at')]
+    saved = [(field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, (auto_now, auto_now_add) in zip(fields, saved):
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class BaseImporter(ABC):
+    """
+    Valida linha a linha (parse_row) e grava por blocos (write_chunk).
+    As subclasses definem os dois métodos (sem eles não podem ser instanciadas).
+    """
+
+    def __init__(self, batch_size=1000):
+        self.batch_size = batch_size
+        self.stats = Counter()
+
+    @abstractmethod
+    def parse_row(self, row):
+        """Valida um dicionário da origem e devolve o item a gravar (ou lança RowError)."""
+
+    @abstractmethod
+    def write_chunk(self, items):
+        """Grava um bloco de itens (já dentro de uma transação)."""
+
+    def run(self, rows, chunk_size=5000, start_after=0, on_chunk=None, on_error=None):
+        """
+        Importa `rows` (iterável de (nº da linha, dicionário)). Linhas com
+        nº <= start_after já foram gravadas numa execução anterior e são saltadas.
+        on_chunk(última linha, stats) é chamado depois de cada bloco gravado.
+        """
+        chunk = []
+        last_line = start_after
+        for line_no, row in rows:
+            if line_no <= start_after:
+                continue
+            last_line = line_no
+            try:
+                if isinstance(row, Exception):
+                    raise RowError(f"JSON inválido ({row})")
+                chunk.append(self.parse_row(row))
+            except RowError as exc:
+                self.stats['invalid'] += 1
+                if on_error:
+                    on_error(line_no, str(exc))
+            if len(chunk) >= chunk_size:
+                self._flush(chunk, last_line, on_chunk)
+                chunk = []
+        self._flush(chunk, last_line, on_chunk)
+        return self.stats
+
+    def _flush(self, chunk, last_line, on_chunk):
+        if not chunk:
+            return
+        with transaction.atomic():
+            self.write_chunk(chunk)
+        if on_chunk:
+            on_chunk(last_line, dict(self.stats))
+
+
+class ServiceCatalogImporter(BaseImporter):
+    """
+    Colunas: service, description, estimated_wait_time, doc_name, is_mandatory.
+    Uma linha por documento; o serviço é criado na primeira linha em que aparece
+    (ou atualizado, se já existir com o mesmo nome). Documentos repetidos são ignorados.
+    """
+
+    def __init__(self, batch_size=1000):
+        super().__init__(batch_size)
+        # Mapas em memória: o catálogo é pequeno
+        self.services = {name: pk for pk, name in ServiceType.objects.values_list('id', 'name')}
+        self.docs = set(RequiredDoc.objects.values_list('service_type_id', 'doc_name'))
+
+    def parse_row(self, row):
+        wait = _text(row, 'estimated_wait_time', required=False)
+        try:
+            wait = int(wait) if wait else None
+        except ValueError:
+            raise RowError(f"campo 'estimated_wait_time' não é um número: {wait!r}")
+        return {
+            'service': _text(row, 'service', max_length=100),
+            'description': _text(row, 'description', required=False),
+            'estimated_wait_time': wait,
+            'doc_name': _text(row, 'doc_name', required=False, max_length=100),
+            'is_mandatory': _bool(row, 'is_mandatory'),
+        }
+
+    def write_chunk(self, items):
+        new_services = {}
+        for item in items:
+            if item['service'] not in self.services and item['service'] not in new_services:
+                new_services[item['service']] = ServiceType(
+                    name=item['service'],
+                    description=item['description'],
+                    estimated_wait_time=item['estimated_wait_time'] or 30,
+                )
+        for service in ServiceType.objects.bulk_create(new_services.values(), batch_size=self.batch_size):
+            self.services[service.name] = service.pk
+        self.stats['services_created'] += len(new_services)
+
+        # Serviços já existentes: atualiza descrição/prazo se vierem preenchidos
+        updates = {}
+        for item in items:
+            if item['service'] in new_services:
+                continue
+            fields = {}
+            if item['description']:
+                fields['description'] = item['description']
+            if item['estimated_wait_time'] is not None:
+                fields['estimated_wait_time'] = item['estimated_wait_time']
+            if fields:
+                updates.setdefault(self.services[item['service']], {}).update(fields)
+        for pk, fields in updates.items():
+            ServiceType.objects.filter(pk=pk).update(**fields)
+        self.stats['services_updated'] += len(updates)
+
+        docs = []
+        for item in items:
+            key = (self.services[item['service']], item['doc_name'])
+            if not item['doc_name'] or key in self.docs:
+                continue
+            self.docs.add(key)
+            docs.append(RequiredDoc(service_type_id=key[0], doc_name=key[1], is_mandatory=item['is_mandatory']))
+        RequiredDoc.objects.bulk_create(docs, batch_size=self.batch_size)
+        self.stats['docs_created'] += len(docs)
+
+        # bulk_create/update() não disparam os sinais: invalida o catálogo em cache à mão
+        if new_services or updates or docs:
+            bump_catalog_version()
+
+
+class ProcessImporter(BaseImporter):
+    """
+    Colunas: username, service, status, submission_date, updated_at (opcional),
+    submitted_at e decided_at (opcionais; por omissão submission_date e updated_at,
+    conforme o estado).
+    O serviço tem de existir. O utilizador também, a não ser que create_users=True
+    (cria contas inativas, sem palavra-passe utilizável). Um segundo processo em
+    aberto para o mesmo utilizador é ignorado (contado em 'open_conflict').
+    """
+
+    def __init__(self, batch_size=1000, create_users=False):
+        super().__init__(batch_size)
+        self.create_users = create_users
+        self.services = {name: pk for pk, name in ServiceType.objects.values_list('id', 'name')}
+        self.statuses = dict(Process.STATUS_CHOICES)
+        self.users = {}  # username -> id, preenchido bloco a bloco
+
+    def parse_row(self, row):
+        service = _text(row, 'service')
+        if service not in self.services:
+            raise RowError(f"serviço desconhecido: {service!r}")
+        status = _text(row, 'status', required=False) or 'draft'
+        if status not in self.statuses:
+            raise RowError(f"estado inválido: {status!r}")
+        submission_date = _datetime(row, 'submission_date')
+        updated_at = _datetime(row, 'updated_at', required=False) or submission_date
+        if updated_at < submission_date:
+            raise RowError("updated_at é anterior a submission_date")
+        submitted_at = decided_at = None
+        if status != 'draft':
+            submitted_at = _datetime(row, 'submitted_at', required=False) or submission_date
+        if status in Process.CLOSED_STATUSES:
+            decided_at = _datetime(row, 'decided_at', required=False) or updated_at
+        return {
+            'username': _text(row, 'username', max_length=150),
+            'service_type_id': self.services[service],
+            'status': status,
+            'submission_date': submission_date,
+            'updated_at': updated_at,
+            'submitted_at': submitted_at,
+            'decided_at': decided_at,
+        }
+
+    def _resolve_users(self, usernames):
+        missing = set(usernames) - set(self.users)
+        if not missing:
+            return
+        self.users.update(User.objects.filter(username__in=missing).values_list('username', 'id'))
+        missing -= set(self.users)
+        if missing and self.create_users:
+            new_users = [User(username=name, is_active=False, password='!') for name in sorted(missing)]
+            for user in User.objects.bulk_create(new_users, batch_size=self.batch_size):
+                self.users[user.username] = user.pk
+            self.stats['users_created'] += len(new_users)
+
+    def write_chunk(self, items):
+        self._resolve_users(item['username'] for item in items)
+        # Um só processo em aberto por utilizador (restrição one_open_process_per_user)
+        open_users = set(
+            Process.objects.filter(user_id__in={self.users.get(item['username']) for item in items})
+            .exclude(status__in=Process.CLOSED_STATUSES)
+            .values_list('user_id', flat=True)
+        )
+        processes = []
+        for item in items:
+            user_id = self.users.get(item['username'])
+            if user_id is None:
+                self.stats['unknown_user'] += 1
+                continue
+            if item['status'] not in Process.CLOSED_STATUSES:
+                if user_id in open_users:
+                    self.stats['open_conflict'] += 1
+                    continue
+                open_users.add(user_id)
+            processes.append(Process(
+                user_id=user_id,
+                service_type_id=item['service_type_id'],
+                status=item['status'],
+                submission_date=item['submission_date'],
+                updated_at=item['updated_at'],
+                submitted_at=item['submitted_at'],
+                decided_at=item['decided_at'],
+            ))
+        if not processes:
+            return
+
+        with historical_dates():
+            Process.objects.bulk_create(processes, batch_size=self.batch_size)
+
+        # O bulk_create não dispara os sinais: contadores e índice de pesquisa à mão
+        apply_deltas(Counter((p.status, p.service_type_id) for p in processes))
+        get_search_backend().index_processes([p.pk for p in processes])
+        self.stats['processes_created'] += len(processes)
+
+
+IMPORTERS = {
+    'services': ServiceCatalogImporter,
+    'processes': ProcessImporter,
+}
@@ -0,0 +1,85 @@
+# ==============================================================================
+# IMIGRAÁGIL - INGEST.PY (NORMALIZAÇÃO DAS IMAGENS ENVIADAS)
+# ==============================================================================
+# Fotografias de documentos tiradas no telemóvel chegam com 4-5MB, resolução
+# muito acima do necessário para ler o documento e metadados EXIF (modelo do
+# telemóvel, GPS...). Antes de o ficheiro ser gravado (Attachment.save), a
+# imagem é:
+#   1. rodada conforme a orientação EXIF;
+#   2. reduzida para no máximo INGEST_MAX_DIMENSION píxeis no lado maior;
+#   3. recomprimida (JPEG com INGEST_JPEG_QUALITY; PNG com transparência fica PNG),
+#      sem metadados.
+# A versão normalizada é sempre a gravada, mesmo que não fique mais pequena do
+# que o original (que teria os metadados e a orientação por corrigir): o
+# tamanho só decide entre as codificações candidatas. PDFs não são alterados.
+
+import io
+import logging
+import os
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+
+def _has_alpha(image):
+    return image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+
+
+def _encode(image, fmt, **options):
+    buffer = io.BytesIO()
+    image.save(buffer, fmt, optimize=True, **options)
+    return buffer.getvalue()
+
+
+def normalize_image(data, ext, max_dimension, quality):
+    """
+    Versão normalizada da imagem (ficheiro aberto em modo binário).
+    Devolve (bytes, extensão) da codificação mais pequena. Não compara com o original.
+    """
+    with Image.open(data) as image:
+        # No JPEG, descodifica já numa escala próxima da final (muito mais rápido)
+        image.draft('RGB', (max_dimension, max_dimension))
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+
+        # Nenhum formato recebe exif=/icc_profile=: os metadados ficam para trás
+        if _has_alpha(image):
+            return _encode(image, 'PNG'), '.png'
+        image = image.convert('RGB')
+        candidates = [(_encode(image, 'JPEG', quality=quality, progressive=True), '.jpg')]
+        if ext == '.png':
+            # Digitalizações a preto e branco às vezes comprimem melhor em PNG
+            candidates.append((_encode(image, 'PNG'), '.png'))
+        return min(candidates, key=lambda candidate: len(candidate[0]))
+
+
+def normalize_upload(file):
+    """
+    Recebe o ficheiro enviado e devolve o ficheiro a gravar: a imagem
+    normalizada (ContentFile), ou o original se não for uma imagem.
+    """
+    ext = os.path.splitext(file.name)[1].lower()
+    if not getattr(settings, 'INGEST_ENABLED', True) or ext not in IMAGE_EXTENSIONS:
+        return file
+
+    try:
+        file.seek(0)
+        data, new_ext = normalize_image(
+            file, ext,
+            getattr(settings, 'INGEST_MAX_DIMENSION', 2400),
+            getattr(settings, 'INGEST_JPEG_QUALITY', 82),
+        )
+    except Exception:
+        # Imagem que o Pillow não consegue tratar (já validada pelo tipo): guarda como veio
+        logger.exception("Não foi possível normalizar a imagem %s; guardada sem alterações.", file.name)
+        return file
+    finally:
+        file.seek(0)
+
+    base = os.path.splitext(os.path.basename(file.name))[0]
+    return ContentFile(data, name=base + new_ext)
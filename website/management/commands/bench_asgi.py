@@ -0,0 +1,143 @@
+# ==============================================================================
+# IMIGRAÁGIL - COMANDO bench_asgi
+# ==============================================================================
+# Compara, lado a lado, as páginas de leitura servidas por:
+#   - WSGI: views síncronas (core/urls.py) num pool de threads, como um
+#     servidor WSGI com N threads (--wsgi-threads);
+#   - ASGI: views async (core/urls_asgi.py, website/async_views.py) num só
+#     event loop.
+# Em ambos os casos há --clients clientes em simultâneo, cada um a fazer
+# pedidos seguidos, passando pela pilha completa do Django (middleware,
+# sessão, URLs, views, templates), sem rede. Mostra pedidos/s e latência
+# (p50/p95/p99, incluindo a espera por uma thread livre no WSGI).
+#
+# Usa os dados da base de dados configurada (carregar antes com import_data).
+#
+# Uso:
+#   python manage.py bench_asgi [--clients 500] [--requests 5000] [--wsgi-threads 32]
+#       [--path /api/processos/?page_size=20] [--path /dashboard/ --user ana]
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient, Client, override_settings
+
+from website.management.commands.bench_tickets import percentile
+from website.models import Process
+
+
+class Command(BaseCommand):
+    help = "Benchmark WSGI (views síncronas) vs ASGI (views async) com muitos clientes em simultâneo."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=500, help="Clientes em simultâneo.")
+        parser.add_argument('--requests', type=int, default=5000, help="Pedidos no total (por modo).")
+        parser.add_argument('--wsgi-threads', type=int, default=32, help="Threads do servidor WSGI simulado.")
+        parser.add_argument('--path', action='append', help="Caminho a pedir (repetível; alterna entre eles).")
+        parser.add_argument('--user', help="Utilizador com sessão iniciada (para /dashboard/, /processo/...).")
+        parser.add_argument('--mode', choices=['both', 'wsgi', 'asgi'], default='both')
+
+    def handle(self, *args, **options):
+        paths = options['path'] or ['/api/processos/?page_size=20']
+        user = None
+        if options['user']:
+            user = User.objects.filter(username=options['user']).first()
+            if user is None:
+                raise CommandError(f"Utilizador não encontrado: {options['user']}")
+        if not Process.objects.exists():
+            self.stdout.write(self.style.WARNING("Não há processos na BD: as páginas vão sair vazias."))
+
+        results = {}
+        with override_settings(ALLOWED_HOSTS=['*']):
+            if options['mode'] in ('both', 'wsgi'):
+                with override_settings(ROOT_URLCONF='core.urls'):
+                    results['WSGI'] = self._run_wsgi(paths, user, options)
+            if options['mode'] in ('both', 'asgi'):
+                with override_settings(ROOT_URLCONF='core.urls_asgi'):
+                    results['ASGI'] = asyncio.run(self._run_asgi(paths, user, options))
+
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"{options['clients']} clientes, {options['requests']} pedidos, {', '.join(paths)}"
+        ))
+        for mode, (latencies, errors, elapsed) in results.items():
+            self.stdout.write(
+                f"  {mode}  {len(latencies) / elapsed:8,.0f} pedidos/s   "
+                f"p50 {percentile(latencies, 50) * 1000:7.1f} ms   p95 {percentile(latencies, 95) * 1000:7.1f} ms   "
+                f"p99 {percentile(latencies, 99) * 1000:7.1f} ms   erros {errors}"
+            )
+
+    def _plan(self, options, paths):
+        """Caminho de cada pedido, repartido pelos clientes."""
+        per_client = [[] for _ in range(options['clients'])]
+        for i in range(options['requests']):
+            per_client[i % options['clients']].append(paths[i % len(paths)])
+        return [plan for plan in per_client if plan]
+
+    def _run_wsgi(self, paths, user, options):
+        session_client = Client()
+        if user is not None:
+            session_client.force_login(user)
+        cookies = session_client.cookies
+        local = threading.local()
+        latencies, errors = [], [0]
+        lock = threading.Lock()
+
+        def handle(path, queued_at):
+            # Um Client por thread do "servidor"; a latência inclui a espera na fila
+            if not hasattr(local, 'client'):
+                local.client = Client()
+                local.client.cookies = cookies
+            try:
+                status = local.client.get(path).status_code
+            except Exception:
+                status = 500
+            with lock:
+                latencies.append(time.perf_counter() - queued_at)
+                if status >= 400:
+                    errors[0] += 1
+
+        # Cada cliente só envia o pedido seguinte quando recebe a resposta do anterior
+        plans = self._plan(options, paths)
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['wsgi_threads']) as pool:
+            def client_loop(plan):
+                if plan:
+                    future = pool.submit(handle, plan[0], time.perf_counter())
+                    future.add_done_callback(lambda _: client_loop(plan[1:]))
+
+            for plan in plans:
+                client_loop(plan)
+            while True:
+                with lock:
+                    if len(latencies) >= options['requests']:
+                        break
+                time.sleep(0.01)
+        return latencies, errors[0], time.perf_counter() - started
+
+    async def _run_asgi(self, paths, user, options):
+        session_client = AsyncClient()
+        if user is not None:
+            await session_client.aforce_login(user)
+        latencies, errors = [], 0
+
+        async def client_loop(plan):
+            nonlocal errors
+            client = AsyncClient()
+            client.cookies = session_client.cookies
+            for path in plan:
+                sent_at = time.perf_counter()
+                try:
+                    status = (await client.get(path)).status_code
+                except Exception:
+                    status = 500
+                latencies.append(time.perf_counter() - sent_at)
+                if status >= 400:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(client_loop(plan) for plan in self._plan(options, paths)))
+        return latencies, errors, time.perf_counter() - started
@@ -0,0 +1,160 @@
+# ==============================================================================
+# IMIGRAÁGIL - COMANDO bench_db_contention
+# ==============================================================================
+# Mede a concorrência de escrita na base de dados configurada (core/database.py):
+# várias threads, cada uma com a sua ligação, repetem transações iguais às de
+#   - upload_document: troca atómica do anexo de um requisito;
+#   - submit_process_final: checklist + mudança de estado (contadores e histórico).
+# Conta os erros "database is locked" e mostra a latência por operação.
+# Os dados criados (utilizadores bench_db_*) são apagados no fim.
+# Como escreve e apaga dados (e dispara os sinais de contadores, histórico,
+# pesquisa e catálogo), só corre com uma BD indicada explicitamente em DB_NAME.
+#
+# Uso (comparar perfis numa BD de teste):
+#   DB_NAME=/tmp/bench.sqlite3 python manage.py migrate
+#   DB_NAME=/tmp/bench.sqlite3 DB_PROFILE=sqlite-basic python manage.py bench_db_contention
+#   DB_NAME=/tmp/bench.sqlite3 python manage.py bench_db_contention [--threads 8] [--ops 200]
+
+import os
+import statistics
+import threading
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, transaction
+
+from website.models import Attachment, Process, RequiredDoc, ServiceType
+
+BENCH_PREFIX = 'bench_db_'
+
+
+class Command(BaseCommand):
+    help = "Benchmark de escrita concorrente (uploads e submissões) na base de dados configurada."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8, help="Threads em simultâneo.")
+        parser.add_argument('--ops', type=int, default=200, help="Transações por thread.")
+        parser.add_argument('--docs', type=int, default=5, help="Documentos exigidos pelo serviço de teste.")
+
+    def handle(self, *args, **options):
+        if not os.environ.get('DB_NAME'):
+            raise CommandError(
+                "Este benchmark escreve e apaga dados: indicar uma BD de teste em DB_NAME "
+                "(ex: DB_NAME=/tmp/bench.sqlite3, depois de correr o migrate nessa BD)."
+            )
+        settings_dict = connection.settings_dict
+        self.stdout.write(self.style.MIGRATE_HEADING("Base de dados"))
+        self.stdout.write(f"  {settings_dict['ENGINE']} {settings_dict['NAME']} OPTIONS={settings_dict.get('OPTIONS', {})}")
+
+        service, docs, processes = self._setup(options)
+        try:
+            results = self._run(processes, docs, options)
+        finally:
+            self._cleanup(service)
+        self._report(results, options)
+
+    def _setup(self, options):
+        self._cleanup(None)
+        service = ServiceType.objects.create(name=f'{BENCH_PREFIX}servico', description='Benchmark')
+        docs = [
+            RequiredDoc.objects.create(service_type=service, doc_name=f'Documento {i + 1}')
+            for i in range(options['docs'])
+        ]
+        processes = []
+        for i in range(options['threads']):
+            # Um utilizador por thread (regra de um processo em aberto por utilizador)
+            user = User.objects.create_user(username=f'{BENCH_PREFIX}{i}')
+            processes.append(Process.objects.create(user=user, service_type=service))
+        return service, docs, processes
+
+    def _cleanup(self, service):
+        Process.objects.filter(user__username__startswith=BENCH_PREFIX).delete()
+        User.objects.filter(username__startswith=BENCH_PREFIX).delete()
+        ServiceType.objects.filter(name__startswith=BENCH_PREFIX).delete()
+
+    def _upload(self, process, doc, n):
+        # Igual a upload_document (sem o ficheiro: o nome não é de um blob, por isso não há E/S)
+        with transaction.atomic():
+            Attachment.objects.filter(process=process, required_doc=doc).delete()
+            Attachment.objects.create(process=process, required_doc=doc, file=f'documents/bench/{process.id}_{n}.pdf')
+
+    def _submit(self, process_id):
+        # Igual a submit_process_final, seguido do regresso a rascunho para a próxima volta
+        with transaction.atomic():
+            process = Process.objects.get(id=process_id)
+            process.document_checklist()
+            process.status = 'submitted'
+            process.save()
+        with transaction.atomic():
+            process.status = 'draft'
+            process.save()
+
+    def _run(self, processes, docs, options):
+        barrier = threading.Barrier(len(processes))
+        results = {'upload': [], 'submit': [], 'locked': 0, 'errors': []}
+        lock = threading.Lock()
+
+        def worker(process):
+            latencies = {'upload': [], 'submit': []}
+            locked = 0
+            try:
+                barrier.wait()
+                for n in range(options['ops']):
+                    kind = 'submit' if n % 4 == 3 else 'upload'
+                    started = time.perf_counter()
+                    try:
+                        if kind == 'upload':
+                            self._upload(process, docs[n % len(docs)], n)
+                        else:
+                            self._submit(process.id)
+                    except OperationalError as exc:
+                        if 'locked' not in str(exc):
+                            raise
+                        locked += 1
+                        continue
+                    latencies[kind].append(time.perf_counter() - started)
+            except Exception as exc:
+                with lock:
+                    results['errors'].append(repr(exc))
+            finally:
+                connection.close()
+                with lock:
+                    results['upload'].extend(latencies['upload'])
+                    results['submit'].extend(latencies['submit'])
+                    results['locked'] += locked
+
+        threads = [threading.Thread(target=worker, args=(process,)) for process in processes]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        results['elapsed'] = time.perf_counter() - started
+        return results
+
+    def _report(self, results, options):
+        attempted = options['threads'] * options['ops']
+        done = len(results['upload']) + len(results['submit'])
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"{options['threads']} threads x {options['ops']} transações em {results['elapsed']:.2f}s"
+        ))
+        for kind in ('upload', 'submit'):
+            latencies = sorted(results[kind])
+            if not latencies:
+                continue
+            p95 = latencies[int(len(latencies) * 0.95) - 1] if len(latencies) >= 20 else latencies[-1]
+            self.stdout.write(
+                f"  {kind:<7} {len(latencies):>6} ok  p50 {statistics.median(latencies) * 1000:7.1f} ms  "
+                f"p95 {p95 * 1000:7.1f} ms  máx {latencies[-1] * 1000:7.1f} ms"
+            )
+        self.stdout.write(f"  {done / results['elapsed']:,.0f} transações/s")
+
+        for error in results['errors']:
+            self.stderr.write(f"  erro: {error}")
+        if results['locked'] or results['errors']:
+            self.stdout.write(self.style.ERROR(
+                f"{results['locked']} de {attempted} transações falharam com 'database is locked'."
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS("Sem erros 'database is locked'."))
@@ -0,0 +1,370 @@
+# ==============================================================================
+# IMIGRAÁGIL - COMANDO bench_routes
+# ==============================================================================
+# Benchmark de ponta a ponta de todas as rotas com nome de website/urls.py.
+#   1. Cria um conjunto de dados realista (processos históricos via
+#      ProcessImporter, um serviço com documentos, um utilizador por cliente).
+#   2. Para cada rota, --clients threads (cada uma com o seu Client e sessão)
+#      fazem --iterations pedidos. O estado de que o pedido precisa (rascunho,
+#      anexo, agendamento...) é preparado antes de cada pedido, fora da medição.
+#   3. Mostra p50/p95/p99, pedidos/s e nº de queries SQL por rota e, com
+#      --output, grava tudo em JSON.
+#   4. Com --baseline, compara com um JSON anterior e falha (código de saída 1)
+#      se alguma rota piorar mais do que --threshold.
+# Os dados criados (utilizadores bench_routes_*) são apagados no fim; os
+# ficheiros e PDFs vão para pastas temporárias.
+#
+# Uso (de preferência numa BD de teste):
+#   DB_NAME=/tmp/bench.sqlite3 python manage.py migrate
+#   DB_NAME=/tmp/bench.sqlite3 python manage.py bench_routes --output baseline.json
+#   DB_NAME=/tmp/bench.sqlite3 python manage.py bench_routes --baseline baseline.json [--threshold 0.25]
+
+import datetime
+import io
+import json
+import random
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import get_resolver, reverse
+from django.utils import timezone
+from PIL import Image
+from pypdf import PdfWriter
+
+from website import tickets
+from website.importers import ProcessImporter
+from website.management.commands.bench_tickets import percentile
+from website.models import Appointment, AppointmentSlot, Attachment, Process, RequiredDoc, ServiceType
+from website.scheduling import book_appointment
+
+BENCH_PREFIX = 'bench_routes_'
+BENCH_LOCATION = 'Loja Benchmark'
+
+
+def _pdf_content():
+    buffer = io.BytesIO()
+    writer = PdfWriter()
+    writer.add_blank_page(595, 842)
+    writer.write(buffer)
+    return buffer.getvalue()
+
+
+def _png_content():
+    buffer = io.BytesIO()
+    Image.effect_noise((1200, 800), 30).convert('RGB').save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def compare_results(baseline, current, threshold, query_threshold):
+    """
+    Lista de regressões (texto) de `current` face a `baseline` (dicionários do JSON):
+    p95 ou pedidos/s piores do que `threshold` (fração) ou mais queries por
+    pedido do que `query_threshold`. Rotas que não existem na baseline são ignoradas.
+    """
+    regressions = []
+    for name, now in sorted(current['routes'].items()):
+        before = baseline.get('routes', {}).get(name)
+        if before is None:
+            continue
+        if before['p95_ms'] and now['p95_ms'] > before['p95_ms'] * (1 + threshold):
+            regressions.append(f"{name}: p95 {before['p95_ms']:.1f} -> {now['p95_ms']:.1f} ms")
+        if before['rps'] and now['rps'] < before['rps'] * (1 - threshold):
+            regressions.append(f"{name}: {before['rps']:.1f} -> {now['rps']:.1f} pedidos/s")
+        if now['queries_avg'] > before['queries_avg'] + query_threshold:
+            regressions.append(f"{name}: {before['queries_avg']:.1f} -> {now['queries_avg']:.1f} queries/pedido")
+        if now['errors'] > before['errors']:
+            regressions.append(f"{name}: {before['errors']} -> {now['errors']} erros")
+    return regressions
+
+
+class _ClientState:
+    """Um cliente do benchmark: o seu utilizador e as sessões (própria, staff e anónima)."""
+
+    def __init__(self, user, staff):
+        self.user = user
+        self.client = Client()
+        self.client.force_login(user)
+        self.staff_client = Client()
+        self.staff_client.force_login(staff)
+        self.anonymous_client = Client()
+
+
+class Command(BaseCommand):
+    help = "Benchmark de latência de todas as rotas (p50/p95/p99, pedidos/s, queries) com comparação a uma baseline."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=8, help="Clientes (threads) em simultâneo por rota.")
+        parser.add_argument('--iterations', type=int, default=10, help="Pedidos por cliente em cada rota.")
+        parser.add_argument('--processes', type=int, default=5000, help="Processos históricos a criar.")
+        parser.add_argument('--route', action='append', help="Só estas rotas (nome do URL; repetível).")
+        parser.add_argument('--output', help="Grava os resultados neste ficheiro JSON.")
+        parser.add_argument('--baseline', help="JSON de uma execução anterior, para comparar.")
+        parser.add_argument('--threshold', type=float, default=0.25, help="Piora relativa tolerada (0.25 = 25%%).")
+        parser.add_argument('--query-threshold', type=float, default=0.5, help="Queries a mais por pedido toleradas.")
+        parser.add_argument('--seed', type=int, default=42, help="Semente dos dados aleatórios.")
+
+    def handle(self, *args, **options):
+        routes = self._routes()
+        selected = options['route'] or list(routes)
+        unknown = set(selected) - set(routes)
+        if unknown:
+            raise CommandError(f"Rotas desconhecidas: {', '.join(sorted(unknown))}")
+        baseline = None
+        if options['baseline']:
+            with open(options['baseline'], encoding='utf-8') as fh:
+                baseline = json.load(fh)
+
+        with tempfile.TemporaryDirectory() as media_dir, tempfile.TemporaryDirectory() as pdf_dir:
+            with override_settings(
+                ALLOWED_HOSTS=['*'],
+                MEDIA_ROOT=media_dir,
+                PDF_CACHE_DIR=Path(pdf_dir),
+                TICKET_RENDER_WORKERS=0,
+                PREVIEW_WORKERS=0,
+                APPOINTMENT_LOCATIONS=[BENCH_LOCATION],
+            ):
+                tickets.get_ticket_cache.cache_clear()
+                self._cleanup()
+                try:
+                    self._seed(options)
+                    results = {name: self._run_route(name, routes[name], options) for name in selected}
+                finally:
+                    self._cleanup()
+                    tickets.get_ticket_cache.cache_clear()
+
+        report = {
+            'meta': {
+                'created_at': timezone.now().isoformat(),
+                'database': connection.vendor,
+                'clients': options['clients'],
+                'iterations': options['iterations'],
+                'processes': options['processes'],
+            },
+            'routes': results,
+        }
+        self._print(report)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as fh:
+                json.dump(report, fh, indent=2, ensure_ascii=False)
+            self.stdout.write(f"Resultados gravados em {options['output']}.")
+
+        if baseline is not None:
+            regressions = compare_results(baseline, report, options['threshold'], options['query_threshold'])
+            if regressions:
+                for line in regressions:
+                    self.stdout.write(self.style.ERROR(f"  REGRESSÃO {line}"))
+                raise CommandError(f"{len(regressions)} regressões face a {options['baseline']}.")
+            self.stdout.write(self.style.SUCCESS(f"Sem regressões face a {options['baseline']}."))
+
+    # ==========================================
+    # DADOS
+    # ==========================================
+
+    def _seed(self, options):
+        rng = random.Random(options['seed'])
+        self.service = ServiceType.objects.create(name=f'{BENCH_PREFIX}Visto D7', description='Benchmark')
+        self.docs = [
+            RequiredDoc.objects.create(service_type=self.service, doc_name=name, is_mandatory=True)
+            for name in ['Passaporte', 'Extrato Bancário', 'Registo Criminal']
+        ]
+        self.staff = User.objects.create_user(username=f'{BENCH_PREFIX}staff', is_staff=True)
+        self.pdf = _pdf_content()
+        self.png = _png_content()
+
+        # Histórico: ~3 processos por utilizador, só o primeiro pode estar em aberto
+        total = options['processes']
+        users = max(1, total // 3)
+        now = timezone.now()
+        rows = []
+        for i in range(total):
+            submitted = now - datetime.timedelta(days=rng.uniform(0, 365))
+            if i < users and rng.random() < 0.3:
+                status, updated = rng.choice(['submitted', 'review']), submitted
+            else:
+                status = rng.choice(['approved', 'approved', 'rejected'])
+                updated = min(now, submitted + datetime.timedelta(days=rng.uniform(1, 60)))
+            rows.append((i + 1, {
+                'username': f'{BENCH_PREFIX}h{i % users}',
+                'service': self.service.name,
+                'status': status,
+                'submission_date': submitted.isoformat(),
+                'updated_at': updated.isoformat(),
+            }))
+        ProcessImporter(create_users=True).run(rows)
+
+        self.clients = [
+            _ClientState(User.objects.create_user(username=f'{BENCH_PREFIX}c{i}'), self.staff)
+            for i in range(options['clients'])
+        ]
+
+    def _cleanup(self):
+        for attachment in Attachment.objects.filter(process__user__username__startswith=BENCH_PREFIX):
+            attachment.delete()
+        Process.objects.filter(user__username__startswith=BENCH_PREFIX).delete()
+        User.objects.filter(username__startswith=BENCH_PREFIX).delete()
+        ServiceType.objects.filter(name__startswith=BENCH_PREFIX).delete()
+        AppointmentSlot.objects.filter(location=BENCH_LOCATION).delete()
+
+    def _draft(self, user):
+        """O processo em aberto do utilizador, em rascunho (criado se não existir)."""
+        process = Process.objects.filter(user=user).exclude(status__in=Process.CLOSED_STATUSES).first()
+        if process is None:
+            return Process.objects.create(user=user, service_type=self.service)
+        if process.status != 'draft':
+            process.status = 'draft'
+            process.save()
+        return process
+
+    def _approved(self, user):
+        process = Process.objects.filter(user=user, status='approved').first()
+        return process or Process.objects.create(user=user, service_type=self.service, status='approved')
+
+    def _attach(self, process, doc, name, content):
+        existing = Attachment.objects.filter(process=process, required_doc=doc).first()
+        if existing is not None:
+            return existing
+        return Attachment.objects.create(process=process, required_doc=doc, file=SimpleUploadedFile(name, content))
+
+    # ==========================================
+    # ROTAS
+    # ==========================================
+    # Cada rota prepara o estado (fora da medição) e devolve (client, método, url, dados).
+
+    def _routes(self):
+        routes = {
+            'home': lambda s: (s.anonymous_client, 'get', reverse('home'), None),
+            'api_get_processes': lambda s: (s.anonymous_client, 'get', reverse('api_get_processes') + '?page_size=20', None),
+            'signup': lambda s: (s.anonymous_client, 'get', reverse('signup'), None),
+            'dashboard': lambda s: (s.client, 'get', reverse('dashboard'), None),
+            'edit_profile': lambda s: (s.client, 'get', reverse('edit_profile'), None),
+            'create_process': self._create_process,
+            'process_detail': lambda s: (s.client, 'get', reverse('process_detail', args=[self._draft(s.user).id]), None),
+            'upload_document': self._upload_document,
+            'submit_process_final': self._submit_process_final,
+            'cancel_process': lambda s: (s.client, 'get', reverse('cancel_process', args=[self._draft(s.user).id]), None),
+            'delete_document': self._delete_document,
+            'document_preview': self._document_preview,
+            'generate_appointment': self._generate_appointment,
+            'generate_pdf': self._generate_pdf,
+            'manager_dashboard': lambda s: (s.staff_client, 'get', reverse('manager_dashboard'), None),
+            'manager_analytics': lambda s: (s.staff_client, 'get', reverse('manager_analytics'), None),
+            'manager_export': lambda s: (s.staff_client, 'get', reverse('manager_export') + '?format=csv', None),
+            'metrics': lambda s: (s.staff_client, 'get', reverse('metrics'), None),
+        }
+        # Uma rota nova em website/urls.py sem cenário aqui é um erro (não fica de fora em silêncio)
+        missing = {p.name for p in get_resolver('website.urls').url_patterns if p.name} - set(routes)
+        if missing:
+            raise CommandError(f"Rotas sem cenário no benchmark: {', '.join(sorted(missing))}")
+        return routes
+
+    def _create_process(self, state):
+        Process.objects.filter(user=state.user).exclude(status__in=Process.CLOSED_STATUSES).delete()
+        return state.client, 'post', reverse('create_process'), {'service_type': self.service.id}
+
+    def _upload_document(self, state):
+        process = self._draft(state.user)
+        Attachment.objects.filter(process=process, required_doc=self.docs[0]).delete()
+        data = {'doc_type_id': self.docs[0].id, 'file': SimpleUploadedFile('passaporte.pdf', self.pdf)}
+        return state.client, 'post', reverse('upload_document', args=[process.id]), data
+
+    def _submit_process_final(self, state):
+        process = self._draft(state.user)
+        for doc in self.docs:
+            self._attach(process, doc, 'documento.pdf', self.pdf)
+        return state.client, 'get', reverse('submit_process_final', args=[process.id]), None
+
+    def _delete_document(self, state):
+        attachment = self._attach(self._draft(state.user), self.docs[0], 'passaporte.pdf', self.pdf)
+        return state.client, 'get', reverse('delete_document', args=[attachment.id]), None
+
+    def _document_preview(self, state):
+        attachment = self._attach(self._draft(state.user), self.docs[1], 'extrato.png', self.png)
+        return state.client, 'get', reverse('document_preview', args=[attachment.id]), None
+
+    def _generate_appointment(self, state):
+        process = self._approved(state.user)
+        Appointment.objects.filter(process=process).delete()
+        return state.client, 'get', reverse('generate_appointment', args=[process.id]), None
+
+    def _generate_pdf(self, state):
+        process = self._approved(state.user)
+        appointment = Appointment.objects.filter(process=process).first() or book_appointment(process)
+        return state.client, 'get', reverse('generate_pdf', args=[appointment.id]), None
+
+    # ==========================================
+    # EXECUÇÃO
+    # ==========================================
+
+    def _run_route(self, name, scenario, options):
+        latencies, queries, errors = [], [], [0]
+        busy = []  # tempo medido de cada cliente (sem a preparação)
+        lock = threading.Lock()
+        barrier = threading.Barrier(len(self.clients))
+
+        def worker(state):
+            measured = 0.0
+            try:
+                barrier.wait()
+                for _ in range(options['iterations']):
+                    client, method, url, data = scenario(state)
+                    with CaptureQueriesContext(connection) as ctx:
+                        started = time.perf_counter()
+                        response = getattr(client, method)(url, data) if data else getattr(client, method)(url)
+                        if response.streaming:
+                            for _chunk in response.streaming_content:
+                                pass
+                        elapsed = time.perf_counter() - started
+                    measured += elapsed
+                    with lock:
+                        latencies.append(elapsed)
+                        queries.append(len(ctx.captured_queries))
+                        if response.status_code >= 400:
+                            errors[0] += 1
+            except Exception as exc:
+                with lock:
+                    errors[0] += 1
+                self.stderr.write(f"  {name}: {exc!r}")
+            finally:
+                connection.close()
+                with lock:
+                    busy.append(measured)
+
+        threads = [threading.Thread(target=worker, args=(state,)) for state in self.clients]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        # Pedidos/s com os clientes em paralelo, descontando a preparação (não medida)
+        wall = max(busy, default=0.0)
+
+        return {
+            'requests': len(latencies),
+            'errors': errors[0],
+            'rps': round(len(latencies) / wall, 2) if wall else 0.0,
+            'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+            'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+            'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+            'queries_avg': round(sum(queries) / len(queries), 2) if queries else 0.0,
+            'queries_max': max(queries, default=0),
+        }
+
+    def _print(self, report):
+        meta = report['meta']
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"{meta['clients']} clientes x {meta['iterations']} pedidos por rota, "
+            f"{meta['processes']} processos históricos ({meta['database']})"
+        ))
+        self.stdout.write(f"  {'rota':<22} {'pedidos/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'queries':>8} {'erros':>6}")
+        for name, row in report['routes'].items():
+            self.stdout.write(
+                f"  {name:<22} {row['rps']:>9.1f} {row['p50_ms']:>8.1f} {row['p95_ms']:>8.1f} "
+                f"{row['p99_ms']:>8.1f} {row['queries_avg']:>8.1f} {row['errors']:>6}"
+            )
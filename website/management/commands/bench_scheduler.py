@@ -0,0 +1,92 @@
+# ==============================================================================
+# IMIGRAÁGIL - COMANDO bench_scheduler
+# ==============================================================================
+# Mede o alocador de vagas (website/scheduling.py):
+#   - alocação em massa de N lugares, em lotes (uma transação por lote);
+#   - alocação individual (compare-and-swap), como no generate_appointment.
+# Tudo corre numa transação desfeita no fim; verifica que nenhuma vaga
+# ficou acima da capacidade.
+#
+# Uso:
+#   python manage.py bench_scheduler [--slots 100000] [--batch 1000] [--single 500]
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import F, Sum
+from django.test import override_settings
+
+from website.models import AppointmentSlot
+from website.scheduling import allocate_slot, allocate_slots
+
+
+class _Rollback(Exception):
+    """Usada para desfazer as vagas criadas pelo benchmark."""
+
+
+class Command(BaseCommand):
+    help = "Benchmark do alocador de vagas de atendimento."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--slots', type=int, default=100000, help="Lugares a reservar em massa.")
+        parser.add_argument('--batch', type=int, default=1000, help="Lugares por transação na alocação em massa.")
+        parser.add_argument('--single', type=int, default=500, help="Lugares a reservar um a um.")
+        parser.add_argument('--locations', type=int, default=10, help="Número de locais de atendimento.")
+        parser.add_argument('--capacity', type=int, default=10, help="Capacidade de cada vaga.")
+
+    def handle(self, *args, **options):
+        total = options['slots'] + options['single']
+        locations = [f"Loja Benchmark {i + 1}" for i in range(options['locations'])]
+        per_day = len(locations) * options['capacity'] * 16
+        horizon = int(total / per_day * 7 / 5) + 30  # dias úteis -> dias de calendário, com folga
+
+        with override_settings(
+            APPOINTMENT_LOCATIONS=locations,
+            APPOINTMENT_SLOT_CAPACITY=options['capacity'],
+            APPOINTMENT_HORIZON_DAYS=horizon,
+        ):
+            try:
+                with transaction.atomic():
+                    # Isola o benchmark das vagas reais que já existam
+                    AppointmentSlot.objects.all().delete()
+                    self._run(options)
+                    raise _Rollback()
+            except _Rollback:
+                pass
+
+    def _run(self, options):
+        started = time.perf_counter()
+        remaining = options['slots']
+        while remaining:
+            size = min(options['batch'], remaining)
+            allocate_slots(size)
+            remaining -= size
+        bulk_elapsed = time.perf_counter() - started
+
+        started = time.perf_counter()
+        for _ in range(options['single']):
+            allocate_slot()
+        single_elapsed = time.perf_counter() - started
+
+        overbooked = AppointmentSlot.objects.filter(booked__gt=F('capacity')).count()
+        booked = AppointmentSlot.objects.aggregate(total=Sum('booked'))['total'] or 0
+        expected = options['slots'] + options['single']
+        if overbooked or booked != expected:
+            raise CommandError(f"Inconsistência: {booked} lugares ocupados (esperado {expected}), {overbooked} vagas acima da capacidade.")
+
+        last = AppointmentSlot.objects.filter(booked__gt=0).order_by('-date').values_list('date', flat=True).first()
+        self.stdout.write(self.style.MIGRATE_HEADING("Alocação em massa"))
+        self.stdout.write(
+            f"  {options['slots']} lugares em {bulk_elapsed:.2f}s "
+            f"({options['slots'] / bulk_elapsed:,.0f} lugares/s, lotes de {options['batch']})"
+        )
+        if options['single']:
+            self.stdout.write(self.style.MIGRATE_HEADING("Alocação individual (compare-and-swap)"))
+            self.stdout.write(
+                f"  {options['single']} lugares em {single_elapsed:.2f}s "
+                f"({options['single'] / single_elapsed:,.0f} lugares/s)"
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"Sem sobrelotação. {AppointmentSlot.objects.count()} vagas criadas; última data ocupada: {last}."
+        ))
@@ -0,0 +1,122 @@
+# ==============================================================================
+# IMIGRAÁGIL - COMANDO bench_tickets
+# ==============================================================================
+# Mede a latência do download da senha em PDF (generate_pdf):
+#   - "antes": cache vazia, o PDF é gerado dentro do pedido
+#   - "depois": PDFs pré-gerados no pool de processos ao marcar o agendamento
+# Os dados de teste são criados numa transação desfeita no fim.
+#
+# Uso:
+#   python manage.py bench_tickets [--appointments 40] [--workers 4]
+
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from website import tickets
+from website.models import Appointment, Process, Profile, ServiceType
+
+
+class _Rollback(Exception):
+    """Usada para desfazer os dados do benchmark."""
+
+
+def percentile(values, pct):
+    """Percentil por interpolação linear (values não precisa de estar ordenado)."""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    rank = (len(ordered) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+class Command(BaseCommand):
+    help = "Benchmark da latência de download das senhas em PDF (antes/depois da pré-geração)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--appointments', type=int, default=40, help="Número de agendamentos de teste.")
+        parser.add_argument('--workers', type=int, default=4, help="Processos do pool de pré-geração.")
+
+    def handle(self, *args, **options):
+        n = options['appointments']
+        with tempfile.TemporaryDirectory() as cache_dir:
+            with override_settings(
+                PDF_CACHE_DIR=Path(cache_dir),
+                TICKET_RENDER_WORKERS=options['workers'],
+                ALLOWED_HOSTS=['*'],
+            ):
+                tickets.get_ticket_cache.cache_clear()
+                try:
+                    with transaction.atomic():
+                        user, appointment_ids = self._create_data(n)
+                        client = Client()
+                        client.force_login(user)
+
+                        tickets.get_ticket_cache().clear()
+                        before = self._download_all(client, appointment_ids)
+
+                        tickets.get_ticket_cache().clear()
+                        started = time.perf_counter()
+                        futures = tickets.enqueue_ticket_renders(appointment_ids)
+                        for future in futures:
+                            future.result()
+                        prerender = time.perf_counter() - started
+                        after = self._download_all(client, appointment_ids)
+                        raise _Rollback()
+                except _Rollback:
+                    pass
+                finally:
+                    tickets.get_ticket_cache.cache_clear()
+
+        self._report('Antes (gerado no pedido)', before)
+        self._report('Depois (pré-gerado no pool)', after)
+        self.stdout.write(
+            f"Pré-geração de {n} PDFs com {options['workers']} processos: "
+            f"{prerender:.2f}s ({n / prerender:.1f} PDFs/s)"
+        )
+
+    def _create_data(self, n):
+        user = User.objects.create_user(username=f'bench_tickets_{time.time_ns()}', first_name='Bench', last_name='Tickets')
+        Profile.objects.create(user=user, passport='BENCH0001')
+        service = ServiceType.objects.create(name='Serviço Benchmark', description='bench_tickets')
+        processes = Process.objects.bulk_create([
+            Process(user=user, service_type=service, status='approved') for _ in range(n)
+        ])
+        now = timezone.now()
+        appointments = Appointment.objects.bulk_create([
+            Appointment(
+                process=process,
+                appointment_date=now + timezone.timedelta(days=10),
+                ticket_number=f'BENCH-{process.id}',
+            )
+            for process in processes
+        ])
+        return user, [appointment.id for appointment in appointments]
+
+    def _download_all(self, client, appointment_ids):
+        latencies = []
+        for appointment_id in appointment_ids:
+            url = reverse('generate_pdf', args=[appointment_id])
+            started = time.perf_counter()
+            response = client.get(url)
+            latencies.append((time.perf_counter() - started) * 1000)
+            if response.status_code != 200:
+                self.stderr.write(f"Resposta inesperada {response.status_code} para {url}")
+        return latencies
+
+    def _report(self, label, latencies):
+        self.stdout.write(self.style.MIGRATE_HEADING(label))
+        self.stdout.write(
+            f"  p50={percentile(latencies, 50):.1f}ms  p95={percentile(latencies, 95):.1f}ms  "
+            f"p99={percentile(latencies, 99):.1f}ms  média={statistics.mean(latencies):.1f}ms"
+        )
@@ -0,0 +1,139 @@
+# ==============================================================================
+# IMIGRAÁGIL - COMANDO close_duplicate_open_processes
+# ==============================================================================
+# A migração 0015 (um só processo em aberto por utilizador) recusa-se a correr
+# enquanto houver utilizadores com vários processos em aberto. Este comando
+# lista esses casos e, com --apply, resolve-os: fica aberto o processo mais
+# recente de cada utilizador e os outros
+#   - submetidos / em análise: passam a "Rejeitado / Devolvido" (histórico e
+#     contadores atualizados);
+#   - rascunhos: só são apagados com --delete-drafts (não podem ser
+#     rejeitados); sem essa opção ficam na lista para resolver à mão.
+#
+# Corre numa BD parada na 0014: só usa colunas que já existiam nessa altura
+# (nada de transition_processes() nem de delete(), que carregam os modelos
+# inteiros, com colunas das migrações seguintes).
+#
+# Uso:
+#   python manage.py close_duplicate_open_processes           # só mostra
+#   python manage.py close_duplicate_open_processes --apply [--delete-drafts]
+
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from website.counters import apply_deltas, status_deltas
+from website.models import Appointment, Attachment, Process, ProcessStatusChange
+from website.scheduling import release_slots
+from website.search import get_search_backend
+from website.storage import attachment_storage, release_references
+
+
+def duplicate_open_processes():
+    """{user_id: [(id, estado), ...]} dos processos em aberto a mais (sem o mais recente de cada um)."""
+    open_processes = Process.objects.exclude(status__in=Process.CLOSED_STATUSES)
+    user_ids = (
+        open_processes.values('user_id').annotate(total=Count('id')).filter(total__gt=1)
+        .values_list('user_id', flat=True)
+    )
+    extras = {}
+    for user_id in sorted(user_ids):
+        rows = list(
+            open_processes.filter(user_id=user_id).order_by('-submission_date', '-id').values_list('id', 'status')
+        )
+        extras[user_id] = rows[1:]
+    return extras
+
+
+def reject_processes(ids):
+    """Passa os processos a rejeitados (só estado e updated_at), com histórico e contadores."""
+    with transaction.atomic():
+        rows = list(
+            Process.objects.filter(id__in=ids).exclude(status__in=Process.CLOSED_STATUSES)
+            .select_for_update().values_list('id', 'status', 'service_type_id')
+        )
+        now = timezone.now()
+        Process.objects.filter(id__in=[pk for pk, _, _ in rows]).update(status='rejected', updated_at=now)
+        apply_deltas(status_deltas(rows, 'rejected'))
+        ProcessStatusChange.objects.bulk_create([
+            ProcessStatusChange(process_id=pk, from_status=status, to_status='rejected', changed_at=now)
+            for pk, status, _ in rows
+        ])
+    return len(rows)
+
+
+def delete_drafts(ids):
+    """
+    Apaga os rascunhos com DELETEs diretos, fazendo à mão o que os sinais
+    fariam: contadores, índice de pesquisa, ficheiros e lugares nas vagas.
+    """
+    with transaction.atomic():
+        rows = list(
+            Process.objects.filter(id__in=ids, status='draft')
+            .select_for_update().values_list('id', 'status', 'service_type_id')
+        )
+        ids = [pk for pk, _, _ in rows]
+        files = list(Attachment.objects.filter(process_id__in=ids).values_list('file', flat=True))
+        slots = list(Appointment.objects.filter(process_id__in=ids).values_list('slot_id', flat=True))
+        for queryset in (
+            Attachment.objects.filter(process_id__in=ids),
+            Appointment.objects.filter(process_id__in=ids),
+            ProcessStatusChange.objects.filter(process_id__in=ids),
+            Process.objects.filter(id__in=ids),
+        ):
+            queryset._raw_delete(queryset.db)
+        release_references(files, attachment_storage())
+        release_slots(slots)
+        removed = Counter()
+        for _, status, service_type_id in rows:
+            removed[(status, service_type_id)] -= 1
+        apply_deltas(removed)
+        get_search_backend().remove_processes(ids)
+    return len(rows)
+
+
+class Command(BaseCommand):
+    help = "Lista (e com --apply fecha) os processos em aberto a mais de cada utilizador."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--apply', action='store_true', help="Aplica as alterações (sem esta opção só mostra).")
+        parser.add_argument(
+            '--delete-drafts', action='store_true',
+            help="Com --apply, apaga também os rascunhos a mais (e os seus anexos).",
+        )
+
+    def handle(self, *args, **options):
+        extras = duplicate_open_processes()
+        if not extras:
+            self.stdout.write(self.style.SUCCESS("Nenhum utilizador tem mais do que um processo em aberto."))
+            return
+
+        for user_id, rows in extras.items():
+            listed = ', '.join(f"#{pk} ({status})" for pk, status in rows)
+            self.stdout.write(f"  utilizador #{user_id}: a fechar {listed}")
+        to_reject = [pk for rows in extras.values() for pk, status in rows if status != 'draft']
+        drafts = [pk for rows in extras.values() for pk, status in rows if status == 'draft']
+        self.stdout.write(
+            f"{len(extras)} utilizador(es): {len(to_reject)} processo(s) a rejeitar, {len(drafts)} rascunho(s)."
+        )
+        if not options['apply']:
+            self.stdout.write(self.style.WARNING("Nada foi alterado (usar --apply)."))
+            return
+
+        if to_reject:
+            self.stdout.write(f"{reject_processes(to_reject)} processo(s) rejeitados.")
+        if drafts and options['delete_drafts']:
+            self.stdout.write(f"{delete_drafts(drafts)} rascunho(s) apagados.")
+        elif drafts:
+            self.stdout.write(self.style.WARNING(
+                f"{len(drafts)} rascunho(s) ficaram por resolver (usar --delete-drafts ou tratar à mão)."
+            ))
+
+        remaining = sum(len(rows) for rows in duplicate_open_processes().values())
+        if remaining:
+            self.stdout.write(self.style.WARNING(f"Ainda há {remaining} processo(s) em aberto a mais."))
+        else:
+            self.stdout.write(self.style.SUCCESS("Já é possível aplicar a migração 0015."))
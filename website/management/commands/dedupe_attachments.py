@@ -0,0 +1,123 @@
+# ==============================================================================
+# IMIGRAÁGIL - COMANDO dedupe_attachments
+# ==============================================================================
+# Migra os anexos antigos (documents/AAAA/MM/...) para o armazenamento por
+# conteúdo (documents/sha256/...), juntando ficheiros repetidos num só.
+# No fim recalcula a contagem de referências (StoredBlob) a partir dos anexos
+# e apaga os ficheiros órfãos (sem StoredBlob: ex. uploads cuja transação foi
+# desfeita depois de o ficheiro ir para o disco).
+#
+# Uso:
+#   python manage.py dedupe_attachments --dry-run   # só mostra o que pouparia
+#   python manage.py dedupe_attachments
+
+import hashlib
+import os
+import shutil
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+
+from website.models import Attachment, StoredBlob
+from website.storage import BLOB_PREFIX, attachment_storage, blob_name, delete_orphan_blobs, orphan_blob_names
+
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for chunk in iter(lambda: fh.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class Command(BaseCommand):
+    help = "Deduplica os ficheiros dos anexos e recalcula a contagem de referências."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Não altera nada; só mostra o resultado.")
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        storage = attachment_storage()
+
+        legacy = (
+            Attachment.objects.exclude(file='')
+            .exclude(file__startswith=BLOB_PREFIX + '/')
+            .order_by('id')
+            .values_list('id', 'file')
+        )
+
+        migrated = missing = duplicates = 0
+        bytes_saved = 0
+        seen_digests = set()
+        old_names = set()
+
+        for pk, name in legacy.iterator(chunk_size=1000):
+            old_path = storage.path(name)
+            if not os.path.exists(old_path):
+                missing += 1
+                self.stderr.write(f"Ficheiro em falta para o anexo #{pk}: {name}")
+                continue
+
+            digest = file_sha256(old_path)
+            target = blob_name(digest, os.path.splitext(name)[1])
+            target_path = storage.path(target)
+            already_stored = digest in seen_digests or os.path.exists(target_path)
+            if already_stored and name not in old_names:
+                duplicates += 1
+                bytes_saved += os.path.getsize(old_path)
+            seen_digests.add(digest)
+            migrated += 1
+
+            if dry_run:
+                old_names.add(name)
+                continue
+
+            if not os.path.exists(target_path):
+                os.makedirs(os.path.dirname(target_path), exist_ok=True)
+                try:
+                    os.link(old_path, target_path)  # Mesmo inode: sem copiar bytes
+                except OSError:
+                    shutil.copy2(old_path, target_path)
+            Attachment.objects.filter(pk=pk).update(file=target, sha256=digest)
+            old_names.add(name)
+
+        if not dry_run:
+            # Só apaga os ficheiros antigos que já nenhum anexo usa
+            for name in old_names:
+                if not Attachment.objects.filter(file=name).exists():
+                    storage.delete(name)
+            blobs = self._reconcile(storage)
+            orphans = delete_orphan_blobs(storage)
+        else:
+            blobs = StoredBlob.objects.count()
+            orphans = sum(1 for _ in orphan_blob_names(storage))
+
+        prefix = "[SIMULAÇÃO] " if dry_run else ""
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix}{migrated} anexos migrados, {duplicates} duplicados, "
+            f"{bytes_saved / (1024 * 1024):.1f}MB poupados, {missing} ficheiros em falta. "
+            f"Ficheiros únicos registados: {blobs}. Ficheiros órfãos apagados: {orphans}."
+        ))
+
+    def _reconcile(self, storage):
+        """Reconstrói a tabela StoredBlob a partir dos anexos existentes."""
+        counts = (
+            Attachment.objects.filter(file__startswith=BLOB_PREFIX + '/')
+            .values('file')
+            .annotate(total=Count('id'))
+            .order_by()
+        )
+        blobs = [
+            StoredBlob(
+                name=row['file'],
+                size=storage.size(row['file']) if storage.exists(row['file']) else 0,
+                ref_count=row['total'],
+            )
+            for row in counts
+        ]
+        with transaction.atomic():
+            StoredBlob.objects.all().delete()
+            StoredBlob.objects.bulk_create(blobs, batch_size=1000)
+        return len(blobs)
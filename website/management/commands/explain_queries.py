@@ -0,0 +1,213 @@
+# ==============================================================================
+# IMIGRAÁGIL - COMANDO explain_queries
+# ==============================================================================
+# Corre EXPLAIN QUERY PLAN sobre as queries de cada view e avisa se alguma
+# faz um "full scan" a uma tabela grande.
+#
+# Uso:
+#   python manage.py explain_queries                    # BD atual
+#   python manage.py explain_queries --synthetic 200000 # BD sintética (rollback no fim)
+
+import datetime
+import random
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import RequestFactory
+from django.utils import timezone
+
+from website import analytics, counters
+from website.exports import export_queryset
+from website.models import Appointment, Attachment, Process, ProcessStatusCount, RequiredDoc, ServiceType
+from website.pagination import encode_cursor
+from website.search import process_reference
+from website.views import _api_page_query, _dashboard_paginator
+
+# Tabelas que não crescem com o número de processos (uma linha por serviço,
+# requisito ou par estado/serviço): percorrê-las inteiras não é um problema.
+SMALL_TABLES = {model._meta.db_table for model in (ServiceType, RequiredDoc, ProcessStatusCount)}
+
+
+class _Rollback(Exception):
+    """Usada para desfazer os dados sintéticos no fim da análise."""
+
+
+class Command(BaseCommand):
+    help = "Mostra o plano de execução (EXPLAIN QUERY PLAN) das queries de cada view."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--synthetic', type=int, default=0, metavar='N',
+            help="Gera N processos sintéticos antes da análise (desfeitos no fim).",
+        )
+        parser.add_argument('--seed', type=int, default=42, help="Semente aleatória dos dados sintéticos.")
+        parser.add_argument(
+            '--fail-on-scan', action='store_true',
+            help="Termina com erro se alguma query fizer full scan.",
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            self.stdout.write(self.style.WARNING(
+                f"Base de dados '{connection.vendor}': os planos são mostrados mas a deteção de full scans só existe para SQLite."
+            ))
+
+        full_scans = []
+        try:
+            with transaction.atomic():
+                if options['synthetic']:
+                    self._populate(options['synthetic'], options['seed'])
+                    with connection.cursor() as cursor:
+                        cursor.execute('ANALYZE')
+                full_scans = self._explain_all()
+                if options['synthetic']:
+                    raise _Rollback()
+        except _Rollback:
+            self.stdout.write("Dados sintéticos removidos.")
+
+        if full_scans:
+            self.stdout.write(self.style.ERROR(f"\n{len(full_scans)} query(s) com full scan: {', '.join(full_scans)}"))
+            if options['fail_on_scan']:
+                raise CommandError("Foram encontrados full scans.")
+        else:
+            self.stdout.write(self.style.SUCCESS("\nNenhuma query faz full scan."))
+
+    # ------------------------------------------------------------------
+    # Queries de cada view (construídas pelos mesmos helpers que as views usam)
+    # ------------------------------------------------------------------
+
+    def _view_queries(self):
+        process = Process.objects.select_related('user').order_by('-id').first()
+        if process is None:
+            raise CommandError("A base de dados não tem processos. Usa --synthetic N.")
+
+        def request(**params):
+            request = RequestFactory().get('/', params)
+            request.user = process.user
+            return request
+
+        cursor = encode_cursor(process.submission_date, process.id)
+        day = datetime.timedelta(days=1)
+        now = timezone.now()
+        today = timezone.localdate().isoformat()
+
+        return [
+            ('api_get_processes (1ª página)', _api_page_query(request())[1]),
+            ('api_get_processes (com cursor)', _api_page_query(request(cursor=cursor))[1]),
+            ('dashboard (lista)', _dashboard_paginator(request(), process.user).object_list[:5]),
+            ('dashboard (pesquisa)', _dashboard_paginator(request(q=process_reference(process.id, process.submission_date)), process.user).object_list[:5]),
+            (
+                'create_process (processo em aberto)',
+                Process.objects.filter(user=process.user).exclude(status__in=Process.CLOSED_STATUSES),
+            ),
+            ('process_detail (processo)', Process.objects.select_related('service_type', 'appointment').filter(id=process.id)),
+            # Os requisitos vêm do catálogo em memória (website/catalog.py): só os anexos vão à BD
+            ('process_detail (anexos)', process.attachments.all()),
+            ('upload_document (anexo existente)', Attachment.objects.filter(process=process, required_doc_id=1)),
+            (
+                'generate_pdf (agendamento)',
+                Appointment.objects.select_related('process__user__profile', 'process__service_type').filter(id=1),
+            ),
+            ('manager_dashboard (totais por estado)', counters._totals_rows()),
+            ('manager_export (sem filtros)', export_queryset()),
+            (
+                'manager_export (com filtros)',
+                export_queryset('submitted,review', str(process.service_type_id), today, today),
+            ),
+            ('manager_analytics (serviços)', analytics.service_rows(process.service_type_id)),
+            ('manager_analytics (submetidos)', analytics.submitted_rows(now - 30 * day, now)),
+            ('manager_analytics (decididos)', analytics.decided_rows(now - 30 * day, now)),
+        ]
+
+    def _explain_all(self):
+        full_scans = []
+        for name, queryset in self._view_queries():
+            plan = queryset.explain()
+            scans = self._full_scans(plan)
+            style = self.style.ERROR if scans else self.style.SUCCESS
+            self.stdout.write(style(f"\n== {name}"))
+            self.stdout.write(plan)
+            if scans:
+                full_scans.append(name)
+        return full_scans
+
+    @staticmethod
+    def _full_scans(plan):
+        """
+        Linhas do plano SQLite do tipo 'SCAN tabela' sem índice associado.
+        ('SCAN ... USING INDEX' percorre um índice por ordem e pára no LIMIT;
+        'VIRTUAL TABLE' é a pesquisa no índice FTS5, que usa o seu próprio índice.)
+        """
+        if connection.vendor != 'sqlite':
+            return []
+        scans = []
+        for line in plan.splitlines():
+            if 'SCAN ' not in line or 'USING' in line or 'CONSTANT ROW' in line or 'VIRTUAL TABLE' in line:
+                continue
+            table = line.split('SCAN ', 1)[1].split()[0]
+            if table not in SMALL_TABLES:
+                scans.append(line)
+        return scans
+
+    # ------------------------------------------------------------------
+    # Dados sintéticos
+    # ------------------------------------------------------------------
+
+    def _populate(self, n_processes, seed):
+        rng = random.Random(seed)
+        self.stdout.write(f"A gerar {n_processes} processos sintéticos...")
+
+        services = ServiceType.objects.bulk_create([
+            ServiceType(name=f'Serviço Sintético {i}', description='Gerado por explain_queries')
+            for i in range(8)
+        ])
+        docs = RequiredDoc.objects.bulk_create([
+            RequiredDoc(service_type=s, doc_name=f'Documento {j}') for s in services for j in range(6)
+        ])
+        docs_by_service = {}
+        for doc in docs:
+            docs_by_service.setdefault(doc.service_type_id, []).append(doc)
+
+        n_users = max(1, n_processes // 3)
+        User.objects.bulk_create(
+            [User(username=f'synthetic_{seed}_{i}') for i in range(n_users)], batch_size=5000
+        )
+        user_ids = list(User.objects.filter(username__startswith=f'synthetic_{seed}_').values_list('id', flat=True))
+
+        statuses = ['draft', 'submitted', 'review', 'approved', 'rejected']
+        weights = [10, 20, 15, 35, 20]
+        now = timezone.now()
+        batch = []
+        users_with_open = set()
+        for _ in range(n_processes):
+            user_id = rng.choice(user_ids)
+            status = rng.choices(statuses, weights)[0]
+            if status not in ('approved', 'rejected'):
+                # Restrição one_open_process_per_user: os restantes processos do utilizador ficam fechados
+                if user_id in users_with_open:
+                    status = rng.choices(['approved', 'rejected'], [35, 20])[0]
+                else:
+                    users_with_open.add(user_id)
+            batch.append(Process(user_id=user_id, service_type=rng.choice(services), status=status))
+            if len(batch) == 5000:
+                Process.objects.bulk_create(batch)
+                batch = []
+        Process.objects.bulk_create(batch)
+
+        # Envelhece parte dos processos para haver datas distintas (auto_now_add ignora o valor no bulk_create)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {Process._meta.db_table} SET submission_date = %s WHERE id %% 97 = 0",
+                [now - timezone.timedelta(days=900)],
+            )
+
+        # Anexos para uma amostra de processos
+        attachments = []
+        for pk, service_id in Process.objects.values_list('id', 'service_type_id')[:n_processes // 2].iterator():
+            for doc in docs_by_service[service_id][:rng.randint(0, 6)]:
+                attachments.append(Attachment(process_id=pk, required_doc=doc, file='documents/sintetico.pdf'))
+            if len(attachments) >= 5000:
+                Attachment.objects.bulk_create(attachments)
+                attachments = []
+        Attachment.objects.bulk_create(attachments)
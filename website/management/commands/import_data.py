@@ -0,0 +1,87 @@
+# ==============================================================================
+# IMIGRAÁGIL - COMANDO import_data
+# ==============================================================================
+# Importação em massa (CSV ou JSONL) do catálogo de serviços ou de processos
+# históricos. A lógica está em website/importers.py.
+#
+# Uso:
+#   python manage.py import_data services catalogo.csv
+#   python manage.py import_data processes historico.jsonl --create-users
+#   python manage.py import_data processes historico.jsonl --resume   # depois de uma falha
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from website.importers import IMPORTERS, Checkpoint, detect_format, read_rows
+
+
+class Command(BaseCommand):
+    help = "Importa serviços/documentos ou processos históricos a partir de CSV ou JSONL."
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(IMPORTERS), help="O que importar.")
+        parser.add_argument('path', help="Ficheiro .csv ou .jsonl.")
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help="Formato (por omissão, pela extensão).")
+        parser.add_argument('--batch-size', type=int, default=1000, help="Linhas por INSERT (bulk_create).")
+        parser.add_argument('--chunk-size', type=int, default=5000, help="Linhas por transação.")
+        parser.add_argument('--checkpoint', help="Ficheiro de checkpoint (por omissão, <path>.checkpoint).")
+        parser.add_argument('--resume', action='store_true', help="Continua a partir do último checkpoint.")
+        parser.add_argument('--create-users', action='store_true', help="Cria (inativos) os utilizadores em falta.")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        try:
+            fmt = options['format'] or detect_format(path)
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        checkpoint = Checkpoint(options['checkpoint'] or f"{path}.checkpoint", path)
+        start_after = 0
+        if options['resume']:
+            try:
+                start_after = checkpoint.load()
+            except ValueError as exc:
+                raise CommandError(str(exc))
+            if start_after:
+                self.stdout.write(f"A retomar depois da linha {start_after}.")
+
+        if options['kind'] == 'processes':
+            importer = IMPORTERS['processes'](options['batch_size'], create_users=options['create_users'])
+        else:
+            importer = IMPORTERS[options['kind']](options['batch_size'])
+
+        started = time.perf_counter()
+        processed = [0]
+
+        def on_chunk(line, stats):
+            checkpoint.save(line, stats)
+            processed[0] = line - start_after
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f"  linha {line}: {processed[0] / elapsed if elapsed else 0:,.0f} linhas/s")
+
+        def on_error(line, message):
+            self.stderr.write(f"  linha {line}: {message}")
+
+        try:
+            stats = importer.run(
+                read_rows(path, fmt),
+                chunk_size=options['chunk_size'],
+                start_after=start_after,
+                on_chunk=on_chunk,
+                on_error=on_error,
+            )
+        except FileNotFoundError:
+            raise CommandError(f"Ficheiro não encontrado: {path}")
+        except Exception as exc:
+            raise CommandError(
+                f"Importação interrompida ({exc}). Os blocos anteriores ficaram gravados; "
+                f"corre de novo com --resume para continuar."
+            ) from exc
+
+        checkpoint.clear()
+        elapsed = time.perf_counter() - started
+        summary = ', '.join(f"{key}={value}" for key, value in sorted(stats.items())) or 'nada a importar'
+        self.stdout.write(self.style.SUCCESS(
+            f"Importação concluída em {elapsed:.1f}s ({processed[0] / elapsed if elapsed else 0:,.0f} linhas/s): {summary}."
+        ))
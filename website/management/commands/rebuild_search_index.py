@@ -0,0 +1,32 @@
+# ==============================================================================
+# IMIGRAÁGIL - COMANDO rebuild_search_index
+# ==============================================================================
+# Reconstrói o índice de pesquisa de processos a partir da base de dados.
+# Necessário depois de importações em massa (bulk_create não dispara sinais).
+#
+# Uso:
+#   python manage.py rebuild_search_index [--batch-size 5000]
+
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from website.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = "Reconstrói o índice de pesquisa de processos."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000, help="Processos inseridos por lote.")
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        started = time.perf_counter()
+        with transaction.atomic():
+            total = backend.rebuild(batch_size=options['batch_size'])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Índice '{type(backend).__name__}' reconstruído: {total} processos em {elapsed:.1f}s."
+        ))
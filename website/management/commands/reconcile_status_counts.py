@@ -0,0 +1,26 @@
+# ==============================================================================
+# IMIGRAÁGIL - COMANDO reconcile_status_counts
+# ==============================================================================
+# Reconstrói de raiz os contadores de processos por estado (ProcessStatusCount)
+# a partir da tabela de processos. Útil depois de importações em massa, ou
+# para verificar periodicamente que os contadores não divergiram.
+#
+# Uso:
+#   python manage.py reconcile_status_counts
+
+from django.core.management.base import BaseCommand
+
+from website.counters import rebuild_counts
+
+
+class Command(BaseCommand):
+    help = "Recalcula os contadores de processos por estado e tipo de serviço."
+
+    def handle(self, *args, **options):
+        drift = rebuild_counts()
+        for (status, service_type_id), (before, after) in sorted(drift.items()):
+            self.stdout.write(f"  {status} / serviço #{service_type_id}: {before} -> {after}")
+        if drift:
+            self.stdout.write(self.style.WARNING(f"{len(drift)} contadores corrigidos."))
+        else:
+            self.stdout.write(self.style.SUCCESS("Contadores certos; nada a corrigir."))
@@ -0,0 +1,421 @@
+# ==============================================================================
+# IMIGRAÁGIL - COMANDO seed_scale
+# ==============================================================================
+# Gera uma base de dados à escala real (milhões de linhas) para testes de
+# desempenho, sem passar objeto a objeto pelo ORM:
+#   - catálogo de serviços e documentos exigidos (como o da AIMA);
+#   - N utilizadores com Profile (passaporte, NIF, nacionalidade...);
+#   - processos com proporções realistas de estados, um só em aberto por
+#     utilizador (o mais recente), datas espalhadas pelo histórico (--days);
+#   - anexos (todos os obrigatórios fora de rascunho), histórico de estados e
+#     agendamentos dos aprovados, com as vagas correspondentes.
+# Tudo em blocos (--batch-size linhas por transação): bulk_create onde são
+# precisas as chaves geradas (utilizadores, processos) e executemany direto nas
+# tabelas maiores (anexos, histórico, agendamentos). A aleatoriedade é
+# determinística (--seed): os mesmos argumentos no mesmo dia geram os mesmos dados. No fim reconstrói os contadores por estado e o
+# índice de pesquisa (o bulk_create não dispara sinais).
+#
+# Os anexos apontam para um pequeno conjunto de ficheiros de exemplo
+# (armazenamento por conteúdo, website/storage.py); com --files esses
+# ficheiros são escritos em MEDIA_ROOT.
+#
+# Uso (numa BD de teste vazia):
+#   DB_NAME=/tmp/scale.sqlite3 python manage.py migrate
+#   DB_NAME=/tmp/scale.sqlite3 python manage.py seed_scale --users 300000 --processes 1000000 [--files]
+
+import datetime
+import hashlib
+import io
+import random
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+from PIL import Image
+from pypdf import PdfWriter
+
+from website.counters import rebuild_counts
+from website.importers import historical_dates
+from website.models import (
+    Appointment, AppointmentSlot, Attachment, Process, ProcessStatusChange, Profile, RequiredDoc,
+    ServiceType, StoredBlob,
+)
+from website.scheduling import daily_start_times, locations, ticket_number_for
+from website.search import get_search_backend
+from website.storage import blob_name
+
+# (nome, descrição, tempo estimado em dias, peso na procura, [(documento, obrigatório)])
+SERVICE_CATALOG = [
+    ("Visto D7 - Rendimentos Próprios", "Residência para reformados e titulares de rendimentos passivos.", 90, 18, [
+        ("Passaporte", True), ("Comprovativo de Rendimentos", True), ("Registo Criminal", True),
+        ("Seguro de Saúde", True), ("Contrato de Arrendamento", False),
+    ]),
+    ("Autorização de Residência CPLP", "Residência para cidadãos da Comunidade dos Países de Língua Portuguesa.", 60, 30, [
+        ("Passaporte", True), ("Registo Criminal", True), ("Comprovativo de Morada", False),
+    ]),
+    ("Reagrupamento Familiar", "Residência para familiares de residentes legais.", 120, 14, [
+        ("Passaporte", True), ("Certidão de Nascimento ou Casamento", True),
+        ("Título de Residência do Familiar", True), ("Comprovativo de Meios de Subsistência", True),
+        ("Comprovativo de Alojamento", False),
+    ]),
+    ("Visto de Estudo", "Residência para estudantes do ensino superior.", 45, 10, [
+        ("Passaporte", True), ("Comprovativo de Matrícula", True), ("Seguro de Saúde", True),
+        ("Comprovativo de Meios de Subsistência", True),
+    ]),
+    ("Visto para Procura de Trabalho", "Entrada para procura de trabalho qualificado.", 60, 9, [
+        ("Passaporte", True), ("Registo Criminal", True), ("Curriculum Vitae", False),
+        ("Comprovativo de Meios de Subsistência", True),
+    ]),
+    ("Renovação de Autorização de Residência", "Renovação do título de residência temporária.", 30, 15, [
+        ("Passaporte", True), ("Título de Residência Atual", True), ("Comprovativo de Morada", True),
+        ("Declaração de IRS", False),
+    ]),
+    ("Cartão Azul UE", "Residência para trabalhadores altamente qualificados.", 30, 4, [
+        ("Passaporte", True), ("Contrato de Trabalho", True), ("Diploma de Ensino Superior", True),
+    ]),
+]
+
+NATIONALITIES = [
+    ("Brasil", 38), ("Índia", 9), ("Angola", 7), ("Cabo Verde", 6), ("Nepal", 5), ("Reino Unido", 5),
+    ("Guiné-Bissau", 4), ("Ucrânia", 4), ("Bangladesh", 4), ("São Tomé e Príncipe", 3), ("China", 3),
+    ("Estados Unidos", 3), ("Paquistão", 3), ("Moçambique", 3), ("França", 3),
+]
+FIRST_NAMES = [
+    "Ana", "João", "Maria", "Pedro", "Mariana", "Lucas", "Beatriz", "Gabriel", "Fernanda", "Rahul",
+    "Priya", "Aisha", "Mohammed", "Olena", "Ivan", "Wei", "Chen", "Emily", "James", "Fatumata",
+]
+LAST_NAMES = [
+    "Silva", "Santos", "Oliveira", "Souza", "Pereira", "Costa", "Rodrigues", "Almeida", "Ferreira",
+    "Gomes", "Sharma", "Patel", "Khan", "Kovalenko", "Wang", "Smith", "Baldé", "Mendes", "Tavares",
+]
+CITIES = ["Lisboa", "Porto", "Amadora", "Sintra", "Braga", "Faro", "Coimbra", "Setúbal", "Almada", "Odivelas"]
+
+# Estado do processo mais recente de cada utilizador (o único que pode estar em aberto)
+LATEST_STATUS_WEIGHTS = {'draft': 8, 'submitted': 14, 'review': 10, 'approved': 55, 'rejected': 13}
+# Estado dos processos anteriores (já decididos)
+PAST_STATUS_WEIGHTS = {'approved': 80, 'rejected': 20}
+# Último passo do histórico de estados que levou a cada estado
+PREVIOUS_STATUS = {'submitted': 'draft', 'review': 'submitted', 'approved': 'review', 'rejected': 'review'}
+# Dias (mín, máx) entre a criação e a última atualização, por estado
+STATUS_AGE_DAYS = {
+    'draft': (0, 3), 'submitted': (0, 2), 'review': (1, 30), 'approved': (5, 120), 'rejected': (5, 90),
+}
+# Colunas dos anexos, pela ordem dos tuplos de _attachments_for()
+ATTACHMENT_FIELDS = [
+    'process', 'required_doc', 'file', 'sha256', 'original_size', 'stored_size', 'uploaded_at', 'status',
+    'admin_feedback',
+]
+APPOINTMENT_RATE = 0.85  # Aprovados que já têm agendamento
+PLACEHOLDER_FILES = 16
+
+
+def _weighted(weights):
+    """(valores, pesos acumulados) para random.choices()."""
+    values = list(weights)
+    total, cumulative = 0, []
+    for value in values:
+        total += weights[value]
+        cumulative.append(total)
+    return values, cumulative
+
+
+def insert_rows(model, field_names, rows):
+    """
+    INSERT de muitas linhas com um só executemany (como o índice de pesquisa em
+    website/search.py). Para as tabelas de que não precisamos das chaves geradas:
+    o bulk_create compila o SQL valor a valor e seria o passo mais lento.
+    Os valores têm de vir prontos para a BD (datas com adapt_datetimefield_value).
+    """
+    qn = connection.ops.quote_name
+    columns = ', '.join(qn(model._meta.get_field(name).column) for name in field_names)
+    placeholders = ', '.join(['%s'] * len(field_names))
+    with connection.cursor() as cursor:
+        cursor.executemany(f"INSERT INTO {qn(model._meta.db_table)} ({columns}) VALUES ({placeholders})", rows)
+
+
+def placeholder_content(index):
+    """Conteúdo de exemplo número `index`: (bytes, extensão), alternando PDF e JPEG."""
+    buffer = io.BytesIO()
+    if index % 2:
+        writer = PdfWriter()
+        writer.add_blank_page(595, 842)
+        writer.add_metadata({'/Title': f'Documento de exemplo {index}'})
+        writer.write(buffer)
+        return buffer.getvalue(), '.pdf'
+    Image.new('RGB', (64, 64), (index * 15 % 256, 120, 200)).save(buffer, 'JPEG', quality=70)
+    return buffer.getvalue(), '.jpg'
+
+
+class Command(BaseCommand):
+    help = "Gera utilizadores, processos, anexos e agendamentos em massa (testes de desempenho à escala real)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=300000, help="Utilizadores a criar.")
+        parser.add_argument('--processes', type=int, default=1000000, help="Processos a criar.")
+        parser.add_argument('--days', type=int, default=730, help="Dias de histórico (datas de criação).")
+        parser.add_argument('--batch-size', type=int, default=10000, help="Linhas por transação.")
+        parser.add_argument('--seed', type=int, default=42, help="Semente da aleatoriedade.")
+        parser.add_argument('--prefix', default='seed_', help="Prefixo dos usernames.")
+        parser.add_argument('--password', help="Palavra-passe de todos os utilizadores (por omissão, sem login).")
+        parser.add_argument('--files', action='store_true', help="Escreve os ficheiros de exemplo em MEDIA_ROOT.")
+
+    def handle(self, *args, **options):
+        if options['users'] < 1 or options['processes'] < 0 or options['batch_size'] < 1:
+            raise CommandError("--users e --batch-size têm de ser positivos e --processes não pode ser negativo.")
+        if Process.objects.exists():
+            raise CommandError("A base de dados já tem processos: use uma BD vazia (ex: DB_NAME=/tmp/scale.sqlite3).")
+        if User.objects.filter(username__startswith=options['prefix']).exists():
+            raise CommandError(f"Já existem utilizadores com o prefixo {options['prefix']!r}.")
+
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        # Início do dia: os mesmos argumentos no mesmo dia geram as mesmas datas
+        self.now = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+        started = time.perf_counter()
+
+        services = self._stage("Catálogo", self._catalog)
+        blobs = self._stage("Ficheiros de exemplo", self._placeholders, options['files'])
+        user_ids = self._stage("Utilizadores e perfis", self._users, options)
+        plan, refs = self._stage("Processos, anexos e histórico", self._processes, user_ids, services, blobs, options)
+        self._stage("Vagas e agendamentos", self._appointments, plan)
+        self._stage("Ficheiros armazenados", self._stored_blobs, blobs, refs)
+        self._stage("Contadores por estado", rebuild_counts)
+        self._stage("Índice de pesquisa", self._search_index)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(user_ids):,} utilizadores, {options['processes']:,} processos, {sum(refs.values()):,} anexos "
+            f"e {len(plan):,} agendamentos em {time.perf_counter() - started:.0f}s."
+        ))
+
+    def _stage(self, title, func, *args):
+        started = time.perf_counter()
+        result = func(*args)
+        self.stdout.write(f"  {title}: {time.perf_counter() - started:.1f}s")
+        return result
+
+    # ==========================================
+    # CATÁLOGO E FICHEIROS
+    # ==========================================
+
+    def _catalog(self):
+        """Serviços do catálogo (reutiliza os que já existem com o mesmo nome)."""
+        services = []
+        for name, description, wait, weight, docs in SERVICE_CATALOG:
+            service, created = ServiceType.objects.get_or_create(
+                name=name, defaults={'description': description, 'estimated_wait_time': wait}
+            )
+            if created:
+                RequiredDoc.objects.bulk_create([
+                    RequiredDoc(service_type=service, doc_name=doc_name, is_mandatory=mandatory)
+                    for doc_name, mandatory in docs
+                ])
+            requirements = list(RequiredDoc.objects.filter(service_type=service).values_list('id', 'is_mandatory'))
+            services.append((service.id, weight, requirements))
+        return services
+
+    def _placeholders(self, write):
+        """[(nome no storage, sha256, tamanho)] dos ficheiros de exemplo."""
+        storage = Attachment._meta.get_field('file').storage
+        blobs = []
+        for index in range(PLACEHOLDER_FILES):
+            content, ext = placeholder_content(index)
+            digest = hashlib.sha256(content).hexdigest()
+            name = blob_name(digest, ext)
+            if write:
+                # Armazenamento por conteúdo: o nome gravado é o mesmo blob_name()
+                storage.save(name, ContentFile(content))
+            blobs.append((name, digest, len(content)))
+        return blobs
+
+    # ==========================================
+    # UTILIZADORES
+    # ==========================================
+
+    def _users(self, options):
+        rng, prefix = self.rng, options['prefix']
+        # Um só hash para todos (o hasher é lento de propósito)
+        password = make_password(options['password']) if options['password'] else '!'
+        countries, country_weights = _weighted(dict(NATIONALITIES))
+        history = datetime.timedelta(days=options['days'])
+        user_ids = []
+        for start in range(0, options['users'], self.batch_size):
+            users, profiles = [], []
+            for i in range(start, min(options['users'], start + self.batch_size)):
+                first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+                username = f"{prefix}{i:07d}"
+                users.append(User(
+                    username=username, first_name=first, last_name=last,
+                    email=f"{username}@exemplo.pt", password=password,
+                    date_joined=self.now - history * rng.random(),
+                ))
+                profiles.append(Profile(
+                    passport=f"{rng.choice('ABCFGP')}{rng.randrange(10 ** 7):07d}",
+                    nif=f"{rng.choice('12356789')}{rng.randrange(10 ** 8):08d}" if rng.random() < 0.7 else None,
+                    nationality=rng.choices(countries, cum_weights=country_weights)[0],
+                    phone=f"+351 9{rng.randrange(10 ** 8):08d}",
+                    address=f"Rua {rng.choice(LAST_NAMES)}, {rng.randint(1, 300)}, {rng.choice(CITIES)}",
+                ))
+            with transaction.atomic():
+                User.objects.bulk_create(users)
+                for user, profile in zip(users, profiles):
+                    profile.user_id = user.pk
+                Profile.objects.bulk_create(profiles)
+            user_ids.extend(user.pk for user in users)
+        return user_ids
+
+    # ==========================================
+    # PROCESSOS, ANEXOS E HISTÓRICO
+    # ==========================================
+
+    def _processes(self, user_ids, services, blobs, options):
+        """
+        Cria os processos por ordem cronológica, distribuídos em rotação pelos
+        utilizadores: a última volta é o processo mais recente de cada um, o
+        único que pode ficar em aberto (restrição one_open_process_per_user).
+        Devolve o plano de agendamentos e a contagem de anexos por ficheiro.
+        """
+        rng = self.rng
+        total, users = options['processes'], len(user_ids)
+        service_ids, service_weights = _weighted({s[0]: s[1] for s in services})
+        requirements = {s[0]: s[2] for s in services}
+        latest, latest_weights = _weighted(LATEST_STATUS_WEIGHTS)
+        past, past_weights = _weighted(PAST_STATUS_WEIGHTS)
+        start = self.now - datetime.timedelta(days=options['days'])
+        step = datetime.timedelta(days=options['days']) / max(total, 1)
+        lead = datetime.timedelta(days=getattr(settings, 'APPOINTMENT_LEAD_DAYS', 10))
+        n_locations, n_times = len(locations()), len(daily_start_times())
+
+        db_datetime = connection.ops.adapt_datetimefield_value
+        plan, refs = [], Counter()
+        for chunk_start in range(0, total, self.batch_size):
+            processes = []
+            for i in range(chunk_start, min(total, chunk_start + self.batch_size)):
+                if i >= total - users:
+                    status = rng.choices(latest, cum_weights=latest_weights)[0]
+                else:
+                    status = rng.choices(past, cum_weights=past_weights)[0]
+                submitted = start + step * (i + rng.random())
+                low, high = STATUS_AGE_DAYS[status]
+                updated = min(self.now, submitted + datetime.timedelta(days=rng.uniform(low, high)))
+                processes.append(Process(
+                    user_id=user_ids[i % users],
+                    service_type_id=rng.choices(service_ids, cum_weights=service_weights)[0],
+                    status=status,
+                    submission_date=submitted,
+                    updated_at=updated,
+                    submitted_at=submitted if status != 'draft' else None,
+                    decided_at=updated if status in Process.CLOSED_STATUSES else None,
+                ))
+
+            attachments, changes = [], []
+            with transaction.atomic():
+                with historical_dates():
+                    Process.objects.bulk_create(processes)
+                for process in processes:
+                    attachments.extend(self._attachments_for(process, requirements[process.service_type_id], blobs, refs))
+                    if process.status != 'draft':
+                        changes.append((
+                            process.pk, PREVIOUS_STATUS[process.status], process.status, db_datetime(process.updated_at)
+                        ))
+                    if process.status == 'approved' and rng.random() < APPOINTMENT_RATE:
+                        # Primeiro dia útil depois da antecedência mínima
+                        day = (timezone.localtime(process.updated_at) + lead).date()
+                        while day.weekday() >= 5:
+                            day += datetime.timedelta(days=1)
+                        plan.append((process.pk, rng.randrange(n_locations), day, rng.randrange(n_times)))
+                insert_rows(Attachment, ATTACHMENT_FIELDS, attachments)
+                insert_rows(ProcessStatusChange, ['process', 'from_status', 'to_status', 'changed_at'], changes)
+            self.stdout.write(f"    {chunk_start + len(processes):,} / {total:,} processos")
+        return plan, refs
+
+    def _attachments_for(self, process, requirements, blobs, refs):
+        """Anexos (tuplos de ATTACHMENT_FIELDS) de um processo: em rascunho só alguns; depois, todos os obrigatórios."""
+        rng = self.rng
+        db_datetime = connection.ops.adapt_datetimefield_value
+        attachments = []
+        for doc_id, mandatory in requirements:
+            if rng.random() >= (0.5 if process.status == 'draft' or not mandatory else 1.0):
+                continue
+            name, digest, size = rng.choice(blobs)
+            refs[name] += 1
+            if process.status == 'approved':
+                status = 'valid'
+            elif process.status in ('review', 'rejected'):
+                status = rng.choice(['valid', 'valid', 'pending', 'invalid'])
+            else:
+                status = 'pending'
+            uploaded_at = process.submission_date + (process.updated_at - process.submission_date) * rng.random()
+            attachments.append((
+                process.pk, doc_id, name, digest, size, size, db_datetime(uploaded_at), status,
+                "Documento ilegível ou fora da validade." if status == 'invalid' else None,
+            ))
+        return attachments
+
+    # ==========================================
+    # AGENDAMENTOS
+    # ==========================================
+
+    def _appointments(self, plan):
+        """
+        Cria as vagas usadas pelos agendamentos e depois os agendamentos.
+        As vagas históricas ficam com a capacidade necessária (pelo menos
+        APPOINTMENT_SLOT_CAPACITY), para respeitar 'slot_not_overbooked'.
+        """
+        if not plan:
+            return
+        names, times = locations(), daily_start_times()
+        capacity = getattr(settings, 'APPOINTMENT_SLOT_CAPACITY', 4)
+        booked = Counter((location, day, t) for _, location, day, t in plan)
+        slots = [
+            AppointmentSlot(location=names[location], date=day, start_time=times[t], capacity=max(capacity, n), booked=n)
+            for (location, day, t), n in booked.items()
+        ]
+        with transaction.atomic():
+            # Vagas futuras vazias já criadas pelo alocador são reaproveitadas (a BD não tem agendamentos)
+            AppointmentSlot.objects.bulk_create(
+                slots, update_conflicts=True,
+                unique_fields=['location', 'date', 'start_time'], update_fields=['capacity', 'booked'],
+            )
+        slot_ids = {
+            (location, day, start_time): pk
+            for pk, location, day, start_time in AppointmentSlot.objects.filter(
+                date__gte=min(day for _, _, day, _ in plan), date__lte=max(day for _, _, day, _ in plan)
+            ).values_list('id', 'location', 'date', 'start_time').iterator()
+        }
+
+        db_datetime = connection.ops.adapt_datetimefield_value
+        for chunk_start in range(0, len(plan), self.batch_size):
+            appointments = [
+                (
+                    process_id,
+                    slot_ids[(names[location], day, times[t])],
+                    db_datetime(timezone.make_aware(datetime.datetime.combine(day, times[t]))),
+                    names[location],
+                    ticket_number_for(process_id),
+                )
+                for process_id, location, day, t in plan[chunk_start:chunk_start + self.batch_size]
+            ]
+            with transaction.atomic():
+                insert_rows(Appointment, ['process', 'slot', 'appointment_date', 'location', 'ticket_number'], appointments)
+
+    # ==========================================
+    # FINALIZAÇÃO
+    # ==========================================
+
+    def _stored_blobs(self, blobs, refs):
+        """Contagem de referências dos ficheiros de exemplo (website/storage.py)."""
+        with transaction.atomic():
+            StoredBlob.objects.bulk_create(
+                [StoredBlob(name=name, size=size, ref_count=refs[name]) for name, _, size in blobs if refs[name]],
+                update_conflicts=True, unique_fields=['name'], update_fields=['size', 'ref_count'],
+            )
+
+    def _search_index(self):
+        with transaction.atomic():
+            get_search_backend().rebuild()
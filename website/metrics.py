@@ -0,0 +1,335 @@
+# ==============================================================================
+# IMIGRAÁGIL - METRICS.PY (MÉTRICAS NO FORMATO DO PROMETHEUS)
+# ==============================================================================
+# Registo de métricas em memória (contadores e histogramas, com etiquetas),
+# seguro entre threads, exposto em texto no formato do Prometheus pela view
+# `metrics` (/metrics, só para staff ou com METRICS_TOKEN).
+#
+# Com vários processos (workers do gunicorn, pool das senhas), cada processo
+# só vê os seus valores. Com settings.METRICS_DIR, cada processo grava os seus
+# valores num ficheiro <pid>.json dessa pasta (no máximo a cada
+# METRICS_FLUSH_INTERVAL segundos, e à saída) e o /metrics soma todos os
+# ficheiros. A pasta deve ser esvaziada ao arrancar o servidor. No event loop
+# (pedidos async) essa escrita é feita numa thread, para não o bloquear.
+#
+# As métricas da aplicação estão definidas no fim deste ficheiro; o
+# MetricsMiddleware mede a latência e as queries de cada pedido (em modo
+# síncrono e async: sob ASGI não tira as views async do event loop).
+
+import asyncio
+import atexit
+import glob
+import json
+import math
+import os
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Métodos com série própria; os outros (inventados por quem faz o pedido) contam como 'other'
+HTTP_METHODS = frozenset({'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'})
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels_text(pairs):
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, registry, name, documentation, labelnames):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name}: etiquetas {sorted(labels)} != {sorted(self.labelnames)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+
+class Counter(_Metric):
+    """Valor que só aumenta (ex: pedidos, bytes recebidos)."""
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        if amount < 0:
+            raise ValueError("Um contador só pode aumentar.")
+        def update(values):
+            values[0] += amount
+        self.registry._update(self, self._key(labels), update)
+
+    def _empty(self):
+        return [0.0]
+
+    def _samples(self, values):
+        yield self.name, (), values[0]
+
+
+class Histogram(_Metric):
+    """Distribuição de valores por intervalos cumulativos (le), com soma e contagem."""
+    kind = 'histogram'
+
+    def __init__(self, registry, name, documentation, labelnames, buckets=DEFAULT_BUCKETS):
+        super().__init__(registry, name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value, **labels):
+        def update(values):
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    values[index] += 1
+            values[-2] += value  # soma
+            values[-1] += 1      # contagem
+        self.registry._update(self, self._key(labels), update)
+
+    def _empty(self):
+        return [0.0] * (len(self.buckets) + 2)
+
+    def _samples(self, values):
+        for bound, count in zip(self.buckets, values):
+            yield f'{self.name}_bucket', (('le', _format_value(bound)),), count
+        yield f'{self.name}_sum', (), values[-2]
+        yield f'{self.name}_count', (), values[-1]
+
+
+class Registry:
+    """Conjunto de métricas e dos seus valores neste processo."""
+
+    def __init__(self):
+        self.metrics = {}
+        self._values = {}  # nome -> {etiquetas (tuplo): [valores]}
+        self._lock = threading.Lock()
+        self._flushed_at = 0.0
+        self._atexit = False
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(self, name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(self, name, documentation, labelnames, buckets))
+
+    def _register(self, metric):
+        if metric.name in self.metrics:
+            raise ValueError(f"Métrica duplicada: {metric.name}")
+        self.metrics[metric.name] = metric
+        return metric
+
+    def _update(self, metric, key, update):
+        with self._lock:
+            series = self._values.setdefault(metric.name, {})
+            if key not in series:
+                series[key] = metric._empty()
+            update(series[key])
+        self._maybe_flush()
+
+    def reset(self):
+        """Apaga os valores deste processo (testes)."""
+        with self._lock:
+            self._values = {}
+
+    # --- Modo multiprocesso (ficheiros em METRICS_DIR) ---
+
+    def _directory(self):
+        return getattr(settings, 'METRICS_DIR', None)
+
+    def _maybe_flush(self):
+        directory = self._directory()
+        if not directory:
+            return
+        if time.monotonic() - self._flushed_at < getattr(settings, 'METRICS_FLUSH_INTERVAL', 1.0):
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.flush()
+            return
+        # No event loop: a escrita do ficheiro vai para uma thread
+        with self._lock:
+            self._flushed_at = time.monotonic()  # Não pede outra enquanto esta não corre
+        loop.run_in_executor(None, self.flush)
+
+    def flush(self):
+        """Grava os valores deste processo em METRICS_DIR/<pid>.json (escrita atómica)."""
+        directory = self._directory()
+        if not directory:
+            return
+        if not self._atexit:
+            atexit.register(self.flush)
+            self._atexit = True
+        with self._lock:
+            self._flushed_at = time.monotonic()
+            data = {
+                name: [[list(key), list(values)] for key, values in series.items()]
+                for name, series in self._values.items()
+            }
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f'{os.getpid()}.json')
+        tmp = f'{path}.{threading.get_ident()}.tmp'
+        with open(tmp, 'w', encoding='utf-8') as fh:
+            json.dump(data, fh)
+        os.replace(tmp, path)
+
+    def collect(self):
+        """Valores de todos os processos (com METRICS_DIR) ou só deste: {nome: {etiquetas: [valores]}}."""
+        with self._lock:
+            merged = {name: {key: list(values) for key, values in series.items()} for name, series in self._values.items()}
+        directory = self._directory()
+        if not directory:
+            return merged
+
+        own = os.path.join(directory, f'{os.getpid()}.json')
+        for path in glob.glob(os.path.join(directory, '*.json')):
+            if path == own:
+                continue  # Os valores deste processo já estão em memória (e mais recentes)
+            try:
+                with open(path, encoding='utf-8') as fh:
+                    data = json.load(fh)
+            except (OSError, ValueError):
+                continue  # Ficheiro apagado ou a meio de ser substituído
+            for name, series in data.items():
+                if name not in self.metrics:
+                    continue
+                target = merged.setdefault(name, {})
+                for key, values in series:
+                    key = tuple(key)
+                    if key in target:
+                        target[key] = [a + b for a, b in zip(target[key], values)]
+                    else:
+                        target[key] = values
+        return merged
+
+    def exposition(self):
+        """Texto no formato de exposição do Prometheus (versão 0.0.4)."""
+        values = self.collect()
+        lines = []
+        for name, metric in sorted(self.metrics.items()):
+            lines.append(f'# HELP {name} {metric.documentation}')
+            lines.append(f'# TYPE {name} {metric.kind}')
+            series = values.get(name, {})
+            if not series and not metric.labelnames:
+                series = {(): metric._empty()}
+            for key, data in sorted(series.items()):
+                labels = tuple(zip(metric.labelnames, key))
+                for sample, extra, value in metric._samples(data):
+                    lines.append(f'{sample}{_labels_text(labels + extra)} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+
+# ==========================================
+# MÉTRICAS DA APLICAÇÃO
+# ==========================================
+
+REQUEST_LATENCY = REGISTRY.histogram(
+    'imigraima_http_request_duration_seconds', "Duração dos pedidos (até à resposta), por rota.", ['view', 'method'],
+)
+REQUESTS = REGISTRY.counter(
+    'imigraima_http_requests_total', "Pedidos por rota e código de resposta.", ['view', 'method', 'status'],
+)
+REQUEST_QUERIES = REGISTRY.histogram(
+    'imigraima_db_queries_per_request', "Queries SQL por pedido, por rota.", ['view'],
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200),
+)
+PDF_RENDER = REGISTRY.histogram(
+    'imigraima_ticket_pdf_render_seconds', "Duração do pisa.CreatePDF das senhas.", ['outcome'],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+UPLOAD_BYTES = REGISTRY.counter(
+    'imigraima_upload_bytes_total', "Bytes dos ficheiros aceites em upload_document.",
+)
+UPLOAD_REJECTIONS = REGISTRY.counter(
+    'imigraima_upload_rejections_total', "Uploads recusados em upload_document, por motivo.", ['reason'],
+)
+APPOINTMENT_ALLOCATIONS = REGISTRY.counter(
+    'imigraima_appointment_allocations_total',
+    "Lugares de atendimento pedidos ao alocador: allocated, conflict (vaga ocupada entretanto), no_slots.",
+    ['outcome'],
+)
+
+
+class _QueryCounter:
+    """Wrapper de connection.execute_wrapper que só conta as queries."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def _add_wrapper(wrapper):
+    connection.execute_wrappers.append(wrapper)
+
+
+def _remove_wrapper(wrapper):
+    connection.execute_wrappers.remove(wrapper)
+
+
+class MetricsMiddleware:
+    """Latência, código de resposta e nº de queries de cada pedido, por nome do URL."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'METRICS_ENABLED', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        queries = _QueryCounter()
+        started = time.perf_counter()
+        with connection.execute_wrapper(queries):
+            response = self.get_response(request)
+        self._record(request, response, time.perf_counter() - started, queries.count)
+        return response
+
+    async def __acall__(self, request):
+        queries = _QueryCounter()
+        started = time.perf_counter()
+        # O ORM corre na thread "sync" do pedido e as ligações são por thread
+        await sync_to_async(_add_wrapper)(queries)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(_remove_wrapper)(queries)
+        self._record(request, response, time.perf_counter() - started, queries.count)
+        return response
+
+    def _record(self, request, response, elapsed, query_count):
+        match = request.resolver_match
+        # Pedidos sem rota (404) numa só série, para não criar uma por URL inventado
+        view = (match.url_name or match.view_name) if match else 'unmatched'
+        method = request.method if request.method in HTTP_METHODS else 'other'
+        REQUEST_LATENCY.observe(elapsed, view=view, method=method)
+        REQUESTS.inc(view=view, method=method, status=response.status_code)
+        REQUEST_QUERIES.observe(query_count, view=view)
@@ -0,0 +1,53 @@
+# Generated by Django 6.0.1 on 2026-10-17 20:25
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def remove_duplicate_attachments(apps, schema_editor):
+    """
+    Antes de criar a restrição única, apaga anexos repetidos para o mesmo
+    (processo, requisito), mantendo o mais antigo (o que a página mostrava).
+    """
+    Attachment = apps.get_model('website', 'Attachment')
+    duplicates = (
+        Attachment.objects.values('process_id', 'required_doc_id')
+        .annotate(keep_id=models.Min('id'), total=models.Count('id'))
+        .filter(total__gt=1)
+    )
+    for dup in duplicates:
+        Attachment.objects.filter(
+            process_id=dup['process_id'], required_doc_id=dup['required_doc_id']
+        ).exclude(id=dup['keep_id']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0006_alter_attachment_file'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='process',
+            index=models.Index(fields=['user', '-submission_date'], name='process_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='process',
+            index=models.Index(condition=models.Q(('status__in', ['approved', 'rejected']), _negated=True), fields=['user'], name='process_open_by_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='process',
+            index=models.Index(fields=['-submission_date', '-id'], name='process_date_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='process',
+            index=models.Index(fields=['status', 'service_type'], name='process_status_service_idx'),
+        ),
+        migrations.RunPython(remove_duplicate_attachments, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='attachment',
+            constraint=models.UniqueConstraint(fields=('process', 'required_doc'), name='unique_attachment_per_requirement'),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 6.0.1 on 2026-10-17 20:28
+
+from django.db import migrations
+
+FTS_TABLE = 'website_process_search'
+
+
+def create_search_index(apps, schema_editor):
+    """
+    Cria a tabela virtual FTS5 (só em SQLite) e indexa os processos existentes.
+    Noutras bases de dados usa-se o backend 'DatabaseLikeBackend'.
+    """
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+        "reference, service, username, passport, nif, "
+        "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+    )
+
+    Process = apps.get_model('website', 'Process')
+    rows = Process.objects.order_by().values_list(
+        'id', 'submission_date', 'service_type__name',
+        'user__username', 'user__profile__passport', 'user__profile__nif',
+    )
+    with schema_editor.connection.cursor() as cursor:
+        cursor.executemany(
+            f"INSERT INTO {FTS_TABLE} (rowid, reference, service, username, passport, nif) "
+            "VALUES (%s, %s, %s, %s, %s, %s)",
+            [
+                (pk, f"PT/{date:%Y}/{pk:04d} {pk}", service or '', username or '', passport or '', nif or '')
+                for pk, date, service, username, passport, nif in rows
+            ],
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0007_process_attachment_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 6.0.1 on 2026-10-17 20:33
+
+import website.models
+import website.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0009_attachment_sha256'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoredBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True, verbose_name='Ficheiro')),
+                ('size', models.BigIntegerField(default=0, verbose_name='Tamanho (bytes)')),
+                ('ref_count', models.PositiveIntegerField(default=0, verbose_name='Referências')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Ficheiro Armazenado',
+                'verbose_name_plural': 'Ficheiros Armazenados',
+            },
+        ),
+        migrations.AlterField(
+            model_name='attachment',
+            name='file',
+            field=models.FileField(storage=website.storage.attachment_storage, upload_to='documents/%Y/%m/', validators=[website.models.validate_file_extension_and_size], verbose_name='Ficheiro'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 6.0.1 on 2026-10-17 20:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0010_content_addressed_attachments'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AppointmentSlot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('location', models.CharField(max_length=100, verbose_name='Local')),
+                ('date', models.DateField(verbose_name='Dia')),
+                ('start_time', models.TimeField(verbose_name='Hora')),
+                ('capacity', models.PositiveIntegerField(verbose_name='Capacidade')),
+                ('booked', models.PositiveIntegerField(default=0, verbose_name='Ocupadas')),
+            ],
+            options={
+                'verbose_name': 'Vaga de Atendimento',
+                'verbose_name_plural': 'Vagas de Atendimento',
+                'ordering': ['date', 'start_time', 'location'],
+                'indexes': [models.Index(fields=['date', 'start_time'], name='slot_date_time_idx')],
+                'constraints': [models.UniqueConstraint(fields=('location', 'date', 'start_time'), name='unique_slot_per_location_time'), models.CheckConstraint(condition=models.Q(('booked__lte', models.F('capacity'))), name='slot_not_overbooked')],
+            },
+        ),
+        migrations.AddField(
+            model_name='appointment',
+            name='slot',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='appointments', to='website.appointmentslot', verbose_name='Vaga'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 6.0.1 on 2026-10-17 20:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def populate_status_counts(apps, schema_editor):
+    """Conta os processos já existentes (a partir daqui os contadores são incrementais)."""
+    Process = apps.get_model('website', 'Process')
+    ProcessStatusCount = apps.get_model('website', 'ProcessStatusCount')
+    rows = Process.objects.values('status', 'service_type_id').annotate(total=Count('id')).order_by()
+    ProcessStatusCount.objects.bulk_create([
+        ProcessStatusCount(status=row['status'], service_type_id=row['service_type_id'], total=row['total'])
+        for row in rows
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0011_appointment_slots'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProcessStatusCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('draft', 'Rascunho (Em Preenchimento)'), ('submitted', 'Submetido (Aguardar Análise)'), ('review', 'Em Análise Técnica'), ('approved', 'Aprovado (Pronto p/ Agendar)'), ('rejected', 'Rejeitado / Devolvido')], max_length=20)),
+                ('total', models.BigIntegerField(default=0)),
+                ('service_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='status_counts', to='website.servicetype')),
+            ],
+            options={
+                'verbose_name': 'Contador de Processos',
+                'verbose_name_plural': 'Contadores de Processos',
+                'constraints': [models.UniqueConstraint(fields=('status', 'service_type'), name='unique_status_count')],
+            },
+        ),
+        migrations.RunPython(populate_status_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 6.0.1 on 2026-10-17 20:42
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0012_process_status_counts'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='process',
+            index=models.Index(condition=models.Q(('status__in', ['approved', 'rejected'])), fields=['updated_at'], name='process_decided_idx'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 6.0.1 on 2026-10-17 20:44
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0013_process_decided_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProcessStatusChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('from_status', models.CharField(choices=[('draft', 'Rascunho (Em Preenchimento)'), ('submitted', 'Submetido (Aguardar Análise)'), ('review', 'Em Análise Técnica'), ('approved', 'Aprovado (Pronto p/ Agendar)'), ('rejected', 'Rejeitado / Devolvido')], max_length=20, verbose_name='Estado Anterior')),
+                ('to_status', models.CharField(choices=[('draft', 'Rascunho (Em Preenchimento)'), ('submitted', 'Submetido (Aguardar Análise)'), ('review', 'Em Análise Técnica'), ('approved', 'Aprovado (Pronto p/ Agendar)'), ('rejected', 'Rejeitado / Devolvido')], max_length=20, verbose_name='Novo Estado')),
+                ('changed_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Data')),
+                ('changed_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Alterado por')),
+                ('process', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='status_changes', to='website.process')),
+            ],
+            options={
+                'verbose_name': 'Mudança de Estado',
+                'verbose_name_plural': 'Histórico de Estados',
+                'ordering': ['-changed_at'],
+                'indexes': [models.Index(fields=['process', '-changed_at'], name='status_change_process_idx')],
+            },
+        ),
+    ]
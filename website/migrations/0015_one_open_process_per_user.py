@@ -0,0 +1,60 @@
+# Generated by Django 6.0.1 on 2026-10-17 21:04
+
+from django.conf import settings
+from django.db import migrations, models
+
+CLOSED_STATUSES = ['approved', 'rejected']
+
+
+def check_no_duplicate_open_processes(apps, schema_editor):
+    """
+    A restrição não pode ser criada se algum utilizador já tiver mais do que um
+    processo em aberto. Em vez de fechar processos reais às escondidas, a
+    migração pára e lista os casos; a limpeza é feita (e revista) com o comando
+    close_duplicate_open_processes.
+    """
+    Process = apps.get_model('website', 'Process')
+    open_processes = Process.objects.exclude(status__in=CLOSED_STATUSES)
+    duplicated_users = list(
+        open_processes.values('user_id').annotate(total=models.Count('id')).filter(total__gt=1)
+        .order_by('user_id').values_list('user_id', flat=True)
+    )
+    if not duplicated_users:
+        return
+    lines = [
+        f"{len(duplicated_users)} utilizador(es) com mais do que um processo em aberto; "
+        "a restrição one_open_process_per_user não pode ser criada.",
+    ]
+    for user_id in duplicated_users[:20]:
+        processes = ', '.join(
+            f"#{pk} ({status})" for pk, status in
+            open_processes.filter(user_id=user_id).order_by('-submission_date', '-id').values_list('id', 'status')
+        )
+        lines.append(f"  utilizador #{user_id}: {processes}")
+    if len(duplicated_users) > 20:
+        lines.append(f"  ... e mais {len(duplicated_users) - 20}.")
+    lines.append(
+        "Rever com 'python manage.py close_duplicate_open_processes' (só mostra) e resolver "
+        "com '--apply' antes de voltar a correr o migrate."
+    )
+    raise RuntimeError('\n'.join(lines))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0014_process_status_history'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(check_no_duplicate_open_processes, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='process',
+            name='process_open_by_user_idx',
+        ),
+        migrations.AddConstraint(
+            model_name='process',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ['approved', 'rejected']), _negated=True), fields=('user',), name='one_open_process_per_user'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 6.0.1 on 2026-10-17 21:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0015_one_open_process_per_user'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attachment',
+            name='original_size',
+            field=models.PositiveBigIntegerField(blank=True, editable=False, null=True, verbose_name='Tamanho Original (bytes)'),
+        ),
+        migrations.AddField(
+            model_name='attachment',
+            name='stored_size',
+            field=models.PositiveBigIntegerField(blank=True, editable=False, null=True, verbose_name='Tamanho Guardado (bytes)'),
+        ),
+    ]
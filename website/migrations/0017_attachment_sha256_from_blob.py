@@ -0,0 +1,33 @@
+# Generated by Django 6.0.1 on 2026-10-17 23:40
+
+import os
+
+from django.db import migrations
+
+BLOB_PREFIX = 'documents/sha256/'
+
+
+def sha256_from_blob_name(apps, schema_editor):
+    """
+    As imagens normalizadas no upload ficaram com o SHA-256 do original enviado.
+    Nos ficheiros guardados por conteúdo o hash do ficheiro em disco é o próprio nome.
+    """
+    Attachment = apps.get_model('website', 'Attachment')
+    stale = []
+    rows = Attachment.objects.filter(file__startswith=BLOB_PREFIX).values_list('id', 'file', 'sha256')
+    for pk, name, sha256 in rows.iterator(chunk_size=2000):
+        digest = os.path.splitext(os.path.basename(name))[0]
+        if digest != sha256:
+            stale.append(Attachment(id=pk, sha256=digest))
+    Attachment.objects.bulk_update(stale, ['sha256'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0016_attachment_sizes'),
+    ]
+
+    operations = [
+        migrations.RunPython(sha256_from_blob_name, migrations.RunPython.noop),
+    ]
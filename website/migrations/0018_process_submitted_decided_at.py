@@ -0,0 +1,60 @@
+# Generated by Django 6.0.1 on 2026-10-17 23:50
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+CLOSED_STATUSES = ['approved', 'rejected']
+
+
+def backfill_status_dates(apps, schema_editor):
+    """
+    Datas dos processos existentes: as do histórico de estados quando existe,
+    senão a criação (submissão) e o updated_at (decisão), como as estatísticas usavam.
+    """
+    Process = apps.get_model('website', 'Process')
+    ProcessStatusChange = apps.get_model('website', 'ProcessStatusChange')
+    changes = ProcessStatusChange.objects.filter(process=models.OuterRef('pk'))
+
+    first_submission = changes.filter(to_status='submitted').order_by('changed_at').values('changed_at')[:1]
+    Process.objects.exclude(status='draft').update(
+        submitted_at=Coalesce(models.Subquery(first_submission), models.F('submission_date'))
+    )
+    last_decision = changes.filter(to_status__in=CLOSED_STATUSES).order_by('-changed_at').values('changed_at')[:1]
+    Process.objects.filter(status__in=CLOSED_STATUSES).update(
+        decided_at=Coalesce(models.Subquery(last_decision), models.F('updated_at'))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0017_attachment_sha256_from_blob'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='process',
+            name='process_decided_idx',
+        ),
+        migrations.AddField(
+            model_name='process',
+            name='decided_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Data da Decisão'),
+        ),
+        migrations.AddField(
+            model_name='process',
+            name='submitted_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Data de Submissão'),
+        ),
+        migrations.RunPython(backfill_status_dates, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='process',
+            index=models.Index(fields=['submitted_at'], name='process_submitted_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='process',
+            index=models.Index(fields=['decided_at'], name='process_decided_at_idx'),
+        ),
+    ]
@@ -1,12 +1,22 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError # 🔒 NOVO IMPORT PARA VALIDAÇÃO
+from django.utils import timezone
 import os # 🔒 NOVO IMPORT PARA LER EXTENSÕES DE FICHEIROS
 
+from .ingest import normalize_upload
+from .previews import preview_exists
+from .storage import attachment_storage, batched_releases, content_sha256
+
 # ==========================================
 # FUNÇÕES DE SEGURANÇA (VALIDADORES)
 # ==========================================
 
+# Regras de upload partilhadas com o upload handler (website/uploads.py)
+VALID_UPLOAD_EXTENSIONS = ['.pdf', '.jpg', '.jpeg', '.png']
+MAX_UPLOAD_MB = 5
+MAX_UPLOAD_BYTES = MAX_UPLOAD_MB * 1024 * 1024 # 5MB = 5 * 1024 * 1024 bytes
+
 def validate_file_extension_and_size(value):
     """
     🔒 MEDIDA DE SEGURANÇA: Previne upload de Malware e ficheiros gigantes.
@@ -14,16 +24,12 @@ def validate_file_extension_and_size(value):
     """
     # 1. Validar a extensão (Apenas PDFs e Imagens)
     ext = os.path.splitext(value.name)[1].lower()
-    valid_extensions = ['.pdf', '.jpg', '.jpeg', '.png']
-    if ext not in valid_extensions:
+    if ext not in VALID_UPLOAD_EXTENSIONS:
         raise ValidationError('Ficheiro não suportado. Por segurança, envie apenas PDF, JPG ou PNG.')
     
     # 2. Validar o tamanho (Limite de 5MB)
-    # 5MB = 5 * 1024 * 1024 bytes
-    limit_mb = 5
-    limit_bytes = limit_mb * 1024 * 1024
-    if value.size > limit_bytes:
-        raise ValidationError(f'O ficheiro é muito grande. O tamanho máximo permitido é {limit_mb}MB.')
+    if value.size > MAX_UPLOAD_BYTES:
+        raise ValidationError(f'O ficheiro é muito grande. O tamanho máximo permitido é {MAX_UPLOAD_MB}MB.')
 
 # ==========================================
 # 1. CONFIGURAÇÕES DO SISTEMA (Geridas pelo Admin)
@@ -60,7 +66,10 @@ class RequiredDoc(models.Model):
         verbose_name_plural = "Documentos Necessários"
 
     def __str__(self):
-        return f"{self.doc_name} ({self.service_type.name})"
+        # Nome do serviço pelo catálogo em memória (evita uma query por linha no admin)
+        from .catalog import get_service
+        service = get_service(self.service_type_id)
+        return f"{self.doc_name} ({service.name if service else self.service_type_id})"
 
 
 # ==========================================
@@ -103,6 +112,18 @@ class Process(models.Model):
         ('rejected', 'Rejeitado / Devolvido'),
     ]
 
+    # Estados finais: um processo nestes estados já não conta como "em aberto"
+    CLOSED_STATUSES = ['approved', 'rejected']
+
+    # Mudanças de estado permitidas nas ações do backoffice (website/transitions.py)
+    ALLOWED_TRANSITIONS = {
+        'draft': ['submitted'],
+        'submitted': ['review', 'approved', 'rejected'],
+        'review': ['approved', 'rejected'],
+        'approved': [],
+        'rejected': [],
+    }
+
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='processes')
     service_type = models.ForeignKey(ServiceType, on_delete=models.PROTECT, verbose_name="Tipo de Visto")
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='draft', verbose_name="Estado Atual")
@@ -110,15 +131,150 @@ class Process(models.Model):
     # Datas de controlo
     submission_date = models.DateTimeField(auto_now_add=True, verbose_name="Data de Criação")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Última Atualização")
+    # Marcadas quando o processo chega ao estado (e não mudam com gravações seguintes); ver stamp_status_dates()
+    submitted_at = models.DateTimeField(null=True, blank=True, editable=False, verbose_name="Data de Submissão")
+    decided_at = models.DateTimeField(null=True, blank=True, editable=False, verbose_name="Data da Decisão")
 
     class Meta:
         verbose_name = "Processo de Imigração"
         verbose_name_plural = "Processos de Imigração"
         ordering = ['-submission_date'] # Mostra os mais recentes primeiro
+        indexes = [
+            # Dashboard do utilizador: processos dele, mais recentes primeiro
+            models.Index(fields=['user', '-submission_date'], name='process_user_date_idx'),
+            # API pública (paginação por cursor) e ordenação global
+            models.Index(fields=['-submission_date', '-id'], name='process_date_id_idx'),
+            # Agrupamentos por estado no backoffice
+            models.Index(fields=['status', 'service_type'], name='process_status_service_idx'),
+            # Estatísticas (website/analytics.py): submissões e decisões por dia
+            models.Index(fields=['submitted_at'], name='process_submitted_at_idx'),
+            models.Index(fields=['decided_at'], name='process_decided_at_idx'),
+        ]
+        constraints = [
+            # Um só processo em aberto por utilizador, garantido pela BD (mesmo com pedidos
+            # em simultâneo). O índice parcial também serve a verificação do dashboard.
+            models.UniqueConstraint(
+                fields=['user'],
+                condition=~models.Q(status__in=['approved', 'rejected']),
+                name='one_open_process_per_user',
+            ),
+        ]
 
     def __str__(self):
         return f"Processo #{self.id:04d} - {self.service_type.name}"
 
+    def save(self, *args, **kwargs):
+        self.stamp_status_dates()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'status' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'submitted_at', 'decided_at'}
+        # Os contadores por estado (sinais em signals.py) ficam na mesma transação
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        # Os anexos apagados em cascata libertam os ficheiros todos de uma vez
+        with transaction.atomic(), batched_releases():
+            return super().delete(*args, **kwargs)
+
+    def stamp_status_dates(self, when=None):
+        """
+        Acerta submitted_at/decided_at com o estado atual: ficam com a data em que
+        o processo chegou a submetido / decidido e só são limpos se ele voltar atrás.
+        """
+        when = when or timezone.now()
+        if self.status == 'draft':
+            self.submitted_at = None
+        elif self.submitted_at is None:
+            self.submitted_at = when
+        if self.status not in self.CLOSED_STATUSES:
+            self.decided_at = None
+        elif self.decided_at is None:
+            self.decided_at = when
+
+    def document_checklist(self):
+        """
+        Monta a checklist de documentos (requisito + anexo enviado, se existir)
+        e um resumo dos obrigatórios, com uma só query (os anexos deste
+        processo): os requisitos vêm do catálogo em memória (website/catalog.py).
+
+        Devolve (checklist, resumo), onde resumo é um dicionário com
+        'mandatory_total', 'mandatory_uploaded' e 'complete'.
+        """
+        from .catalog import get_service
+        service = get_service(self.service_type_id)
+
+        # Mapa requisito -> anexo (a BD garante no máximo um anexo por requisito)
+        attachments = {attachment.required_doc_id: attachment for attachment in self.attachments.all()}
+        return self._checklist(service, attachments)
+
+    async def adocument_checklist(self):
+        """Versão async de document_checklist() (website/async_views.py), com a mesma query."""
+        from .catalog import aget_service
+        service = await aget_service(self.service_type_id)
+        attachments = {attachment.required_doc_id: attachment async for attachment in self.attachments.all()}
+        return self._checklist(service, attachments)
+
+    @staticmethod
+    def _checklist(service, attachments):
+        required_docs = service.requirements if service else ()
+        checklist = [
+            {'doc_type': doc_type, 'attachment': attachments.get(doc_type.id)}
+            for doc_type in required_docs
+        ]
+
+        mandatory = [item for item in checklist if item['doc_type'].is_mandatory]
+        uploaded = sum(1 for item in mandatory if item['attachment'] is not None)
+        summary = {
+            'mandatory_total': len(mandatory),
+            'mandatory_uploaded': uploaded,
+            'complete': uploaded == len(mandatory),
+        }
+        return checklist, summary
+
+
+class ProcessStatusCount(models.Model):
+    """
+    Contador de processos por (estado, tipo de serviço), mantido a cada
+    criação, remoção ou mudança de estado (ver website/counters.py).
+    Evita contar a tabela de processos inteira no painel dos gestores.
+    """
+    status = models.CharField(max_length=20, choices=Process.STATUS_CHOICES)
+    service_type = models.ForeignKey(ServiceType, on_delete=models.CASCADE, related_name='status_counts')
+    total = models.BigIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Contador de Processos"
+        verbose_name_plural = "Contadores de Processos"
+        constraints = [
+            models.UniqueConstraint(fields=['status', 'service_type'], name='unique_status_count'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_status_display()} / {self.service_type_id}: {self.total}"
+
+
+class ProcessStatusChange(models.Model):
+    """Histórico de mudanças de estado de um processo (quem, quando, de onde para onde)."""
+    process = models.ForeignKey(Process, on_delete=models.CASCADE, related_name='status_changes')
+    from_status = models.CharField(max_length=20, choices=Process.STATUS_CHOICES, verbose_name="Estado Anterior")
+    to_status = models.CharField(max_length=20, choices=Process.STATUS_CHOICES, verbose_name="Novo Estado")
+    changed_by = models.ForeignKey(
+        User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+', verbose_name="Alterado por"
+    )
+    changed_at = models.DateTimeField(default=timezone.now, verbose_name="Data")
+
+    class Meta:
+        verbose_name = "Mudança de Estado"
+        verbose_name_plural = "Histórico de Estados"
+        ordering = ['-changed_at']
+        indexes = [
+            models.Index(fields=['process', '-changed_at'], name='status_change_process_idx'),
+        ]
+
+    def __str__(self):
+        return f"#{self.process_id}: {self.from_status} -> {self.to_status}"
+
 
 class Attachment(models.Model):
     """
@@ -134,12 +290,21 @@ class Attachment(models.Model):
     required_doc = models.ForeignKey(RequiredDoc, on_delete=models.PROTECT, verbose_name="Requisito")
     
     # 🔒 SEGURANÇA: Validador adicionado ao campo file
+    # Guardado por conteúdo (SHA-256) e deduplicado; ver website/storage.py
     file = models.FileField(
         upload_to='documents/%Y/%m/', 
+        storage=attachment_storage,
         verbose_name="Ficheiro",
         validators=[validate_file_extension_and_size] # Aplica a função de segurança criada acima
     )
     
+    # Impressão digital do conteúdo, calculada durante o upload (website/uploads.py)
+    sha256 = models.CharField(max_length=64, blank=True, editable=False, verbose_name="SHA-256")
+
+    # Tamanho enviado vs. guardado (as imagens são normalizadas em website/ingest.py)
+    original_size = models.PositiveBigIntegerField(null=True, blank=True, editable=False, verbose_name="Tamanho Original (bytes)")
+    stored_size = models.PositiveBigIntegerField(null=True, blank=True, editable=False, verbose_name="Tamanho Guardado (bytes)")
+    
     uploaded_at = models.DateTimeField(auto_now_add=True, verbose_name="Data de Envio")
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     admin_feedback = models.TextField(blank=True, null=True, verbose_name="Motivo da Rejeição", help_text="Preencher apenas se rejeitar o documento.")
@@ -147,20 +312,98 @@ class Attachment(models.Model):
     class Meta:
         verbose_name = "Documento Anexado"
         verbose_name_plural = "Documentos Anexados"
+        constraints = [
+            # Um único ficheiro por requisito em cada processo (serve também de índice de pesquisa)
+            models.UniqueConstraint(fields=['process', 'required_doc'], name='unique_attachment_per_requirement'),
+        ]
 
     def __str__(self):
         return f"Doc: {self.required_doc.doc_name} (Proc #{self.process.id})"
 
+    def save(self, *args, **kwargs):
+        # Ficheiro acabado de enviar (ainda não está no storage): normaliza antes de gravar
+        # O save() do storage conta a referência ao ficheiro; o sinal post_save não a conta outra vez
+        self._reference_counted = bool(self.file) and not self.file._committed
+        if self._reference_counted:
+            self.original_size = self.file.size
+            normalized = normalize_upload(self.file)
+            if normalized is not self.file:
+                self.file = normalized
+            self.stored_size = self.file.size
+            # sha256 = hash do ficheiro guardado: o do upload (já calculado) ou, se a imagem foi
+            # normalizada, o do novo conteúdo. Passado ao storage para não ser calculado outra vez.
+            content = self.file.file
+            if not getattr(content, 'sha256', None):
+                content.sha256 = content_sha256(content)
+            self.sha256 = content.sha256
+        super().save(*args, **kwargs)
+
+    @property
+    def has_preview(self):
+        """True se a pré-visualização (website/previews.py) já foi gerada."""
+        return preview_exists(self.file.name, self.file.storage)
+
+
+class StoredBlob(models.Model):
+    """
+    Ficheiro físico guardado por conteúdo, partilhado por vários anexos iguais.
+    ref_count = número de anexos que o usam; a 0 o ficheiro é apagado.
+    """
+    name = models.CharField(max_length=255, unique=True, verbose_name="Ficheiro")
+    size = models.BigIntegerField(default=0, verbose_name="Tamanho (bytes)")
+    ref_count = models.PositiveIntegerField(default=0, verbose_name="Referências")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Ficheiro Armazenado"
+        verbose_name_plural = "Ficheiros Armazenados"
+
+    def __str__(self):
+        return f"{self.name} ({self.ref_count} ref.)"
+
 
 # ==========================================
 # 4. AGENDAMENTO FINAL (TICKET)
 # ==========================================
 
+class AppointmentSlot(models.Model):
+    """
+    Vaga de atendimento: um local, um dia e uma hora, com capacidade limitada.
+    As vagas são criadas e atribuídas pelo alocador em website/scheduling.py.
+    """
+    location = models.CharField(max_length=100, verbose_name="Local")
+    date = models.DateField(verbose_name="Dia")
+    start_time = models.TimeField(verbose_name="Hora")
+    capacity = models.PositiveIntegerField(verbose_name="Capacidade")
+    booked = models.PositiveIntegerField(default=0, verbose_name="Ocupadas")
+
+    class Meta:
+        verbose_name = "Vaga de Atendimento"
+        verbose_name_plural = "Vagas de Atendimento"
+        ordering = ['date', 'start_time', 'location']
+        constraints = [
+            # Uma vaga por (local, dia, hora); serve também de índice para procurar a próxima livre
+            models.UniqueConstraint(fields=['location', 'date', 'start_time'], name='unique_slot_per_location_time'),
+            # 🔒 Nunca mais marcações do que a capacidade, mesmo com pedidos em simultâneo
+            models.CheckConstraint(condition=models.Q(booked__lte=models.F('capacity')), name='slot_not_overbooked'),
+        ]
+        indexes = [
+            models.Index(fields=['date', 'start_time'], name='slot_date_time_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.location} - {self.date:%d/%m/%Y} {self.start_time:%H:%M} ({self.booked}/{self.capacity})"
+
+
 class Appointment(models.Model):
     """
     Marcação presencial gerada automaticamente após o processo ser 'approved'.
     """
     process = models.OneToOneField(Process, on_delete=models.CASCADE, verbose_name="Processo Associado")
+    slot = models.ForeignKey(
+        AppointmentSlot, on_delete=models.PROTECT, null=True, blank=True,
+        related_name='appointments', verbose_name="Vaga"
+    )
     appointment_date = models.DateTimeField(verbose_name="Data e Hora do Agendamento")
     location = models.CharField(max_length=100, default="Loja AIMA Lisboa - Campus Justiça")
     ticket_number = models.CharField(max_length=20, unique=True, verbose_name="Senha Digital")
@@ -0,0 +1,121 @@
+# ==============================================================================
+# IMIGRAÁGIL - PAGINATION.PY (PAGINAÇÃO POR CURSOR / KEYSET)
+# ==============================================================================
+# Em vez de OFFSET (que obriga a BD a saltar N linhas), o cursor guarda a última
+# posição vista (data de submissão + id). A página seguinte começa exatamente aí,
+# por isso o custo é o mesmo na página 1 ou na página 10.000.
+
+import base64
+from datetime import datetime
+
+from django.db.models import Q
+
+
+class InvalidCursor(ValueError):
+    """O cursor recebido do cliente está mal formado ou foi adulterado."""
+
+
+def encode_cursor(submission_date, pk):
+    """Converte a posição (data, id) num token opaco e seguro para URLs."""
+    raw = f"{submission_date.isoformat()}|{pk}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Operação inversa de encode_cursor. Lança InvalidCursor se o token for inválido."""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        date_part, pk_part = raw.split('|', 1)
+        return datetime.fromisoformat(date_part), int(pk_part)
+    except (ValueError, UnicodeDecodeError) as exc:
+        raise InvalidCursor('Cursor inválido.') from exc
+
+
+def keyset_filter(queryset, cursor, date_field='submission_date'):
+    """
+    Aplica o filtro "depois do cursor" a um queryset ordenado por (-data, -id).
+    Usa a mesma ordem descendente da listagem (mais recentes primeiro).
+    """
+    if cursor is None:
+        return queryset
+    last_date, last_pk = cursor
+    return queryset.filter(
+        Q(**{f'{date_field}__lt': last_date}) |
+        Q(**{date_field: last_date, 'pk__lt': last_pk})
+    )
+
+
+def parse_page_size(value, default, maximum):
+    """Lê o tamanho de página pedido pelo cliente, limitado a [1, maximum]."""
+    try:
+        size = int(value) if value not in (None, '') else default
+    except (TypeError, ValueError):
+        size = default
+    return max(1, min(size, maximum))
+
+
+class CountFreePage:
+    """
+    Página "anterior/seguinte" sem COUNT(*).
+    Imita a interface de django.core.paginator.Page usada nos templates.
+    """
+
+    def __init__(self, object_list, number, has_next):
+        self.object_list = object_list
+        self.number = number
+        self._has_next = has_next
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self.number > 1
+
+    def has_other_pages(self):
+        return self.has_previous() or self.has_next()
+
+    def next_page_number(self):
+        return self.number + 1
+
+    def previous_page_number(self):
+        return self.number - 1
+
+
+class CountFreePaginator:
+    """
+    Alternativa ao Paginator do Django que não conta o total de linhas.
+    Pede per_page + 1 linhas: se vier a linha extra, existe página seguinte.
+    """
+
+    def __init__(self, object_list, per_page):
+        self.object_list = object_list
+        self.per_page = per_page
+
+    def get_page(self, number):
+        try:
+            number = max(1, int(number))
+        except (TypeError, ValueError):
+            number = 1
+        offset = (number - 1) * self.per_page
+        rows = list(self.object_list[offset:offset + self.per_page + 1])
+        return CountFreePage(rows[:self.per_page], number, has_next=len(rows) > self.per_page)
+
+    async def aget_page(self, number):
+        """Versão async de get_page() (iteração async do queryset)."""
+        try:
+            number = max(1, int(number))
+        except (TypeError, ValueError):
+            number = 1
+        offset = (number - 1) * self.per_page
+        rows = [row async for row in self.object_list[offset:offset + self.per_page + 1]]
+        return CountFreePage(rows[:self.per_page], number, has_next=len(rows) > self.per_page)
@@ -0,0 +1,149 @@
+# ==============================================================================
+# IMIGRAÁGIL - PDF_CACHE.PY (CACHE EM DISCO DE PDFs GERADOS)
+# ==============================================================================
+# Guarda ficheiros gerados (ex: senhas em PDF) em disco, endereçados pelo
+# conteúdo que os gera: se os dados mudarem, a chave muda e o PDF antigo deixa
+# de ser servido. O espaço total é limitado e os ficheiros menos usados
+# recentemente (LRU) são apagados primeiro.
+#
+# Estrutura: <PDF_CACHE_DIR>/<grupo>/<chave>.pdf
+# O "grupo" (ex: id do processo) permite invalidar tudo de uma vez.
+# Marcadores "a gerar" abandonados (worker que morreu) e pastas de grupo vazias
+# são apagados em evict(), para não se acumularem.
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+
+class DiskLRUCache:
+    """Cache de bytes em disco, limitada em tamanho, com despejo LRU."""
+
+    def __init__(self, directory, max_bytes, suffix='.pdf', pending_timeout=60):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self.pending_timeout = pending_timeout  # Segundos após os quais um marcador "a gerar" é lixo
+        self._lock = threading.Lock()
+
+    def _path(self, group, key):
+        return self.directory / str(group) / f"{key}{self.suffix}"
+
+    def get(self, group, key):
+        """Devolve os bytes guardados ou None. Um acerto marca o ficheiro como usado agora."""
+        path = self._path(group, key)
+        try:
+            data = path.read_bytes()
+        except FileNotFoundError:
+            return None
+        try:
+            os.utime(path)  # mtime = último uso (o atime não é fiável em muitos discos)
+        except FileNotFoundError:
+            pass  # Despejado entretanto por outro processo; os bytes já foram lidos
+        return data
+
+    def contains(self, group, key):
+        return self._path(group, key).exists()
+
+    def _in_group_dir(self, path, create):
+        """Cria a pasta do grupo e corre create(); repete se a pasta foi apagada (vazia) entretanto."""
+        for attempt in range(3):
+            path.parent.mkdir(parents=True, exist_ok=True)
+            try:
+                return create()
+            except FileNotFoundError:
+                if attempt == 2:
+                    raise
+
+    def set(self, group, key, data):
+        """Grava de forma atómica (ficheiro temporário + rename) e aplica o limite de espaço."""
+        path = self._path(group, key)
+        fd, tmp_name = self._in_group_dir(path, lambda: tempfile.mkstemp(dir=path.parent, suffix='.tmp'))
+        try:
+            with os.fdopen(fd, 'wb') as tmp:
+                tmp.write(data)
+            os.replace(tmp_name, path)
+        except BaseException:
+            if os.path.exists(tmp_name):
+                os.unlink(tmp_name)
+            raise
+        self.evict()
+
+    # --- Marcadores "a gerar" (visíveis a todos os workers, pois vivem no disco) ---
+
+    def _pending_path(self, group, key):
+        return self.directory / str(group) / f"{key}.pending"
+
+    def mark_pending(self, group, key):
+        path = self._pending_path(group, key)
+        self._in_group_dir(path, path.touch)
+
+    def is_pending(self, group, key, max_age):
+        """True se alguém está a gerar esta entrada há menos de max_age segundos."""
+        try:
+            age = time.time() - self._pending_path(group, key).stat().st_mtime
+        except FileNotFoundError:
+            return False
+        return age < max_age
+
+    def clear_pending(self, group, key):
+        path = self._pending_path(group, key)
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+        self._remove_if_empty(path.parent)
+
+    def _remove_if_empty(self, directory):
+        try:
+            directory.rmdir()
+        except OSError:
+            pass  # Não está vazia (ou já foi apagada)
+
+    def invalidate(self, group):
+        """Apaga todas as entradas de um grupo."""
+        shutil.rmtree(self.directory / str(group), ignore_errors=True)
+
+    def clear(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def sweep(self):
+        """Apaga os marcadores "a gerar" com mais de pending_timeout segundos e as pastas de grupo vazias."""
+        cutoff = time.time() - self.pending_timeout
+        for path in self.directory.glob('*/*.pending'):
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+            except FileNotFoundError:
+                continue
+        for directory in self.directory.glob('*/'):
+            self._remove_if_empty(directory)
+
+    def evict(self):
+        """Limpa o lixo (sweep) e apaga os ficheiros menos usados até o total caber em max_bytes."""
+        with self._lock:
+            self.sweep()
+            entries = []
+            total = 0
+            for path in self.directory.glob(f'*/*{self.suffix}'):
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+
+            if total <= self.max_bytes:
+                return
+            for _, size, path in sorted(entries):
+                try:
+                    path.unlink()
+                except FileNotFoundError:
+                    pass
+                total -= size
+                self._remove_if_empty(path.parent)
+                if total <= self.max_bytes:
+                    break
@@ -0,0 +1,195 @@
+# ==============================================================================
+# IMIGRAÁGIL - PREVIEWS.PY (PRÉ-VISUALIZAÇÕES DOS ANEXOS)
+# ==============================================================================
+# Os revisores abriam o original (até 5MB) só para ver de relance o documento.
+# Para cada anexo é gerada uma imagem pequena (WebP, ou JPEG se o Pillow não
+# tiver WebP), guardada ao lado do original:
+#   documents/sha256/ab/cd/abcd...ef.pdf  ->  documents/sha256/ab/cd/abcd...ef.pdf.preview.webp
+#
+#   - imagens: reduzidas com o Pillow (draft() no JPEG descodifica já em escala menor);
+#   - PDFs: a maior imagem da 1ª página (documentos digitalizados) ou, se não
+#     houver, um cartão com o início do texto da página (pypdf).
+#
+# Como os originais são guardados por conteúdo, a pré-visualização também é
+# partilhada pelos anexos iguais. A geração corre depois do commit num pool de
+# processos (como as senhas em tickets.py), fora do pedido HTTP.
+
+import io
+import logging
+import multiprocessing
+import os
+import tempfile
+import textwrap
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from PIL import Image, ImageDraw, ImageFont, ImageOps, features
+from pypdf import PdfReader
+
+logger = logging.getLogger(__name__)
+
+PREVIEW_SUFFIXES = {'WEBP': '.preview.webp', 'JPEG': '.preview.jpg'}
+PREVIEW_CONTENT_TYPES = {'.webp': 'image/webp', '.jpg': 'image/jpeg'}
+
+
+def preview_format():
+    """Formato configurado (PREVIEW_FORMAT), com recurso a JPEG se o Pillow não suportar WebP."""
+    fmt = getattr(settings, 'PREVIEW_FORMAT', 'WEBP').upper()
+    if fmt == 'WEBP' and not features.check('webp'):
+        return 'JPEG'
+    return fmt if fmt in PREVIEW_SUFFIXES else 'JPEG'
+
+
+def preview_name(name):
+    """Nome (no mesmo storage) da pré-visualização do ficheiro `name`."""
+    return name + PREVIEW_SUFFIXES[preview_format()]
+
+
+def preview_content_type(name):
+    return PREVIEW_CONTENT_TYPES[os.path.splitext(name)[1]]
+
+
+def preview_exists(name, storage):
+    return bool(name) and storage.exists(preview_name(name))
+
+
+def delete_preview(name, storage):
+    """Apaga as pré-visualizações do ficheiro (em qualquer formato), se existirem."""
+    for suffix in PREVIEW_SUFFIXES.values():
+        storage.delete(name + suffix)
+
+
+# ==========================================
+# GERAÇÃO (SEM DJANGO: CORRE NO POOL)
+# ==========================================
+
+def _image_preview(data, max_size):
+    with Image.open(data) as image:
+        # No JPEG, descodifica logo a 1/2, 1/4 ou 1/8 do tamanho (muito mais rápido)
+        image.draft('RGB', (max_size, max_size))
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((max_size, max_size))
+        return image.convert('RGB')
+
+
+def _text_card(text, max_size):
+    """Imagem em formato A4 com as primeiras linhas do texto."""
+    width, height = int(max_size * 0.707), max_size
+    card = Image.new('RGB', (width, height), 'white')
+    draw = ImageDraw.Draw(card)
+    font = ImageFont.load_default()
+    lines = []
+    for paragraph in (text or '').splitlines():
+        lines.extend(textwrap.wrap(paragraph, width=max(width // 7, 10)) or [''])
+    y = 10
+    for line in lines or ['(sem texto)']:
+        if y > height - 20:
+            break
+        draw.text((10, y), line, fill='black', font=font)
+        y += 14
+    return card
+
+
+def _pdf_preview(path, max_size):
+    reader = PdfReader(path)
+    if reader.is_encrypted and not reader.decrypt(''):
+        return _text_card('PDF protegido por palavra-passe.', max_size)
+    if not reader.pages:
+        return _text_card('PDF sem páginas.', max_size)
+    page = reader.pages[0]
+
+    # Documento digitalizado: a página é (quase só) uma imagem; usa a maior
+    try:
+        images = list(page.images)
+    except Exception:
+        images = []
+    if images:
+        largest = max(images, key=lambda img: len(img.data))
+        try:
+            return _image_preview(io.BytesIO(largest.data), max_size)
+        except Exception:
+            pass  # Formato de imagem que o Pillow não abre: usa o texto
+
+    try:
+        text = page.extract_text()
+    except Exception:
+        text = ''
+    return _text_card(text[:2000], max_size)
+
+
+def build_preview(source_path, target_path, max_size, fmt, quality):
+    """
+    Gera a pré-visualização de `source_path` em `target_path` (escrita atómica).
+    Devolve True se correu bem. Não usa a BD nem settings: pode correr noutro processo.
+    """
+    try:
+        if source_path.lower().endswith('.pdf'):
+            image = _pdf_preview(source_path, max_size)
+        else:
+            with open(source_path, 'rb') as fh:
+                image = _image_preview(fh, max_size)
+
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(target_path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as tmp:
+                image.save(tmp, fmt, quality=quality, optimize=True)
+            os.replace(tmp_path, target_path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        return True
+    except Exception:
+        logger.exception("Não foi possível gerar a pré-visualização de %s.", source_path)
+        return False
+
+
+# ==========================================
+# EXECUÇÃO EM SEGUNDO PLANO (PROCESS POOL)
+# ==========================================
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_preview_executor():
+    """Pool partilhado (criado na primeira utilização). None se PREVIEW_WORKERS = 0."""
+    global _executor
+    workers = getattr(settings, 'PREVIEW_WORKERS', 1)
+    if workers <= 0:
+        return None
+    with _executor_lock:
+        if _executor is None:
+            # 'spawn' evita herdar ligações à BD e locks de threads do servidor
+            _executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+        return _executor
+
+
+def enqueue_preview(name, storage):
+    """
+    Pede a pré-visualização do ficheiro `name` (se ainda não existir).
+    Devolve o Future, ou None se já existia, foi gerada aqui mesmo ou o
+    ficheiro não está no storage (ex: anexo importado sem o ficheiro, ou já
+    apagado por outro pedido antes deste on_commit correr).
+    """
+    if not name or not storage.exists(name) or storage.exists(preview_name(name)):
+        return None
+    args = (
+        storage.path(name),
+        storage.path(preview_name(name)),
+        getattr(settings, 'PREVIEW_MAX_SIZE', 480),
+        preview_format(),
+        getattr(settings, 'PREVIEW_QUALITY', 70),
+    )
+
+    executor = get_preview_executor()
+    if executor is None:
+        # Sem pool (ex: testes): gera já, no processo atual
+        build_preview(*args)
+        return None
+    try:
+        return executor.submit(build_preview, *args)
+    except Exception:
+        # Pool indisponível: volta a ser pedida quando alguém abrir a pré-visualização
+        logger.exception("Não foi possível enviar %s para o pool de pré-visualizações.", name)
+        return None
@@ -0,0 +1,222 @@
+# ==============================================================================
+# IMIGRAÁGIL - PROFILING.PY (INSTRUMENTAÇÃO DOS PEDIDOS E ORÇAMENTOS DE QUERIES)
+# ==============================================================================
+# Para apanhar views que se transformam em loops N+1 sem ninguém reparar, o
+# RequestProfilingMiddleware mede em cada pedido:
+#   - nº de queries SQL e tempo total na BD (connection.execute_wrapper);
+#   - tempo a desenhar templates (backend TimedDjangoTemplates, em TEMPLATES);
+#   - tamanho da resposta (também nas respostas em streaming, no fim do envio).
+# O resumo vai para o logger 'website.profiling' (INFO). Se a rota exceder o
+# seu orçamento (settings.QUERY_BUDGETS, por nome do URL) ou repetir a mesma
+# query várias vezes, é registado um aviso com as queries mais lentas e as
+# repetidas; com QUERY_BUDGET_STRICT (ligado nos testes) o pedido falha com
+# QueryBudgetExceeded.
+#
+# Ligado com settings.REQUEST_PROFILING (sem ele o middleware sai da cadeia).
+# Funciona em modo síncrono e async (views de website/async_views.py): sob ASGI
+# não obriga o Django a correr a cadeia inteira numa thread.
+# Nota: as queries feitas durante o render contam no tempo de BD e no de templates.
+
+import logging
+import time
+from collections import Counter
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.template.backends.django import DjangoTemplates
+
+logger = logging.getLogger(__name__)
+
+# Medições do pedido em curso (None fora do middleware)
+_current = ContextVar('request_profile', default=None)
+
+
+class QueryBudgetExceeded(Exception):
+    """Uma rota fez mais queries do que o orçamento definido em QUERY_BUDGETS."""
+
+
+def query_budget(url_name):
+    """Máximo de queries para a rota `url_name` (None = sem limite)."""
+    budgets = getattr(settings, 'QUERY_BUDGETS', {})
+    if url_name in budgets:
+        return budgets[url_name]
+    return getattr(settings, 'QUERY_BUDGET_DEFAULT', None)
+
+
+class RequestProfile:
+    """Medições de um pedido. É também o wrapper passado a connection.execute_wrapper()."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = []  # (sql, segundos)
+        self.template_time = 0.0
+        self.response_size = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, time.perf_counter() - started))
+
+    @property
+    def db_time(self):
+        return sum(duration for _, duration in self.queries)
+
+    def slowest(self, limit):
+        """As `limit` queries mais lentas: [(sql, segundos)]."""
+        return sorted(self.queries, key=lambda query: query[1], reverse=True)[:limit]
+
+    def duplicates(self, min_count):
+        """SQL repetido (mesmo texto, parâmetros à parte) pelo menos `min_count` vezes: [(sql, vezes)]."""
+        counts = Counter(sql for sql, _ in self.queries)
+        return [(sql, count) for sql, count in counts.most_common() if count >= min_count]
+
+
+def _add_wrapper(wrapper):
+    connection.execute_wrappers.append(wrapper)
+
+
+def _remove_wrapper(wrapper):
+    connection.execute_wrappers.remove(wrapper)
+
+
+class RequestProfilingMiddleware:
+    """Mede cada pedido e aplica os orçamentos de queries (ver o topo do ficheiro)."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'REQUEST_PROFILING', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        profile = RequestProfile()
+        token = _current.set(profile)
+        try:
+            with connection.execute_wrapper(profile):
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, profile)
+
+    async def __acall__(self, request):
+        profile = RequestProfile()
+        token = _current.set(profile)
+        try:
+            # As ligações à BD são por thread: o ORM (também o async) corre na thread
+            # "sync" do pedido, por isso o wrapper é instalado nessa thread
+            await sync_to_async(_add_wrapper)(profile)
+            try:
+                response = await self.get_response(request)
+            finally:
+                await sync_to_async(_remove_wrapper)(profile)
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, profile)
+
+    def _finish(self, request, response, profile):
+        # As queries e o tamanho do streaming só se conhecem no fim do envio
+        if response.streaming:
+            measure = self._ameasure_stream if response.is_async else self._measure_stream
+            response.streaming_content = measure(request, response, response.streaming_content, profile)
+            return response
+        profile.response_size = len(response.content)
+        if settings.DEBUG:
+            response.headers['Server-Timing'] = (
+                f'db;dur={profile.db_time * 1000:.1f};desc="{len(profile.queries)} queries", '
+                f'tpl;dur={profile.template_time * 1000:.1f}, '
+                f'total;dur={(time.perf_counter() - profile.started) * 1000:.1f}'
+            )
+        self._report(request, response, profile)
+        return response
+
+    def _measure_stream(self, request, response, content, profile):
+        with connection.execute_wrapper(profile):
+            for chunk in content:
+                profile.response_size += len(chunk)
+                yield chunk
+        self._report(request, response, profile)
+
+    async def _ameasure_stream(self, request, response, content, profile):
+        await sync_to_async(_add_wrapper)(profile)
+        try:
+            async for chunk in content:
+                profile.response_size += len(chunk)
+                yield chunk
+        finally:
+            await sync_to_async(_remove_wrapper)(profile)
+        self._report(request, response, profile)
+
+    def _report(self, request, response, profile):
+        match = request.resolver_match
+        url_name = match.url_name if match else None
+        count = len(profile.queries)
+        summary = (
+            f"{request.method} {url_name or request.path} {response.status_code}: "
+            f"{count} queries ({profile.db_time * 1000:.1f} ms na BD), "
+            f"templates {profile.template_time * 1000:.1f} ms, {profile.response_size} bytes, "
+            f"total {(time.perf_counter() - profile.started) * 1000:.1f} ms"
+        )
+
+        budget = query_budget(url_name)
+        over_budget = budget is not None and count > budget
+        duplicates = profile.duplicates(getattr(settings, 'REQUEST_PROFILING_DUPLICATES', 3))
+        if not over_budget and not duplicates:
+            logger.info(summary)
+            return
+
+        lines = [summary]
+        if over_budget:
+            lines.insert(0, f"Orçamento de queries excedido em '{url_name}': {count} > {budget}")
+        for sql, duration in profile.slowest(getattr(settings, 'REQUEST_PROFILING_SLOWEST', 3)):
+            lines.append(f"  lenta ({duration * 1000:.1f} ms): {sql}")
+        for sql, times in duplicates:
+            lines.append(f"  repetida {times}x: {sql}")
+        message = '\n'.join(lines)
+        if over_budget and getattr(settings, 'QUERY_BUDGET_STRICT', False):
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
+
+
+# ==========================================
+# TEMPO DOS TEMPLATES
+# ==========================================
+
+class _TimedTemplate:
+    """Template do backend do Django que soma o tempo de render ao pedido em curso."""
+
+    def __init__(self, template):
+        self._template = template
+
+    def __getattr__(self, name):
+        return getattr(self._template, name)
+
+    def render(self, context=None, request=None):
+        profile = _current.get()
+        if profile is None:
+            return self._template.render(context, request)
+        started = time.perf_counter()
+        try:
+            return self._template.render(context, request)
+        finally:
+            profile.template_time += time.perf_counter() - started
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """DjangoTemplates com medição do tempo de render (sem custo fora do middleware)."""
+
+    def from_string(self, template_code):
+        return _TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return _TimedTemplate(super().get_template(template_name))
@@ -0,0 +1,253 @@
+# ==============================================================================
+# IMIGRAÁGIL - SCHEDULING.PY (ALOCAÇÃO DE VAGAS DE ATENDIMENTO)
+# ==============================================================================
+# Em vez de uma data aleatória num único local, cada agendamento ocupa uma
+# vaga (AppointmentSlot) com capacidade limitada por local, dia e hora.
+# Atribui-se sempre a vaga livre mais cedo.
+#
+# Concorrência: a ocupação é feita com "compare-and-swap" na própria BD
+#   UPDATE ... SET booked = booked + 1 WHERE id = X AND booked < capacity
+# Se outro pedido ocupou o último lugar entretanto, o UPDATE não altera nada
+# e tenta-se a vaga seguinte. Funciona igual em SQLite e PostgreSQL, e a
+# CheckConstraint 'slot_not_overbooked' garante o limite em último caso.
+#
+# Apagar um agendamento (no admin ou em cascata com o processo) devolve o
+# lugar à vaga: sinal post_delete em signals.py -> release_slots().
+
+import datetime
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Max
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .metrics import APPOINTMENT_ALLOCATIONS
+from .models import Appointment, AppointmentSlot
+
+
+class NoSlotsAvailable(Exception):
+    """Não há vagas livres dentro do horizonte de agendamento."""
+
+
+class _ConcurrentUpdate(Exception):
+    """Outro pedido alterou uma vaga durante a alocação em massa."""
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def locations():
+    return _setting('APPOINTMENT_LOCATIONS', ["Loja AIMA Lisboa - Campus de Justiça"])
+
+
+def daily_start_times():
+    """Horas de início das vagas de um dia (ex: 09:00, 09:30, ..., 16:30)."""
+    opening, closing = _setting('APPOINTMENT_OPENING_HOURS', ('09:00', '17:00'))
+    step = datetime.timedelta(minutes=_setting('APPOINTMENT_SLOT_MINUTES', 30))
+    current = datetime.datetime.combine(datetime.date.min, datetime.time.fromisoformat(opening))
+    end = datetime.datetime.combine(datetime.date.min, datetime.time.fromisoformat(closing))
+    times = []
+    while current + step <= end:
+        times.append(current.time())
+        current += step
+    return times
+
+
+def _working_days(start, end):
+    day = start
+    while day <= end:
+        if day.weekday() < 5:  # Segunda a sexta
+            yield day
+        day += datetime.timedelta(days=1)
+
+
+def first_bookable_date():
+    """A primeira data possível (antecedência mínima, como os 10 dias de antes)."""
+    return timezone.localdate() + datetime.timedelta(days=_setting('APPOINTMENT_LEAD_DAYS', 10))
+
+
+def ensure_slots(until):
+    """
+    Cria as vagas em falta até à data `until`, para todos os locais.
+    Só gera a "cauda" que ainda não existe (uma query para saber onde parar).
+    """
+    start = first_bookable_date()
+    last_by_location = dict(
+        AppointmentSlot.objects.filter(date__gte=start)
+        .values_list('location')
+        .annotate(last=Max('date'))
+        .order_by()
+    )
+    capacity = _setting('APPOINTMENT_SLOT_CAPACITY', 4)
+    times = daily_start_times()
+
+    new_slots = []
+    for location in locations():
+        last = last_by_location.get(location)
+        first_missing = max(start, last + datetime.timedelta(days=1)) if last else start
+        for day in _working_days(first_missing, until):
+            new_slots.extend(
+                AppointmentSlot(location=location, date=day, start_time=t, capacity=capacity)
+                for t in times
+            )
+    AppointmentSlot.objects.bulk_create(new_slots, batch_size=2000, ignore_conflicts=True)
+
+
+def _free_slots(location=None):
+    queryset = AppointmentSlot.objects.filter(
+        date__gte=first_bookable_date(), booked__lt=F('capacity')
+    ).order_by('date', 'start_time', 'location')
+    if location:
+        queryset = queryset.filter(location=location)
+    return queryset
+
+
+def _horizons():
+    """Janelas crescentes de vagas a gerar (evita criar um ano de vagas se bastar um mês)."""
+    horizon = _setting('APPOINTMENT_HORIZON_DAYS', 365)
+    start = first_bookable_date()
+    for days in (30, 90, horizon):
+        if days <= horizon:
+            yield start + datetime.timedelta(days=days)
+
+
+def allocate_slot(location=None, max_attempts=50):
+    """
+    Ocupa um lugar na vaga livre mais cedo e devolve-a.
+    Lança NoSlotsAvailable se não houver vagas dentro do horizonte.
+    """
+    for until in _horizons():
+        ensure_slots(until)
+        for _ in range(max_attempts):
+            candidate = _free_slots(location).filter(date__lte=until).first()
+            if candidate is None:
+                break  # Esta janela está cheia: alarga o horizonte
+            # Compare-and-swap: só ocupa se ainda houver lugar
+            updated = AppointmentSlot.objects.filter(
+                pk=candidate.pk, booked__lt=F('capacity')
+            ).update(booked=F('booked') + 1)
+            if updated:
+                candidate.booked += 1
+                APPOINTMENT_ALLOCATIONS.inc(outcome='allocated')
+                return candidate
+            APPOINTMENT_ALLOCATIONS.inc(outcome='conflict')
+    APPOINTMENT_ALLOCATIONS.inc(outcome='no_slots')
+    raise NoSlotsAvailable('Não há vagas disponíveis de momento. Tenta novamente mais tarde.')
+
+
+def allocate_slots(count, location=None, max_attempts=10):
+    """
+    Versão em massa: reserva `count` lugares pelas vagas mais cedo, numa só
+    transação. Devolve a lista de vagas (uma entrada por lugar, em ordem).
+
+    Cada vaga tocada é atualizada com compare-and-swap sobre o valor lido;
+    se outro pedido a alterou entretanto, a transação é desfeita e repetida.
+    """
+    if count <= 0:
+        return []
+    for _ in range(max_attempts):
+        try:
+            with transaction.atomic():
+                slots = _allocate_slots_once(count, location)
+        except _ConcurrentUpdate:
+            APPOINTMENT_ALLOCATIONS.inc(outcome='conflict')
+            continue
+        except NoSlotsAvailable:
+            APPOINTMENT_ALLOCATIONS.inc(count, outcome='no_slots')
+            raise
+        APPOINTMENT_ALLOCATIONS.inc(count, outcome='allocated')
+        return slots
+    APPOINTMENT_ALLOCATIONS.inc(count, outcome='no_slots')
+    raise NoSlotsAvailable('Não foi possível reservar as vagas (demasiada concorrência).')
+
+
+def _allocate_slots_once(count, location):
+    assigned = []
+    for until in _horizons():
+        ensure_slots(until)
+        # Cada vaga livre dá pelo menos 1 lugar: nunca são precisas mais do que as que faltam
+        free = _free_slots(location).filter(date__lte=until).values_list('pk', 'booked', 'capacity')
+        for pk, booked, capacity in list(free[:count - len(assigned)]):
+            take = min(capacity - booked, count - len(assigned))
+            updated = AppointmentSlot.objects.filter(pk=pk, booked=booked).update(booked=booked + take)
+            if not updated:
+                raise _ConcurrentUpdate()
+            assigned.extend([pk] * take)
+            if len(assigned) == count:
+                break
+        if len(assigned) == count:
+            break
+    else:
+        raise NoSlotsAvailable('Não há vagas suficientes dentro do horizonte de agendamento.')
+
+    slots = AppointmentSlot.objects.in_bulk(set(assigned))
+    return [slots[pk] for pk in assigned]
+
+
+def release_slots(slot_ids):
+    """
+    Devolve os lugares de agendamentos apagados (um id de vaga por agendamento;
+    None = agendamento antigo sem vaga). Uma query por cada número distinto de
+    repetições, normalmente só uma.
+    """
+    counts = Counter(pk for pk in slot_ids if pk is not None)
+    by_count = defaultdict(list)
+    for pk, count in counts.items():
+        by_count[count].append(pk)
+    for count, group in by_count.items():
+        AppointmentSlot.objects.filter(pk__in=group).update(booked=Greatest(F('booked') - count, 0))
+
+
+def slot_datetime(slot):
+    """Data/hora (com fuso horário) do início da vaga."""
+    return timezone.make_aware(datetime.datetime.combine(slot.date, slot.start_time))
+
+
+def ticket_number_for(process_id):
+    """
+    Senha determinística (um agendamento por processo, logo nunca repete).
+    Usa 6 dígitos para nunca coincidir com as senhas antigas aleatórias (AIMA-NNNN).
+    """
+    return f"AIMA-{process_id:06d}"
+
+
+def _appointment_for(process_id, slot):
+    return Appointment(
+        process_id=process_id,
+        slot=slot,
+        appointment_date=slot_datetime(slot),
+        location=slot.location,
+        ticket_number=ticket_number_for(process_id),
+    )
+
+
+def book_appointment(process, location=None):
+    """
+    Marca o agendamento de um processo aprovado na vaga livre mais cedo.
+    Se o processo já tiver agendamento (pedido em duplicado), a vaga é libertada
+    e é lançado IntegrityError.
+    """
+    with transaction.atomic():
+        slot = allocate_slot(location)
+        appointment = _appointment_for(process.id, slot)
+        appointment.save()
+    return appointment
+
+
+def book_appointments(process_ids, location=None):
+    """
+    Marca agendamentos para um lote de processos numa só transação
+    (vagas + bulk_create). Processos que já têm agendamento são ignorados.
+    """
+    with transaction.atomic():
+        already = set(
+            Appointment.objects.filter(process_id__in=process_ids).values_list('process_id', flat=True)
+        )
+        pending = [pk for pk in process_ids if pk not in already]
+        slots = allocate_slots(len(pending), location)
+        appointments = [_appointment_for(pk, slot) for pk, slot in zip(pending, slots)]
+        Appointment.objects.bulk_create(appointments, batch_size=1000)
+    return appointments
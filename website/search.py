@@ -0,0 +1,187 @@
+# ==============================================================================
+# IMIGRAÁGIL - SEARCH.PY (ÍNDICE DE PESQUISA DE PROCESSOS)
+# ==============================================================================
+# Substitui os `icontains` (LIKE '%x%', que obrigam a ler a tabela toda) por um
+# índice de texto. Cada processo é indexado pela referência (PT/AAAA/NNNN),
+# nome do serviço, username, passaporte e NIF.
+#
+# O backend é configurável em settings.SEARCH_BACKEND:
+#   - 'website.search.SQLiteFTS5Backend'  -> tabela virtual FTS5 (só em SQLite)
+#   - 'website.search.DatabaseLikeBackend' -> LIKE no ORM (ex: PostgreSQL sem FTS)
+# Sem valor (None), é escolhido pela BD: FTS5 em SQLite, LIKE nas outras.
+
+import re
+from abc import ABC, abstractmethod
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+
+# Nome da tabela virtual criada na migração 0008
+FTS_TABLE = 'website_process_search'
+
+# Palavras (letras/dígitos) de uma pesquisa do utilizador
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def process_reference(pk, submission_date):
+    """Referência pública do processo, igual à que aparece no dashboard."""
+    return f"PT/{submission_date:%Y}/{pk:04d}"
+
+
+def _document_rows(process_ids=None):
+    """
+    Linhas (id, referência, serviço, username, passaporte, NIF) a indexar,
+    lidas numa só query com JOINs.
+    """
+    from .models import Process
+
+    queryset = Process.objects.order_by()
+    if process_ids is not None:
+        queryset = queryset.filter(id__in=process_ids)
+    rows = queryset.values_list(
+        'id', 'submission_date', 'service_type__name',
+        'user__username', 'user__profile__passport', 'user__profile__nif',
+    )
+    for pk, submission_date, service, username, passport, nif in rows.iterator(chunk_size=2000):
+        # Inclui também o id "cru" para que pesquisar "12" encontre PT/2026/0012
+        reference = f"{process_reference(pk, submission_date)} {pk}"
+        yield pk, reference, service or '', username or '', passport or '', nif or ''
+
+
+class SearchBackend(ABC):
+    """
+    Interface comum dos backends de pesquisa.
+    Os métodos de indexação são chamados pelos sinais em website/signals.py;
+    por omissão não fazem nada (backends sem índice). filter() é obrigatório.
+    """
+
+    def index_processes(self, process_ids):
+        """(Re)indexa os processos indicados."""
+
+    def remove_processes(self, process_ids):
+        """Remove os processos indicados do índice."""
+
+    def rebuild(self, batch_size=2000):
+        """Reconstrói o índice completo. Devolve o número de processos indexados."""
+        return 0
+
+    @abstractmethod
+    def filter(self, queryset, query):
+        """Restringe um queryset de Process aos resultados da pesquisa."""
+
+
+class DatabaseLikeBackend(SearchBackend):
+    """
+    Backend sem índice: usa LIKE no ORM, como antes.
+    Útil em bases de dados sem FTS5; não precisa de sincronização.
+    """
+
+    def filter(self, queryset, query):
+        condition = (
+            Q(service_type__name__icontains=query) |
+            Q(user__username__icontains=query) |
+            Q(user__profile__passport__icontains=query) |
+            Q(user__profile__nif__icontains=query)
+        )
+        if query.isdigit():
+            condition |= Q(id=int(query))
+        return queryset.filter(condition)
+
+
+class SQLiteFTS5Backend(SearchBackend):
+    """
+    Backend com tabela virtual FTS5 do SQLite.
+    O rowid da tabela virtual é o id do processo.
+    """
+
+    def __init__(self):
+        if connection.vendor != 'sqlite':
+            # A migração 0008 só cria a tabela FTS5 em SQLite
+            raise ImproperlyConfigured(
+                f"SQLiteFTS5Backend precisa de SQLite (BD atual: {connection.vendor}); "
+                "usar SEARCH_BACKEND = None ou 'website.search.DatabaseLikeBackend'."
+            )
+
+    def index_processes(self, process_ids):
+        process_ids = list(process_ids)
+        if not process_ids:
+            return
+        with connection.cursor() as cursor:
+            self._delete(cursor, process_ids)
+            self._insert(cursor, list(_document_rows(process_ids)))
+
+    def remove_processes(self, process_ids):
+        process_ids = list(process_ids)
+        if process_ids:
+            with connection.cursor() as cursor:
+                self._delete(cursor, process_ids)
+
+    def rebuild(self, batch_size=2000):
+        total = 0
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE}")
+            batch = []
+            for row in _document_rows():
+                batch.append(row)
+                if len(batch) >= batch_size:
+                    total += self._insert(cursor, batch)
+                    batch = []
+            total += self._insert(cursor, batch)
+            # Junta os segmentos do índice para pesquisas mais rápidas
+            cursor.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')")
+        return total
+
+    def filter(self, queryset, query):
+        match = self.match_expression(query)
+        if not match:
+            return queryset.none()
+        return queryset.filter(id__in=RawSQL(
+            f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [match]
+        ))
+
+    @staticmethod
+    def match_expression(query):
+        """
+        Converte o texto do utilizador numa expressão MATCH segura:
+        cada palavra vira um prefixo entre aspas e todas têm de existir (AND).
+        Ex: 'PT/2026/0012' -> '"PT"* "2026"* "0012"*'
+        """
+        tokens = _TOKEN_RE.findall(query)
+        return ' '.join(f'"{token}"*' for token in tokens)
+
+    @staticmethod
+    def _delete(cursor, process_ids):
+        placeholders = ', '.join(['%s'] * len(process_ids))
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})", process_ids)
+
+    @staticmethod
+    def _insert(cursor, rows):
+        if rows:
+            cursor.executemany(
+                f"INSERT INTO {FTS_TABLE} (rowid, reference, service, username, passport, nif) "
+                "VALUES (%s, %s, %s, %s, %s, %s)",
+                rows,
+            )
+        return len(rows)
+
+
+@lru_cache(maxsize=None)
+def get_search_backend():
+    """Instância (única) do backend configurado em settings.SEARCH_BACKEND (None = pela BD)."""
+    path = getattr(settings, 'SEARCH_BACKEND', None)
+    if not path:
+        path = (
+            'website.search.SQLiteFTS5Backend' if connection.vendor == 'sqlite'
+            else 'website.search.DatabaseLikeBackend'
+        )
+    return import_string(path)()
+
+
+def search_processes(queryset, query):
+    """Atalho usado pelas views e pelo admin."""
+    return get_search_backend().filter(queryset, query)
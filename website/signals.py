@@ -0,0 +1,162 @@
+# ==============================================================================
+# IMIGRAÁGIL - SIGNALS.PY (SINCRONIZAÇÃO AUTOMÁTICA)
+# ==============================================================================
+# Sinais ligados em WebsiteConfig.ready() (apps.py).
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .catalog import bump_catalog_version
+from .counters import record_change
+from .models import Appointment, Attachment, Process, ProcessStatusChange, Profile, RequiredDoc, ServiceType
+from .previews import enqueue_preview
+from .scheduling import release_slots
+from .search import get_search_backend
+from .storage import add_reference, release_reference
+from .tickets import invalidate_ticket
+
+# ==========================================
+# 1. ÍNDICE DE PESQUISA DE PROCESSOS
+# ==========================================
+
+@receiver(post_save, sender=Process)
+def index_process(sender, instance, raw=False, **kwargs):
+    """Indexa o processo sempre que é criado ou alterado."""
+    if not raw:
+        get_search_backend().index_processes([instance.pk])
+
+
+@receiver(post_delete, sender=Process)
+def unindex_process(sender, instance, **kwargs):
+    """Remove o processo apagado do índice."""
+    get_search_backend().remove_processes([instance.pk])
+
+
+@receiver(post_save, sender=ServiceType)
+def reindex_service_processes(sender, instance, created=False, raw=False, **kwargs):
+    """Se o nome do serviço mudar, os processos desse serviço têm de ser reindexados."""
+    if not raw and not created:
+        ids = Process.objects.filter(service_type=instance).values_list('id', flat=True)
+        get_search_backend().index_processes(ids)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=Profile)
+def reindex_user_processes(sender, instance, created=False, raw=False, update_fields=None, **kwargs):
+    """Username, passaporte e NIF fazem parte do índice: reindexa os processos do utilizador."""
+    if raw or (created and sender is User):
+        return  # Um utilizador acabado de criar ainda não tem processos
+    if sender is User and update_fields is not None and 'username' not in update_fields:
+        return  # Ex: o login só grava 'last_login'
+    user_id = instance.pk if sender is User else instance.user_id
+    ids = Process.objects.filter(user_id=user_id).values_list('id', flat=True)
+    get_search_backend().index_processes(ids)
+
+
+# ==========================================
+# 2. CACHE DE PDFs DAS SENHAS
+# ==========================================
+
+@receiver(post_save, sender=Appointment)
+@receiver(post_delete, sender=Appointment)
+def invalidate_appointment_ticket(sender, instance, **kwargs):
+    """Qualquer alteração ao agendamento invalida o PDF guardado."""
+    invalidate_ticket(instance.process_id)
+
+
+@receiver(post_save, sender=Process)
+@receiver(post_delete, sender=Process)
+def invalidate_process_ticket(sender, instance, **kwargs):
+    """O PDF mostra dados do processo (referência, serviço): invalida também."""
+    invalidate_ticket(instance.pk)
+
+
+# ==========================================
+# 3. CONTAGEM DE REFERÊNCIAS DOS FICHEIROS
+# ==========================================
+
+@receiver(pre_save, sender=Attachment)
+def remember_previous_file(sender, instance, raw=False, **kwargs):
+    """Guarda o nome do ficheiro anterior, para saber se foi substituído."""
+    instance._previous_file_name = None
+    if instance.pk and not raw:
+        instance._previous_file_name = (
+            Attachment.objects.filter(pk=instance.pk).values_list('file', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Attachment)
+def count_file_reference(sender, instance, created=False, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_previous_file_name', None)
+    current = instance.file.name
+    if created or previous != current:
+        if not getattr(instance, '_reference_counted', False):
+            # Ficheiro já existente no storage (ex: importado): o save() do storage não correu
+            add_reference(current, instance.file.storage)
+        if previous:
+            release_reference(previous, instance.file.storage)
+        # Pré-visualização gerada em segundo plano, só depois de o anexo estar gravado
+        storage = instance.file.storage
+        transaction.on_commit(lambda: enqueue_preview(current, storage))
+
+
+@receiver(post_delete, sender=Attachment)
+def release_file_reference(sender, instance, **kwargs):
+    """Apagar o anexo liberta o ficheiro; o último a sair apaga-o do disco."""
+    release_reference(instance.file.name, instance.file.storage)
+
+
+# ==========================================
+# 4. CONTADORES E HISTÓRICO DE ESTADOS
+# ==========================================
+
+@receiver(pre_save, sender=Process)
+def remember_previous_status(sender, instance, raw=False, **kwargs):
+    """Guarda o estado e serviço anteriores, para acertar o contador e o histórico."""
+    instance._previous_status_key = None
+    if instance.pk and not raw:
+        instance._previous_status_key = (
+            Process.objects.filter(pk=instance.pk).values_list('status', 'service_type_id').first()
+        )
+
+
+@receiver(post_save, sender=Process)
+def count_process_status(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_previous_status_key', None)
+    record_change(previous, (instance.status, instance.service_type_id))
+    if previous is not None and previous[0] != instance.status:
+        ProcessStatusChange.objects.create(process=instance, from_status=previous[0], to_status=instance.status)
+
+
+@receiver(post_delete, sender=Process)
+def uncount_process(sender, instance, **kwargs):
+    record_change((instance.status, instance.service_type_id), None)
+
+
+# ==========================================
+# 5. CACHE DO CATÁLOGO DE SERVIÇOS
+# ==========================================
+
+@receiver(post_save, sender=ServiceType)
+@receiver(post_delete, sender=ServiceType)
+@receiver(post_save, sender=RequiredDoc)
+@receiver(post_delete, sender=RequiredDoc)
+def invalidate_catalog(sender, instance, **kwargs):
+    """Qualquer alteração ao catálogo (admin, shell, fixtures) muda a versão em cache."""
+    bump_catalog_version()
+
+
+# ==========================================
+# 6. LUGARES OCUPADOS NAS VAGAS
+# ==========================================
+
+@receiver(post_delete, sender=Appointment)
+def release_appointment_slot(sender, instance, **kwargs):
+    """Apagar o agendamento (admin, cascata do processo) liberta o lugar na vaga."""
+    release_slots([instance.slot_id])
@@ -0,0 +1,271 @@
+# ==============================================================================
+# IMIGRAÁGIL - STORAGE.PY (ARMAZENAMENTO DEDUPLICADO DOS ANEXOS)
+# ==============================================================================
+# Os ficheiros dos anexos são guardados pelo hash SHA-256 do conteúdo:
+#   MEDIA_ROOT/documents/sha256/ab/cd/abcd...ef.pdf
+# Dois uploads iguais (ex: o mesmo passaporte numa renovação) apontam para o
+# mesmo ficheiro em disco. A tabela StoredBlob conta quantos anexos usam cada
+# ficheiro; só quando o último é apagado é que o ficheiro é removido.
+#
+# Corrida entre um upload e a remoção do mesmo ficheiro: cada save() no
+# storage conta a sua referência ANTES de reutilizar o ficheiro em disco, e a
+# remoção só apaga o ficheiro com a linha do StoredBlob bloqueada e ainda a 0.
+#
+# Apagar um processo apaga os anexos em cascata (um sinal post_delete por
+# anexo): dentro de batched_releases() as libertações são juntas e feitas no
+# fim, com um número fixo de queries seja qual for o número de anexos.
+#
+# Se a transação de um upload for desfeita depois de o ficheiro ir para o
+# disco, a linha do StoredBlob desaparece e o ficheiro fica órfão: o comando
+# dedupe_attachments apaga-os (delete_orphan_blobs).
+
+import hashlib
+import os
+import tempfile
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.core.files.storage import FileSystemStorage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+
+BLOB_PREFIX = 'documents/sha256'
+
+
+def blob_name(digest, ext):
+    """Nome (relativo a MEDIA_ROOT) do ficheiro com este conteúdo."""
+    return f"{BLOB_PREFIX}/{digest[:2]}/{digest[2:4]}/{digest}{ext.lower()}"
+
+
+def is_blob(name):
+    """True se o ficheiro foi guardado por conteúdo (e portanto tem contagem de referências)."""
+    return bool(name) and name.startswith(BLOB_PREFIX + '/')
+
+
+def content_sha256(content):
+    """SHA-256 (hex) de um ficheiro do Django, lido por blocos."""
+    digest = hashlib.sha256()
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    for chunk in content.chunks():
+        digest.update(chunk)
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    return digest.hexdigest()
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    FileSystemStorage em que o nome final é o hash do conteúdo.
+    O nome pedido (upload_to) só serve para obter a extensão.
+    Se o conteúdo trouxer o atributo `sha256` (já calculado no upload, ver
+    Attachment.save), o hash não é calculado outra vez.
+    Cada save() conta uma referência ao ficheiro (add_reference).
+    """
+
+    def get_available_name(self, name, max_length=None):
+        # O nome final é escolhido em _save(); conteúdo igual = mesmo nome, por isso não há colisões
+        return name
+
+    def _save(self, name, content):
+        ext = os.path.splitext(name)[1]
+        staging_dir = os.path.join(self.location, BLOB_PREFIX, 'tmp')
+        os.makedirs(staging_dir, exist_ok=True)
+
+        # Uma só passagem: copia para um temporário e calcula o hash ao mesmo tempo (se ainda não se sabe)
+        known_digest = getattr(content, 'sha256', None)
+        digest = None if known_digest else hashlib.sha256()
+        fd, tmp_path = tempfile.mkstemp(dir=staging_dir)
+        try:
+            with os.fdopen(fd, 'wb') as tmp:
+                if hasattr(content, 'seek'):
+                    content.seek(0)
+                for chunk in content.chunks():
+                    if digest is not None:
+                        digest.update(chunk)
+                    tmp.write(chunk)
+                size = tmp.tell()
+
+            final_name = blob_name(known_digest or digest.hexdigest(), ext)
+            final_path = self.path(final_name)
+            # A referência é contada antes de olhar para o disco: a partir daqui uma
+            # remoção em curso deste ficheiro já não o apaga (ver delete_unused_blobs)
+            add_reference(final_name, size=size)
+            os.makedirs(os.path.dirname(final_path), exist_ok=True)
+            try:
+                # link() é atómico e falha se já existir: nesse caso o conteúdo é o mesmo
+                os.link(tmp_path, final_path)
+                if self.file_permissions_mode is not None:
+                    os.chmod(final_path, self.file_permissions_mode)
+            except FileExistsError:
+                pass
+        finally:
+            os.unlink(tmp_path)
+        return final_name
+
+
+def attachment_storage():
+    """Storage do campo Attachment.file (callable, para não fixar caminhos nas migrações)."""
+    return ContentAddressedStorage()
+
+
+# ==========================================
+# CONTAGEM DE REFERÊNCIAS
+# ==========================================
+
+def add_reference(name, storage=None, size=None):
+    """
+    Mais um anexo passou a usar o ficheiro `name` (tamanho `size`, ou lido do `storage`).
+    O UPDATE bloqueia a linha; se ela acabou de ser apagada por delete_unused_blobs, é criada de novo.
+    """
+    from .models import StoredBlob
+
+    if not is_blob(name):
+        return
+    while True:
+        if StoredBlob.objects.filter(name=name).update(ref_count=F('ref_count') + 1):
+            return
+        try:
+            with transaction.atomic():
+                StoredBlob.objects.create(
+                    name=name, size=size if size is not None else storage.size(name), ref_count=1
+                )
+            return
+        except IntegrityError:
+            pass  # Criada em simultâneo por outro pedido: volta a tentar o UPDATE
+
+
+# Libertações por fazer do batched_releases() ativo: {storage: [nomes]}
+_pending_releases = ContextVar('pending_releases', default=None)
+
+
+@contextmanager
+def batched_releases():
+    """
+    Junta as release_reference() feitas dentro do bloco e aplica-as no fim,
+    numa só chamada a release_references() por storage. Se o bloco falhar
+    não liberta nada (a transação à volta é desfeita).
+    """
+    if _pending_releases.get() is not None:
+        yield  # Já dentro de outro bloco: é esse que liberta
+        return
+    pending = defaultdict(list)
+    token = _pending_releases.set(pending)
+    try:
+        yield
+    finally:
+        _pending_releases.reset(token)
+    for storage, names in pending.items():
+        release_references(names, storage)
+
+
+def release_reference(name, storage):
+    """Um anexo deixou de usar o ficheiro `name` (ver release_references)."""
+    pending = _pending_releases.get()
+    if pending is not None:
+        pending[storage].append(name)
+    else:
+        release_references([name], storage)
+
+
+def release_references(names, storage):
+    """
+    Cada ocorrência em `names` é um anexo que deixou de usar esse ficheiro.
+    Os que ficarem sem referências são apagados depois do commit
+    (delete_unused_blobs), se ninguém os voltou a usar. Uma query por cada
+    número distinto de ocorrências (normalmente só uma), mais a limpeza.
+    Ficheiros fora de BLOB_PREFIX (uploads antigos ainda não migrados) nunca são apagados.
+    """
+    from .models import StoredBlob
+
+    counts = Counter(name for name in names if is_blob(name))
+    if not counts:
+        return
+    by_count = defaultdict(list)
+    for name, count in counts.items():
+        by_count[count].append(name)
+    # As linhas ficam a 0 (em vez de serem apagadas) para servirem de lock à remoção dos ficheiros
+    for count, group in by_count.items():
+        StoredBlob.objects.filter(name__in=group, ref_count__gt=0).update(
+            ref_count=Greatest(F('ref_count') - count, 0)
+        )
+    released = list(counts)
+    transaction.on_commit(lambda: delete_unused_blobs(released, storage))
+
+
+def delete_unused_blobs(names, storage):
+    """
+    Apaga os ficheiros (e pré-visualizações) de `names` que já não têm referências.
+    Corre com as linhas bloqueadas: um upload que reutilize o ficheiro ao mesmo
+    tempo ou já o contou (e nada é apagado) ou espera e volta a criá-lo em disco.
+    """
+    from .models import StoredBlob
+    from .previews import delete_preview
+
+    with transaction.atomic():
+        unused = list(
+            StoredBlob.objects.select_for_update().filter(name__in=names, ref_count=0).values_list('name', flat=True)
+        )
+        if not unused:
+            return
+        StoredBlob.objects.filter(name__in=unused, ref_count=0).delete()
+        for name in unused:
+            storage.delete(name)
+            delete_preview(name, storage)
+
+
+def orphan_blob_names(storage):
+    """Nomes dos ficheiros em BLOB_PREFIX (sem pré-visualizações nem temporários) que não têm StoredBlob."""
+    from .models import StoredBlob
+    from .previews import PREVIEW_SUFFIXES
+
+    root = storage.path(BLOB_PREFIX)
+    batch = []
+    for directory, subdirs, files in os.walk(root):
+        if directory == root:
+            subdirs[:] = [name for name in subdirs if name != 'tmp']
+        for filename in files:
+            if filename.endswith(tuple(PREVIEW_SUFFIXES.values())):
+                continue
+            batch.append(os.path.relpath(os.path.join(directory, filename), storage.location).replace(os.sep, '/'))
+    for start in range(0, len(batch), 1000):
+        names = batch[start:start + 1000]
+        known = set(StoredBlob.objects.filter(name__in=names).values_list('name', flat=True))
+        yield from (name for name in names if name not in known)
+
+
+def delete_orphan_blobs(storage, tmp_max_age=3600):
+    """
+    Apaga os ficheiros órfãos (ver orphan_blob_names) e os temporários de
+    uploads interrompidos com mais de `tmp_max_age` segundos. Devolve quantos
+    ficheiros órfãos foram apagados.
+
+    Cada órfão ganha primeiro uma linha a 0 e é apagado por delete_unused_blobs,
+    com as mesmas garantias: um upload que o esteja a reutilizar ao mesmo tempo
+    já contou a sua referência (e o ficheiro fica) ou volta a criá-lo.
+    """
+    from .models import StoredBlob
+
+    names = list(orphan_blob_names(storage))
+    for start in range(0, len(names), 1000):
+        batch = names[start:start + 1000]
+        StoredBlob.objects.bulk_create(
+            [StoredBlob(name=name, size=storage.size(name), ref_count=0) for name in batch],
+            ignore_conflicts=True,
+        )
+        delete_unused_blobs(batch, storage)
+    deleted = sum(1 for name in names if not storage.exists(name))
+
+    staging_dir = storage.path(f'{BLOB_PREFIX}/tmp')
+    if os.path.isdir(staging_dir):
+        cutoff = time.time() - tmp_max_age
+        for entry in os.scandir(staging_dir):
+            try:
+                if entry.is_file() and entry.stat().st_mtime < cutoff:
+                    os.unlink(entry.path)
+            except FileNotFoundError:
+                pass  # Terminado entretanto pelo próprio upload
+    return deleted
@@ -1,7 +1,57 @@
-from django.test import TestCase
-from django.urls import reverse
+import asyncio
+import csv
+import datetime
+import hashlib
+import importlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from pathlib import Path
+from unittest import mock, skipUnless
+
+from django.apps import apps as django_apps
+from django.contrib import admin
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.handlers.asgi import ASGIHandler
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import CommandError, call_command
+from django.core.files.uploadhandler import StopUpload
+from django.db import IntegrityError, OperationalError, connection, transaction
+from django.test import Client, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
 from django.contrib.auth.models import User
-from .models import ServiceType
+from django.db.migrations.executor import MigrationExecutor
+from django.db.models import F
+from django.http import HttpResponse
+from django.utils import timezone
+from asgiref.sync import iscoroutinefunction
+from core.database import database_settings
+from PIL import Image
+from pypdf import PdfWriter
+from .models import (
+    ServiceType, RequiredDoc, Profile, Process, Attachment, Appointment, StoredBlob, AppointmentSlot,
+    ProcessStatusCount, ProcessStatusChange,
+)
+from . import analytics, counters, metrics, scheduling, tickets
+from .catalog import get_catalog, get_requirement
+from .forms import ProcessForm
+from .pdf_cache import DiskLRUCache
+from .previews import enqueue_preview, preview_exists
+from .profiling import QueryBudgetExceeded, RequestProfile, RequestProfilingMiddleware
+from .importers import BaseImporter, ProcessImporter
+from .management.commands.bench_routes import compare_results
+from .search import (
+    DatabaseLikeBackend, SearchBackend, SQLiteFTS5Backend, get_search_backend, search_processes,
+)
+from .storage import attachment_storage, blob_name
+from .transitions import transition_processes
+from .uploads import ValidatingUploadHandler
 
 class ImigraAgilTests(TestCase):
     
@@ -19,4 +69,1439 @@ class ImigraAgilTests(TestCase):
     def test_login_page_loads(self):
         """Verifica se a página de login existe"""
         response = self.client.get(reverse('login'))
-        self.assertEqual(response.status_code, 200)
\ No newline at end of file
+        self.assertEqual(response.status_code, 200)
+
+class ApiProcessesTests(TestCase):
+    """Paginação por cursor da API pública de processos."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='apiuser', password='password123')
+        self.service = ServiceType.objects.create(name='Visto D7', description='Teste')
+        # Todos com a mesma data para testar o desempate pelo id
+        now = timezone.now()
+        processes = [Process(user=self.user, service_type=self.service, status='approved') for _ in range(25)]
+        Process.objects.bulk_create(processes)
+        Process.objects.update(submission_date=now)
+
+    def test_pages_cover_all_processes_without_duplicates(self):
+        seen = []
+        cursor = None
+        while True:
+            params = {'page_size': 10}
+            if cursor:
+                params['cursor'] = cursor
+            with self.assertNumQueries(1):
+                data = self.client.get(reverse('api_get_processes'), params).json()
+            seen.extend(item['id'] for item in data['results'])
+            cursor = data['next_cursor']
+            if cursor is None:
+                break
+        expected = list(Process.objects.order_by('-submission_date', '-id').values_list('id', flat=True))
+        self.assertEqual(seen, expected)
+
+    def test_streamed_page_matches_format(self):
+        response = self.client.get(reverse('api_get_processes'), {'page_size': 300})
+        self.assertTrue(response.streaming)
+        data = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(data['count'], 25)
+        self.assertIsNone(data['next_cursor'])
+        self.assertEqual(data['results'][0]['service'], 'Visto D7')
+
+    def test_invalid_cursor_returns_400(self):
+        response = self.client.get(reverse('api_get_processes'), {'cursor': 'lixo!!'})
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(ROOT_URLCONF='core.urls_asgi')
+class AsyncViewsTests(TestCase):
+    """Versões async das páginas de leitura (core/urls_asgi.py)."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='asyncuser', password='password123', first_name='Ana')
+        self.staff = User.objects.create_user(username='asyncstaff', password='password123', is_staff=True)
+        service = ServiceType.objects.create(name='Visto D7', description='Teste')
+        RequiredDoc.objects.create(service_type=service, doc_name='Passaporte')
+        self.process = Process.objects.create(user=self.user, service_type=service)
+        for _ in range(3):
+            Process.objects.create(user=self.user, service_type=service, status='approved')
+
+    def test_routes_resolve_to_async_views(self):
+        for name, args in [('api_get_processes', []), ('dashboard', []), ('process_detail', [1]), ('manager_dashboard', [])]:
+            self.assertTrue(iscoroutinefunction(resolve(reverse(name, args=args)).func), name)
+
+    async def test_api_pages_and_streams(self):
+        data = (await self.async_client.get(reverse('api_get_processes'), {'page_size': 3})).json()
+        self.assertEqual(data['count'], 3)
+        self.assertIsNotNone(data['next_cursor'])
+
+        response = await self.async_client.get(reverse('api_get_processes'), {'page_size': 300})
+        body = b''.join([chunk async for chunk in response.streaming_content])
+        self.assertEqual(json.loads(body)['count'], 4)
+
+    async def test_dashboard_and_detail(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(reverse('dashboard'))
+        self.assertContains(response, 'Ana')
+        self.assertFalse(response.context['pode_criar_novo'])
+
+        response = await self.async_client.get(reverse('process_detail', args=[self.process.id]))
+        self.assertEqual(response.context['docs_summary']['mandatory_total'], 1)
+
+    async def test_detail_is_private_and_manager_needs_staff(self):
+        intruder = await User.objects.acreate(username='intruso')
+        await self.async_client.aforce_login(intruder)
+        response = await self.async_client.get(reverse('process_detail', args=[self.process.id]))
+        self.assertEqual(response.status_code, 403)
+        response = await self.async_client.get(reverse('manager_dashboard'))
+        self.assertEqual(response.status_code, 302)
+
+        await self.async_client.aforce_login(self.staff)
+        response = await self.async_client.get(reverse('manager_dashboard'))
+        self.assertEqual(response.context['total_processos'], 4)
+
+    @override_settings(DEBUG=True)
+    def test_middleware_chain_is_not_adapted(self):
+        # Com DEBUG o Django regista cada middleware que tem de adaptar (sync <-> async)
+        with self.assertNoLogs('django.request', 'DEBUG'):
+            ASGIHandler()
+
+    async def test_profiling_runs_natively_in_async_chain(self):
+        async def view(request):
+            return HttpResponse()
+        self.assertTrue(iscoroutinefunction(RequestProfilingMiddleware(view)))
+
+        await self.async_client.aforce_login(self.user)
+        with self.assertLogs('website.profiling', 'INFO') as logs:
+            response = await self.async_client.get(reverse('dashboard'))
+        self.assertRegex(logs.output[0], rf'GET dashboard 200: [1-9]\d* queries .* {len(response.content)} bytes')
+
+        with self.assertLogs('website.profiling', 'INFO') as logs:
+            response = await self.async_client.get(reverse('api_get_processes'), {'page_size': 300})
+            body = b''.join([chunk async for chunk in response.streaming_content])
+        self.assertRegex(logs.output[0], rf'GET api_get_processes 200: [1-9]\d* queries .* {len(body)} bytes')
+
+
+class ProcessDetailTests(TestCase):
+    """Checklist de documentos com número fixo de queries."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='detailuser', password='password123')
+        self.client.login(username='detailuser', password='password123')
+
+    def _make_process(self, n_docs):
+        service = ServiceType.objects.create(name=f'Visto {n_docs}', description='Teste')
+        docs = [RequiredDoc.objects.create(service_type=service, doc_name=f'Doc {i}') for i in range(n_docs)]
+        # Um só processo em aberto por utilizador: fecha o anterior
+        Process.objects.filter(user=self.user).update(status='approved')
+        process = Process.objects.create(user=self.user, service_type=service)
+        for doc in docs[::2]:
+            Attachment.objects.create(process=process, required_doc=doc, file='documents/teste.pdf')
+        return process
+
+    def _count_queries(self, process):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('process_detail', args=[process.id]))
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_query_count_does_not_grow_with_documents(self):
+        small = self._count_queries(self._make_process(2))
+        large = self._count_queries(self._make_process(15))
+        self.assertEqual(small, large)
+
+    def test_summary_blocks_incomplete_submission(self):
+        process = self._make_process(3)
+        _, summary = process.document_checklist()
+        self.assertEqual(summary, {'mandatory_total': 3, 'mandatory_uploaded': 2, 'complete': False})
+
+        self.client.get(reverse('submit_process_final', args=[process.id]))
+        process.refresh_from_db()
+        self.assertEqual(process.status, 'draft')
+
+
+class RequestProfilingTests(TestCase):
+    """Middleware de instrumentação (website/profiling.py), ligado nos testes."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='profiler', password='password123')
+        self.client.login(username='profiler', password='password123')
+
+    @override_settings(QUERY_BUDGETS={'dashboard': 1})
+    def test_budget_exceeded_fails_in_tests(self):
+        with self.assertRaises(QueryBudgetExceeded):
+            self.client.get(reverse('dashboard'))
+
+    @override_settings(QUERY_BUDGETS={'dashboard': 1}, QUERY_BUDGET_STRICT=False)
+    def test_budget_exceeded_only_warns_when_not_strict(self):
+        with self.assertLogs('website.profiling', 'WARNING') as logs:
+            response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("Orçamento de queries excedido em 'dashboard'", logs.output[0])
+
+    def test_summary_includes_queries_templates_and_size(self):
+        with self.assertLogs('website.profiling', 'INFO') as logs:
+            response = self.client.get(reverse('dashboard'))
+        self.assertIn(f"{len(response.content)} bytes", logs.output[0])
+        self.assertRegex(logs.output[0], r'GET dashboard 200: \d+ queries .* templates (?!0\.0 )\d')
+
+    def test_repeated_sql_is_reported_as_duplicate(self):
+        profile = RequestProfile()
+        for _ in range(3):
+            profile(lambda *args: None, 'SELECT 1 FROM website_process WHERE id = %s', [1], False, {})
+        profile(lambda *args: None, 'SELECT 1', [], False, {})
+        self.assertEqual(profile.duplicates(3), [('SELECT 1 FROM website_process WHERE id = %s', 3)])
+
+
+class MetricsTests(TestCase):
+    """Métricas em formato Prometheus (website/metrics.py) e o endpoint /metrics."""
+
+    def setUp(self):
+        metrics.REGISTRY.reset()
+        self.addCleanup(metrics.REGISTRY.reset)
+        self.user = User.objects.create_user(username='metricsuser', password='password123')
+        self.staff = User.objects.create_user(username='metricsstaff', password='password123', is_staff=True)
+
+    def test_histogram_exposition_is_cumulative(self):
+        registry = metrics.Registry()
+        histogram = registry.histogram('test_seconds', "Teste.", ['view'], buckets=(0.1, 1))
+        histogram.observe(0.05, view='home')
+        histogram.observe(0.5, view='home')
+        text = registry.exposition()
+        self.assertIn('# TYPE test_seconds histogram', text)
+        self.assertIn('test_seconds_bucket{view="home",le="0.1"} 1', text)
+        self.assertIn('test_seconds_bucket{view="home",le="1"} 2', text)
+        self.assertIn('test_seconds_bucket{view="home",le="+Inf"} 2', text)
+        self.assertIn('test_seconds_count{view="home"} 2', text)
+        self.assertIn('test_seconds_sum{view="home"} 0.55', text)
+
+    def test_endpoint_requires_staff_or_token(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        self.client.login(username='metricsuser', password='password123')
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+
+        with override_settings(METRICS_TOKEN='segredo'):
+            response = Client().get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer segredo')
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+            self.assertEqual(Client().get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer errado').status_code, 403)
+
+    def test_requests_are_measured_per_route(self):
+        self.client.login(username='metricsstaff', password='password123')
+        self.client.get(reverse('dashboard'))
+        self.client.get('/nao-existe/')
+        text = self.client.get(reverse('metrics')).content.decode()
+        self.assertIn('imigraima_http_requests_total{view="dashboard",method="GET",status="200"} 1', text)
+        self.assertIn('imigraima_http_requests_total{view="unmatched",method="GET",status="404"} 1', text)
+        self.assertIn('imigraima_http_request_duration_seconds_count{view="dashboard",method="GET"} 1', text)
+        self.assertIn('imigraima_db_queries_per_request_count{view="dashboard"} 1', text)
+
+    @override_settings(ROOT_URLCONF='core.urls_asgi')
+    async def test_async_requests_are_measured(self):
+        await self.async_client.aforce_login(self.user)
+        await self.async_client.get(reverse('dashboard'))
+        text = metrics.REGISTRY.exposition()
+        self.assertIn('imigraima_http_requests_total{view="dashboard",method="GET",status="200"} 1', text)
+        self.assertRegex(text, r'imigraima_db_queries_per_request_sum\{view="dashboard"\} [1-9]')
+
+    def test_upload_bytes_and_rejections(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir, ignore_errors=True)
+        service = ServiceType.objects.create(name='Visto D7', description='Teste')
+        doc = RequiredDoc.objects.create(service_type=service, doc_name='Passaporte')
+        process = Process.objects.create(user=self.user, service_type=service)
+        self.client.login(username='metricsuser', password='password123')
+        url = reverse('upload_document', args=[process.id])
+        content = b'%PDF-1.4\n' + b'0' * 1000
+        with override_settings(MEDIA_ROOT=tmpdir):
+            self.client.post(url, {'doc_type_id': doc.id, 'file': SimpleUploadedFile('a.pdf', content)})
+            self.client.post(url, {'doc_type_id': doc.id, 'file': SimpleUploadedFile('b.pdf', b'\x89PNG\r\n\x1a\n')})
+        text = metrics.REGISTRY.exposition()
+        self.assertIn(f'imigraima_upload_bytes_total {len(content)}', text)
+        self.assertIn('imigraima_upload_rejections_total{reason="content"} 1', text)
+
+    def test_unknown_methods_share_one_series(self):
+        self.client.generic('PROPFIND', '/nao-existe/')
+        text = metrics.REGISTRY.exposition()
+        self.assertIn('imigraima_http_requests_total{view="unmatched",method="other",status="404"} 1', text)
+        self.assertNotIn('PROPFIND', text)
+
+    @override_settings(METRICS_DIR='/nao-usado', METRICS_FLUSH_INTERVAL=0)
+    async def test_flush_runs_off_the_event_loop(self):
+        flushed = threading.Event()
+        threads = []
+
+        def flush():
+            threads.append(threading.get_ident())
+            flushed.set()
+
+        with mock.patch.object(metrics.REGISTRY, 'flush', side_effect=flush):
+            metrics.APPOINTMENT_ALLOCATIONS.inc(outcome='allocated')
+            self.assertTrue(await asyncio.to_thread(flushed.wait, 5))
+        self.assertNotEqual(threads, [threading.get_ident()])
+
+    def test_values_from_other_processes_are_summed(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir, ignore_errors=True)
+        with override_settings(METRICS_DIR=tmpdir):
+            metrics.APPOINTMENT_ALLOCATIONS.inc(outcome='allocated')
+            metrics.REGISTRY.flush()
+            # O ficheiro passa a ser de outro processo (pid diferente) e este recomeça do zero
+            os.replace(os.path.join(tmpdir, f'{os.getpid()}.json'), os.path.join(tmpdir, '1.json'))
+            metrics.REGISTRY.reset()
+            metrics.APPOINTMENT_ALLOCATIONS.inc(2, outcome='allocated')
+            text = metrics.REGISTRY.exposition()
+        self.assertIn('imigraima_appointment_allocations_total{outcome="allocated"} 3', text)
+
+
+class CatalogCacheTests(TestCase):
+    """Catálogo de serviços em memória, invalidado por versão."""
+
+    def setUp(self):
+        self.service = ServiceType.objects.create(name='Visto D7', description='Teste')
+        self.doc = RequiredDoc.objects.create(service_type=self.service, doc_name='Passaporte')
+        self.user = User.objects.create_user(username='cataloguser', password='password123')
+        self.client.login(username='cataloguser', password='password123')
+
+    def test_steady_state_reads_without_queries(self):
+        get_catalog()
+        with self.assertNumQueries(0):
+            form = ProcessForm()
+            self.assertIn((self.service.id, 'Visto D7'), form.fields['service_type'].choices)
+            self.assertEqual(str(RequiredDoc(service_type_id=self.service.id, doc_name='NIF')), 'NIF (Visto D7)')
+            form = ProcessForm({'service_type': str(self.service.id)})
+            self.assertTrue(form.is_valid(), form.errors)
+            self.assertEqual(form.cleaned_data['service_type'].name, 'Visto D7')
+
+    def test_save_bumps_version(self):
+        old = get_catalog()
+        self.service.name = 'Visto D8'
+        self.service.save()
+        RequiredDoc.objects.create(service_type=self.service, doc_name='Registo Criminal')
+        catalog = get_catalog()
+        self.assertNotEqual(catalog.version, old.version)
+        self.assertEqual(catalog.service(self.service.id).name, 'Visto D8')
+        self.assertEqual([r.doc_name for r in catalog.service(self.service.id).requirements],
+                         ['Passaporte', 'Registo Criminal'])
+
+        self.doc.delete()
+        self.assertEqual(len(get_catalog().service(self.service.id).requirements), 1)
+
+    def test_unknown_ids_do_not_force_reloads(self):
+        get_catalog()
+        with self.assertNumQueries(0):
+            for pk in range(9000, 9020):
+                self.assertIsNone(get_requirement(pk))
+
+        # Cópia antiga: um id novo (ex: criado noutro processo) recarrega uma vez
+        with mock.patch('website.catalog.time.monotonic', return_value=time.monotonic() + 10):
+            with self.assertNumQueries(2):
+                self.assertIsNone(get_requirement(9000))
+                self.assertIsNone(get_requirement(9001))
+
+    def test_records_are_immutable(self):
+        record = get_catalog().service(self.service.id)
+        with self.assertRaises(AttributeError):
+            record.name = 'Outro'
+
+    def test_create_process_uses_catalog(self):
+        response = self.client.post(reverse('create_process'), {'service_type': self.service.id})
+        process = Process.objects.get(user=self.user)
+        self.assertRedirects(response, reverse('process_detail', args=[process.id]))
+        self.assertEqual(process.service_type_id, self.service.id)
+
+    def test_upload_rejects_requirement_of_another_service(self):
+        other = ServiceType.objects.create(name='CPLP', description='Teste')
+        foreign_doc = RequiredDoc.objects.create(service_type=other, doc_name='Certificado')
+        process = Process.objects.create(user=self.user, service_type=self.service)
+        response = self.client.post(reverse('upload_document', args=[process.id]), {
+            'doc_type_id': foreign_doc.id,
+            'file': SimpleUploadedFile('c.pdf', b'%PDF-1.4\n' + b'0' * 100),
+        })
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(Attachment.objects.exists())
+
+
+class DashboardTests(TestCase):
+    """Dashboard com número fixo de queries e paginação sem COUNT."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='dashuser', password='password123')
+        self.service = ServiceType.objects.create(name='Visto CPLP', description='Teste')
+        self.client.login(username='dashuser', password='password123')
+
+    def _add_processes(self, n, status='approved'):
+        for _ in range(n):
+            process = Process.objects.create(user=self.user, service_type=self.service, status=status)
+            Appointment.objects.create(
+                process=process, appointment_date=timezone.now(), ticket_number=f'AIMA-{process.id}'
+            )
+
+    def _count_queries(self, **params):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('dashboard'), params)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries), response
+
+    def test_query_count_does_not_grow_with_rows(self):
+        self._add_processes(1)
+        few, _ = self._count_queries()
+        self._add_processes(4)
+        many, _ = self._count_queries()
+        self.assertEqual(few, many)
+
+    def test_can_create_flag_and_next_page(self):
+        self._add_processes(6)
+        _, response = self._count_queries()
+        self.assertTrue(response.context['pode_criar_novo'])
+        self.assertTrue(response.context['processos'].has_next())
+
+        Process.objects.create(user=self.user, service_type=self.service, status='draft')
+        _, response = self._count_queries(page=2)
+        self.assertFalse(response.context['pode_criar_novo'])
+        self.assertFalse(response.context['processos'].has_next())
+
+    def test_can_create_flag_without_rows(self):
+        Process.objects.create(user=self.user, service_type=self.service, status='draft')
+        _, response = self._count_queries(q='inexistente')
+        self.assertFalse(response.context['pode_criar_novo'])
+
+
+
+
+class OpenProcessRuleTests(TestCase):
+    """Regra "um processo em aberto por utilizador", garantida pela BD."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='ruleuser', password='password123')
+        self.service = ServiceType.objects.create(name='Visto D7', description='Teste')
+        self.client.login(username='ruleuser', password='password123')
+
+    def test_database_rejects_second_open_process(self):
+        Process.objects.create(user=self.user, service_type=self.service, status='submitted')
+        Process.objects.create(user=self.user, service_type=self.service, status='approved')
+        with self.assertRaises(IntegrityError):
+            with transaction.atomic():
+                Process.objects.create(user=self.user, service_type=self.service, status='draft')
+
+    def test_duplicate_post_is_handled_gracefully(self):
+        Process.objects.create(user=self.user, service_type=self.service, status='draft')
+        response = self.client.post(reverse('create_process'), {'service_type': self.service.id})
+        self.assertRedirects(response, reverse('dashboard'))
+        self.assertEqual(Process.objects.filter(user=self.user).count(), 1)
+
+    def test_post_does_not_query_for_open_processes(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(reverse('create_process'), {'service_type': self.service.id})
+        process = Process.objects.get(user=self.user)
+        self.assertRedirects(response, reverse('process_detail', args=[process.id]))
+        open_check = 'NOT ("website_process"."status" IN'
+        self.assertFalse(any(open_check in q['sql'] for q in ctx.captured_queries))
+
+    def _legacy_duplicates(self):
+        """Simula dados anteriores à migração 0015 (a restrição é desfeita no rollback do teste)."""
+        with connection.cursor() as cursor:
+            cursor.execute('DROP INDEX one_open_process_per_user')
+        older = Process.objects.create(user=self.user, service_type=self.service, status='submitted')
+        draft = Process.objects.create(user=self.user, service_type=self.service, status='draft')
+        newest = Process.objects.create(user=self.user, service_type=self.service, status='review')
+        return older, draft, newest
+
+    @skipUnless(connection.vendor == 'sqlite', 'apaga o índice da restrição com SQL do SQLite')
+    def test_migration_refuses_to_close_processes(self):
+        migration = importlib.import_module('website.migrations.0015_one_open_process_per_user')
+        older, draft, newest = self._legacy_duplicates()
+        with self.assertRaisesMessage(RuntimeError, f'utilizador #{self.user.id}:'):
+            migration.check_no_duplicate_open_processes(django_apps, None)
+        self.assertEqual(Process.objects.get(pk=older.pk).status, 'submitted')
+
+    @skipUnless(connection.vendor == 'sqlite', 'apaga o índice da restrição com SQL do SQLite')
+    def test_cleanup_command_only_changes_data_with_apply(self):
+        older, draft, newest = self._legacy_duplicates()
+        call_command('close_duplicate_open_processes', stdout=io.StringIO())
+        self.assertEqual(Process.objects.exclude(status__in=['approved', 'rejected']).count(), 3)
+
+        call_command('close_duplicate_open_processes', '--apply', stdout=io.StringIO())
+        self.assertEqual(Process.objects.get(pk=older.pk).status, 'rejected')
+        self.assertTrue(ProcessStatusChange.objects.filter(process=older, to_status='rejected').exists())
+        self.assertTrue(Process.objects.filter(pk=draft.pk).exists())  # Rascunho só com --delete-drafts
+
+        call_command('close_duplicate_open_processes', '--apply', '--delete-drafts', stdout=io.StringIO())
+        self.assertFalse(Process.objects.filter(pk=draft.pk).exists())
+        self.assertEqual(Process.objects.get(pk=newest.pk).status, 'review')
+
+
+class CleanupBeforeMigrationTests(TransactionTestCase):
+    """close_duplicate_open_processes numa BD parada na 0014 (onde a migração 0015 o manda correr)."""
+
+    def setUp(self):
+        executor = MigrationExecutor(connection)
+        target = [('website', '0014_process_status_history')]
+        latest = executor.loader.graph.leaf_nodes('website')
+        executor.migrate(target)
+        self.addCleanup(lambda: MigrationExecutor(connection).migrate(latest))
+        self.apps = executor.loader.project_state(target).apps
+
+    def test_command_only_uses_columns_from_0014(self):
+        models = {name: self.apps.get_model('website', name) for name in ('ServiceType', 'RequiredDoc', 'Process', 'Attachment')}
+        user = self.apps.get_model('auth', 'User').objects.create(username='legado')
+        service = models['ServiceType'].objects.create(name='Visto D7', description='Teste')
+        doc = models['RequiredDoc'].objects.create(service_type=service, doc_name='Passaporte')
+        older, draft, newest = [
+            models['Process'].objects.create(user=user, service_type=service, status=status)
+            for status in ('submitted', 'draft', 'review')
+        ]
+        models['Attachment'].objects.create(process=draft, required_doc=doc, file='documents/2025/01/scan.pdf')
+        counters.rebuild_counts()
+
+        call_command('close_duplicate_open_processes', '--apply', '--delete-drafts', stdout=io.StringIO())
+
+        statuses = dict(models['Process'].objects.values_list('id', 'status'))
+        self.assertEqual(statuses, {older.id: 'rejected', newest.id: 'review'})
+        self.assertFalse(models['Attachment'].objects.exists())
+        self.assertTrue(
+            self.apps.get_model('website', 'ProcessStatusChange').objects.filter(process=older, to_status='rejected').exists()
+        )
+        self.assertEqual(counters.rebuild_counts(), {})  # Contadores já certos
+
+
+@skipUnless(connection.vendor == 'sqlite', 'usa a BD SQLite partilhada entre threads dos testes')
+class ConcurrentCreateProcessTests(TransactionTestCase):
+    """Dois POSTs simultâneos a create_process: só um processo pode ficar em aberto."""
+
+    def test_concurrent_submits_create_one_process(self):
+        user = User.objects.create_user(username='racer', password='password123')
+        service = ServiceType.objects.create(name='Visto D7', description='Teste')
+        clients = []
+        for _ in range(2):
+            client = Client()
+            client.login(username='racer', password='password123')
+            clients.append(client)
+        barrier = threading.Barrier(2)
+        statuses = []
+
+        def submit(client):
+            barrier.wait()
+            try:
+                # A BD de testes (SQLite em memória partilhada) não espera pelos locks
+                # como um ficheiro com busy_timeout: repete o pedido nesse caso
+                for _ in range(50):
+                    try:
+                        response = client.post(reverse('create_process'), {'service_type': service.id})
+                    except OperationalError:
+                        time.sleep(0.01)
+                        continue
+                    statuses.append(response.status_code)
+                    break
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=submit, args=(client,)) for client in clients]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(statuses, [302, 302])
+        self.assertEqual(Process.objects.filter(user=user).count(), 1)
+
+class StatusCounterTests(TestCase):
+    """Contadores por estado usados no painel dos gestores."""
+
+    def setUp(self):
+        self.service = ServiceType.objects.create(name='Visto D7', description='Teste')
+
+    def _counts(self):
+        return dict(
+            ProcessStatusCount.objects.filter(total__gt=0).values_list('status', 'total')
+        )
+
+    def _process(self, status='draft'):
+        # Um utilizador por processo (só pode haver um processo em aberto por utilizador)
+        user = User.objects.create_user(username=f'counter{User.objects.count()}')
+        return Process.objects.create(user=user, service_type=self.service, status=status)
+
+    def test_counters_follow_create_save_and_delete(self):
+        p1 = self._process()
+        p2 = self._process()
+        self.assertEqual(self._counts(), {'draft': 2})
+
+        p1.status = 'submitted'
+        p1.save()
+        p2.delete()
+        self.assertEqual(self._counts(), {'submitted': 1})
+
+    def test_admin_actions_keep_counters(self):
+        for _ in range(3):
+            self._process('review')
+        User.objects.create_superuser(username='gestor', password='password123')
+        self.client.login(username='gestor', password='password123')
+        ids = list(Process.objects.values_list('id', flat=True)[:2])
+        self.client.post(reverse('admin:website_process_changelist'), {
+            'action': 'mark_as_approved', '_selected_action': ids,
+        })
+        self.assertEqual(self._counts(), {'review': 1, 'approved': 2})
+
+    def test_manager_dashboard_reads_counters(self):
+        for status in ['draft', 'draft', 'approved']:
+            self._process(status)
+        User.objects.create_user(username='gestor', password='password123', is_staff=True)
+        self.client.login(username='gestor', password='password123')
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('manager_dashboard'))
+        self.assertEqual(response.context['total_processos'], 3)
+        self.assertFalse(any('"website_process"' in q['sql'] for q in ctx.captured_queries))
+
+    def test_reconcile_command_fixes_drift(self):
+        self._process()
+        ProcessStatusCount.objects.update(total=42)
+        out = io.StringIO()
+        call_command('reconcile_status_counts', stdout=out)
+        self.assertEqual(self._counts(), {'draft': 1})
+        self.assertIn('42 -> 1', out.getvalue())
+
+
+
+class TransitionTests(TestCase):
+    """Aprovação/rejeição em massa por blocos."""
+
+    def setUp(self):
+        self.staff = User.objects.create_user(username='gestor', password='password123', is_staff=True)
+        self.service = ServiceType.objects.create(name='Visto D7', description='Teste')
+        self.processes = [
+            Process.objects.create(
+                user=User.objects.create_user(username=f'bulk{i}'), service_type=self.service, status=status
+            )
+            for i, status in enumerate(['submitted', 'submitted', 'review', 'review', 'draft'])
+        ]
+        self.old_updated_at = Process.objects.order_by('updated_at').values_list('updated_at', flat=True).first()
+
+    def test_approval_in_chunks_books_appointments_and_history(self):
+        report = transition_processes(Process.objects.all(), 'approved', user=self.staff, chunk_size=2)
+        self.assertEqual((report.changed, report.skipped, report.chunks), (4, 1, 2))
+        self.assertEqual(report.appointments, 4)
+        self.assertIsNone(report.error)
+
+        approved = Process.objects.filter(status='approved')
+        self.assertEqual(approved.count(), 4)
+        self.assertFalse(approved.filter(updated_at__lte=self.old_updated_at).exists())
+        self.assertEqual(Appointment.objects.filter(process__in=approved, slot__isnull=False).count(), 4)
+        self.assertEqual(
+            ProcessStatusChange.objects.filter(to_status='approved', changed_by=self.staff).count(), 4
+        )
+        self.assertEqual(ProcessStatusCount.objects.get(status='approved').total, 4)
+        self.assertEqual(Process.objects.get(pk=self.processes[-1].pk).status, 'draft')
+
+    @override_settings(TICKET_PRERENDER_BATCH_SIZE=1)
+    def test_bulk_approval_prerenders_tickets_after_each_chunk(self):
+        with mock.patch('website.tickets.enqueue_ticket_render') as enqueue:
+            with self.captureOnCommitCallbacks(execute=True) as callbacks:
+                transition_processes(Process.objects.all(), 'approved', chunk_size=2)
+        self.assertEqual(len(callbacks), 2)  # Um por bloco, só depois do commit
+        rendered = {call.args[0].id for call in enqueue.call_args_list}
+        self.assertEqual(rendered, set(Appointment.objects.values_list('id', flat=True)))
+
+    def test_failed_chunk_keeps_previous_chunks(self):
+        with mock.patch(
+            'website.transitions.book_appointments',
+            side_effect=[[], scheduling.NoSlotsAvailable('Sem vagas.')],
+        ):
+            report = transition_processes(Process.objects.all(), 'approved', chunk_size=2)
+        self.assertEqual(report.changed, 2)
+        self.assertEqual(report.error, 'Sem vagas.')
+        self.assertEqual(Process.objects.filter(status='approved').count(), 2)
+        self.assertEqual(ProcessStatusCount.objects.get(status='approved').total, 2)
+
+    def test_single_save_records_history(self):
+        process = self.processes[0]
+        process.status = 'review'
+        process.save()
+        change = ProcessStatusChange.objects.get(process=process)
+        self.assertEqual((change.from_status, change.to_status), ('submitted', 'review'))
+
+
+class ImportDataTests(TestCase):
+    """Comando import_data (CSV/JSONL, blocos e checkpoint)."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir, ignore_errors=True)
+
+    def _write(self, name, content):
+        path = os.path.join(self.tmpdir, name)
+        with open(path, 'w', encoding='utf-8') as fh:
+            fh.write(content)
+        return path
+
+    def test_service_catalog_from_csv(self):
+        path = self._write('catalogo.csv', (
+            "service,description,estimated_wait_time,doc_name,is_mandatory\n"
+            "Visto D7,Rendimentos passivos,60,Passaporte,sim\n"
+            "Visto D7,,,Extrato Bancário,nao\n"
+            "Visto D7,,,Passaporte,sim\n"
+            "CPLP,Autorização CPLP,abc,Registo Criminal,sim\n"
+        ))
+        err = io.StringIO()
+        call_command('import_data', 'services', path, stdout=io.StringIO(), stderr=err)
+        service = ServiceType.objects.get(name='Visto D7')
+        self.assertEqual(service.estimated_wait_time, 60)
+        self.assertEqual(
+            dict(service.requirements.values_list('doc_name', 'is_mandatory')),
+            {'Passaporte': True, 'Extrato Bancário': False},
+        )
+        self.assertFalse(ServiceType.objects.filter(name='CPLP').exists())
+        self.assertIn('linha 5', err.getvalue())
+
+    def _process_lines(self, count):
+        return ''.join(
+            json.dumps({
+                'username': f'hist{i % 3}', 'service': 'Visto D7', 'status': 'approved',
+                'submission_date': '2024-03-01T10:00:00', 'updated_at': '2024-04-01T10:00:00',
+            }) + '\n'
+            for i in range(count)
+        )
+
+    def test_processes_keep_dates_counters_and_index(self):
+        ServiceType.objects.create(name='Visto D7', description='Teste')
+        path = self._write('hist.jsonl', self._process_lines(5) + '{"username": "x"\n')
+        call_command(
+            'import_data', 'processes', path, '--create-users', '--batch-size', '2',
+            stdout=io.StringIO(), stderr=io.StringIO(),
+        )
+        self.assertEqual(Process.objects.count(), 5)
+        self.assertEqual(User.objects.filter(username__startswith='hist', is_active=False).count(), 3)
+        self.assertFalse(Process.objects.exclude(submission_date__year=2024).exists())
+        self.assertEqual(ProcessStatusCount.objects.get(status='approved').total, 5)
+        self.assertEqual(search_processes(Process.objects.all(), 'hist1').count(), 2)
+
+    def test_resume_after_failure_does_not_duplicate(self):
+        ServiceType.objects.create(name='Visto D7', description='Teste')
+        path = self._write('hist.jsonl', self._process_lines(7))
+        original = ProcessImporter.write_chunk
+        calls = []
+
+        def failing_write(importer, items):
+            calls.append(len(items))
+            if len(calls) == 2:
+                raise RuntimeError('disco cheio')
+            return original(importer, items)
+
+        with mock.patch.object(ProcessImporter, 'write_chunk', failing_write):
+            with self.assertRaises(CommandError):
+                call_command(
+                    'import_data', 'processes', path, '--create-users', '--chunk-size', '3',
+                    stdout=io.StringIO(),
+                )
+        self.assertEqual(Process.objects.count(), 3)
+
+        call_command('import_data', 'processes', path, '--resume', stdout=io.StringIO())
+        self.assertEqual(Process.objects.count(), 7)
+        self.assertFalse(os.path.exists(path + '.checkpoint'))
+
+    def test_importer_without_write_chunk_cannot_be_instantiated(self):
+        class IncompleteImporter(BaseImporter):
+            def parse_row(self, row):
+                return row
+
+        with self.assertRaises(TypeError):
+            IncompleteImporter()
+
+
+class SeedScaleTests(TestCase):
+    """Comando seed_scale (dados em massa para testes de desempenho)."""
+
+    def test_generates_consistent_dataset(self):
+        call_command('seed_scale', users=20, processes=60, batch_size=25, stdout=io.StringIO())
+
+        self.assertEqual(User.objects.filter(username__startswith='seed_').count(), 20)
+        self.assertEqual(Profile.objects.filter(user__username__startswith='seed_').count(), 20)
+        self.assertEqual(Process.objects.count(), 60)
+        # Contadores por estado reconstruídos no fim
+        for status, _ in Process.STATUS_CHOICES:
+            stored = sum(ProcessStatusCount.objects.filter(status=status).values_list('total', flat=True))
+            self.assertEqual(stored, Process.objects.filter(status=status).count())
+        # Referências dos ficheiros de exemplo e vagas batem certo com os anexos e agendamentos
+        self.assertEqual(sum(StoredBlob.objects.values_list('ref_count', flat=True)), Attachment.objects.count())
+        self.assertFalse(Appointment.objects.exclude(process__status='approved').exists())
+        self.assertEqual(sum(AppointmentSlot.objects.values_list('booked', flat=True)), Appointment.objects.count())
+        self.assertTrue(search_processes(Process.objects.all(), 'seed_0000003').exists())
+
+    def test_refuses_database_with_processes(self):
+        call_command('seed_scale', users=5, processes=5, stdout=io.StringIO())
+        with self.assertRaises(CommandError):
+            call_command('seed_scale', users=5, processes=5, stdout=io.StringIO())
+
+
+class ExplainQueriesTests(TestCase):
+    """Planos das queries das views (comando explain_queries)."""
+
+    def test_view_queries_use_indexes(self):
+        out = io.StringIO()
+        call_command('explain_queries', synthetic=300, fail_on_scan=True, stdout=out)
+        output = out.getvalue()
+        for name in ['dashboard (pesquisa)', 'manager_dashboard (totais por estado)',
+                     'manager_export (com filtros)', 'manager_analytics (decididos)']:
+            self.assertIn(f'== {name}', output)
+        self.assertIn('Nenhuma query faz full scan.', output)
+        self.assertFalse(Process.objects.exists())
+
+
+class ExportTests(TestCase):
+    """Exportação em streaming para o staff."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='=cmd', password='password123', first_name='Ana')
+        Profile.objects.create(user=self.user, passport='P123', nif='123456789')
+        self.d7 = ServiceType.objects.create(name='Visto D7', description='Teste')
+        self.cplp = ServiceType.objects.create(name='CPLP', description='Teste')
+        approved = Process.objects.create(user=self.user, service_type=self.d7, status='approved')
+        Appointment.objects.create(process=approved, appointment_date=timezone.now(), ticket_number='AIMA-000001')
+        old = Process.objects.create(user=self.user, service_type=self.cplp, status='rejected')
+        Process.objects.filter(pk=old.pk).update(submission_date=timezone.now() - datetime.timedelta(days=60))
+        User.objects.create_user(username='gestor', password='password123', is_staff=True)
+        self.client.login(username='gestor', password='password123')
+        self.url = reverse('manager_export')
+
+    def test_csv_streams_joined_rows(self):
+        response = self.client.get(self.url, {'format': 'csv'})
+        self.assertTrue(response.streaming)
+        rows = list(csv.DictReader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[0]['ticket_number'], 'AIMA-000001')
+        self.assertEqual(rows[0]['passport'], 'P123')
+        self.assertEqual(rows[0]['username'], "'=cmd")  # Sem fórmulas na folha de cálculo
+
+    def test_jsonl_filters(self):
+        since = (timezone.localdate() - datetime.timedelta(days=7)).isoformat()
+        response = self.client.get(self.url, {'format': 'jsonl', 'from': since})
+        lines = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([line['service'] for line in lines], ['Visto D7'])
+
+        response = self.client.get(self.url, {'format': 'jsonl', 'status': 'rejected', 'service': self.cplp.id})
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(json.loads(lines[0])['status'], 'rejected')
+        self.assertEqual(len(lines), 1)
+
+    def test_invalid_filters_and_permissions(self):
+        self.assertEqual(self.client.get(self.url, {'status': 'perdido'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'from': '01/02/2024'}).status_code, 400)
+        self.client.login(username='=cmd', password='password123')
+        self.assertEqual(self.client.get(self.url).status_code, 302)
+
+class AnalyticsTests(TestCase):
+    """Séries diárias e tempos de decisão do painel de gestão."""
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.user = User.objects.create_user(username='statsuser', password='password123')
+        self.service = ServiceType.objects.create(name='Visto D7', description='Teste')
+        now = timezone.now()
+        # Três processos submetidos há 10 dias: dois decididos há 2 dias, um ainda em análise
+        self.processes = []
+        for status in ['approved', 'rejected', 'review']:
+            process = Process.objects.create(user=self.user, service_type=self.service, status=status)
+            Process.objects.filter(pk=process.pk).update(
+                submission_date=now - datetime.timedelta(days=12),
+                submitted_at=now - datetime.timedelta(days=10),
+                decided_at=now - datetime.timedelta(days=2) if status != 'review' else None,
+            )
+            self.processes.append(process)
+        # Rascunho criado no mesmo dia: ainda não foi submetido
+        other = User.objects.create_user(username='statsdraft', password='password123')
+        Process.objects.create(user=other, service_type=self.service, status='draft')
+
+    def test_report_counts_and_decision_times(self):
+        report = analytics.build_report(days=14)
+        self.assertEqual(len(report['labels']), 14)
+        submitted = report['series']['submitted'][0]['data']
+        approved = report['series']['approved'][0]['data']
+        self.assertEqual(submitted[-11], 3)
+        self.assertEqual(sum(submitted), 3)
+        self.assertEqual(approved[-3], 1)
+        self.assertEqual(sum(report['series']['rejected'][0]['data']), 1)
+        self.assertEqual(report['decision_days']['count'], 2)
+        self.assertEqual(report['decision_days']['median'], 8.0)
+
+    def test_later_saves_do_not_move_the_decision(self):
+        approved = Process.objects.get(pk=self.processes[0].pk)
+        approved.save()  # Ex: edição no admin ou marcação do agendamento
+        report = analytics.build_report(days=14)
+        self.assertEqual(report['series']['approved'][0]['data'][-3], 1)
+        self.assertEqual(sum(report['series']['approved'][0]['data']), 1)
+
+    def test_status_dates_are_stamped_once(self):
+        process = Process.objects.create(user=User.objects.create_user(username='stamp'), service_type=self.service)
+        self.assertIsNone(process.submitted_at)
+        process.status = 'submitted'
+        process.save()
+        submitted_at = process.submitted_at
+        self.assertIsNotNone(submitted_at)
+
+        transition_processes(Process.objects.filter(pk=process.pk), 'approved')
+        process.refresh_from_db()
+        self.assertEqual(process.submitted_at, submitted_at)
+        self.assertIsNotNone(process.decided_at)
+
+    def test_past_days_come_from_cache(self):
+        analytics.build_report(days=14)
+        with mock.patch('website.analytics.compute_days', wraps=analytics.compute_days) as compute:
+            analytics.build_report(days=14)
+        today = timezone.localdate()
+        compute.assert_called_once_with(today, today)
+
+    def test_percentiles_match_numpy_linear_method(self):
+        self.assertEqual(analytics.percentiles([1, 2, 3, 4]), [2.5, 3.7])
+        self.assertEqual(analytics.percentiles([]), [None, None])
+
+    def test_endpoint_is_staff_only(self):
+        self.client.login(username='statsuser', password='password123')
+        self.assertEqual(self.client.get(reverse('manager_analytics')).status_code, 302)
+
+        User.objects.create_user(username='gestor', password='password123', is_staff=True)
+        self.client.login(username='gestor', password='password123')
+        response = self.client.get(reverse('manager_analytics'), {'days': 7})
+        self.assertEqual(len(response.json()['labels']), 7)
+        self.assertEqual(self.client.get(reverse('manager_analytics'), {'service': 'x'}).status_code, 400)
+
+class DatabaseProfileTests(TestCase):
+    """Perfis de base de dados escolhidos por DB_PROFILE (core/database.py)."""
+
+    def test_default_sqlite_profile_uses_wal_and_immediate_transactions(self):
+        options = database_settings(Path('/srv'), {})['default']['OPTIONS']
+        self.assertIn('PRAGMA journal_mode=WAL', options['init_command'])
+        self.assertIn('PRAGMA busy_timeout=5000', options['init_command'])
+        self.assertEqual(options['transaction_mode'], 'IMMEDIATE')
+
+    def test_postgres_pool_disables_persistent_connections(self):
+        default = database_settings(Path('/srv'), {'DB_PROFILE': 'postgres-pool', 'DB_POOL_MAX': '20'})['default']
+        self.assertEqual(default['CONN_MAX_AGE'], 0)
+        self.assertEqual(default['OPTIONS']['pool']['max_size'], 20)
+
+    def test_unknown_profile_is_rejected(self):
+        with self.assertRaises(ImproperlyConfigured):
+            database_settings(Path('/srv'), {'DB_PROFILE': 'mysql'})
+
+    def test_contention_benchmark_needs_an_explicit_database(self):
+        with mock.patch.dict(os.environ):
+            os.environ.pop('DB_NAME', None)
+            with self.assertRaisesMessage(CommandError, 'DB_NAME'):
+                call_command('bench_db_contention', stdout=io.StringIO())
+        self.assertFalse(User.objects.filter(username__startswith='bench_db_').exists())
+
+
+class RouteBenchmarkBaselineTests(SimpleTestCase):
+    """Comparação dos resultados do bench_routes com uma baseline."""
+
+    def _run(self, p95_ms=10.0, rps=100.0, queries_avg=4.0, errors=0):
+        return {'routes': {'dashboard': {'p95_ms': p95_ms, 'rps': rps, 'queries_avg': queries_avg, 'errors': errors}}}
+
+    def test_within_threshold_is_not_a_regression(self):
+        self.assertEqual(compare_results(self._run(), self._run(p95_ms=11.5, rps=85.0), 0.2, 0.5), [])
+
+    def test_slower_route_and_extra_queries_are_regressions(self):
+        regressions = compare_results(self._run(), self._run(p95_ms=13.0, queries_avg=5.0), 0.2, 0.5)
+        self.assertEqual(len(regressions), 2)
+        self.assertTrue(all(line.startswith('dashboard:') for line in regressions))
+
+    def test_routes_missing_from_baseline_are_ignored(self):
+        self.assertEqual(compare_results({'routes': {}}, self._run(), 0.2, 0.5), [])
+
+
+class SearchTests(TestCase):
+    """Índice de pesquisa FTS5 mantido pelos sinais."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='searchuser', password='password123')
+        Profile.objects.create(user=self.user, passport='AB123456', nif='123456789')
+        self.d7 = ServiceType.objects.create(name='Visto D7', description='Teste')
+        self.cplp = ServiceType.objects.create(name='Autorização CPLP', description='Teste')
+        self.p1 = Process.objects.create(user=self.user, service_type=self.d7, status='approved')
+        self.p2 = Process.objects.create(user=self.user, service_type=self.cplp, status='draft')
+        self.client.login(username='searchuser', password='password123')
+
+    def _search(self, query):
+        return set(search_processes(Process.objects.all(), query).values_list('id', flat=True))
+
+    def test_search_by_service_reference_and_profile(self):
+        self.assertEqual(self._search('d7'), {self.p1.id})
+        self.assertEqual(self._search('autorizacao'), {self.p2.id})  # sem acentos
+        reference = f"PT/{self.p2.submission_date:%Y}/{self.p2.id:04d}"
+        self.assertEqual(self._search(reference), {self.p2.id})
+        self.assertEqual(self._search('AB1234'), {self.p1.id, self.p2.id})
+
+    def test_index_follows_changes(self):
+        self.d7.name = 'Visto Nómada Digital'
+        self.d7.save()
+        self.assertEqual(self._search('nomada'), {self.p1.id})
+        self.p1.delete()
+        self.assertEqual(self._search('nomada'), set())
+
+    def test_dashboard_uses_index(self):
+        response = self.client.get(reverse('dashboard'), {'q': 'CPLP'})
+        self.assertEqual([p.id for p in response.context['processos']], [self.p2.id])
+
+    def test_backend_without_filter_cannot_be_instantiated(self):
+        class IncompleteBackend(SearchBackend):
+            pass
+
+        with self.assertRaises(TypeError):
+            IncompleteBackend()
+
+    @skipUnless(connection.vendor == 'sqlite', 'o backend por omissão em SQLite é o FTS5')
+    def test_backend_follows_the_database_vendor(self):
+        get_search_backend.cache_clear()
+        self.addCleanup(get_search_backend.cache_clear)
+        self.assertIsInstance(get_search_backend(), SQLiteFTS5Backend)
+        get_search_backend.cache_clear()
+        with mock.patch.object(connection, 'vendor', 'postgresql'):
+            self.assertIsInstance(get_search_backend(), DatabaseLikeBackend)
+            with self.assertRaises(ImproperlyConfigured):
+                SQLiteFTS5Backend()
+
+
+class TicketPdfCacheTests(TestCase):
+    """Cache em disco dos PDFs das senhas."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir, ignore_errors=True)
+        override = override_settings(PDF_CACHE_DIR=Path(self.tmpdir), TICKET_RENDER_WORKERS=0)
+        override.enable()
+        self.addCleanup(override.disable)
+        tickets.get_ticket_cache.cache_clear()
+        self.addCleanup(tickets.get_ticket_cache.cache_clear)
+
+        self.user = User.objects.create_user(username='pdfuser', password='password123')
+        service = ServiceType.objects.create(name='Visto D7', description='Teste')
+        process = Process.objects.create(user=self.user, service_type=service, status='approved')
+        self.appointment = Appointment.objects.create(
+            process=process, appointment_date=timezone.now(), ticket_number='AIMA-1234'
+        )
+        self.client.login(username='pdfuser', password='password123')
+        self.url = reverse('generate_pdf', args=[self.appointment.id])
+
+    def test_second_download_is_served_from_cache(self):
+        with mock.patch('website.tickets.render_ticket_pdf', wraps=tickets.render_ticket_pdf) as render:
+            first = self.client.get(self.url)
+            second = self.client.get(self.url)
+        self.assertEqual(render.call_count, 1)
+        self.assertEqual(first['Content-Type'], 'application/pdf')
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(first['ETag'], second['ETag'])
+
+        not_modified = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+
+    def test_appointment_change_invalidates_cache(self):
+        first = self.client.get(self.url)
+        self.appointment.location = 'Loja AIMA Porto'
+        self.appointment.save()
+        with mock.patch('website.tickets.render_ticket_pdf', wraps=tickets.render_ticket_pdf) as render:
+            second = self.client.get(self.url)
+        self.assertEqual(render.call_count, 1)
+        self.assertNotEqual(first['ETag'], second['ETag'])
+
+    def test_pending_ticket_is_not_rendered_in_request(self):
+        appointment = Appointment.objects.select_related(
+            'process__user__profile', 'process__service_type'
+        ).get(id=self.appointment.id)
+        key = tickets.ticket_cache_key(appointment)
+        tickets.get_ticket_cache().mark_pending(appointment.process_id, key)
+        with mock.patch('website.tickets.render_ticket_pdf') as render:
+            response = self.client.get(self.url)
+        render.assert_not_called()
+        self.assertRedirects(response, reverse('dashboard'))
+
+    def test_booking_prerenders_ticket(self):
+        process = Process.objects.create(
+            user=self.user, service_type=ServiceType.objects.first(), status='approved'
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.get(reverse('generate_appointment', args=[process.id]))
+        appointment = Appointment.objects.get(process=process)
+        with mock.patch('website.tickets.render_ticket_pdf') as render:
+            response = self.client.get(reverse('generate_pdf', args=[appointment.id]))
+        render.assert_not_called()
+        self.assertEqual(response.status_code, 200)
+
+    def test_lru_eviction_respects_size_limit(self):
+        cache = DiskLRUCache(self.tmpdir, max_bytes=250)
+        for i in range(5):
+            cache.set(i, 'k', b'x' * 100)
+        self.assertFalse(cache.contains(0, 'k'))
+        self.assertTrue(cache.contains(4, 'k'))
+        # O grupo despejado não deixa pasta vazia para trás
+        self.assertFalse(os.path.exists(os.path.join(self.tmpdir, '0')))
+
+    def test_stale_pending_markers_are_swept(self):
+        cache = DiskLRUCache(self.tmpdir, max_bytes=1000, pending_timeout=60)
+        cache.mark_pending(1, 'abandonado')
+        cache.mark_pending(2, 'recente')
+        old = time.time() - 120
+        os.utime(os.path.join(self.tmpdir, '1', 'abandonado.pending'), (old, old))
+        cache.set(3, 'k', b'x')
+        self.assertFalse(os.path.exists(os.path.join(self.tmpdir, '1')))
+        self.assertTrue(cache.is_pending(2, 'recente', 60))
+
+        cache.clear_pending(2, 'recente')
+        self.assertFalse(os.path.exists(os.path.join(self.tmpdir, '2')))
+
+
+class UploadDocumentTests(TestCase):
+    """Validação em streaming dos uploads (tamanho, magic bytes, SHA-256)."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=self.tmpdir)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.user = User.objects.create_user(username='uploaduser', password='password123')
+        service = ServiceType.objects.create(name='Visto D7', description='Teste')
+        self.doc = RequiredDoc.objects.create(service_type=service, doc_name='Passaporte')
+        self.process = Process.objects.create(user=self.user, service_type=service)
+        self.client.login(username='uploaduser', password='password123')
+        self.url = reverse('upload_document', args=[self.process.id])
+
+    def _upload(self, name, content):
+        return self.client.post(self.url, {
+            'doc_type_id': self.doc.id,
+            'file': SimpleUploadedFile(name, content),
+        })
+
+    def test_valid_pdf_is_stored_with_digest(self):
+        content = b'%PDF-1.4\n' + b'0' * 1000
+        self._upload('passaporte.pdf', content)
+        attachment = Attachment.objects.get(process=self.process)
+        self.assertEqual(attachment.sha256, hashlib.sha256(content).hexdigest())
+
+    def test_fake_extension_is_rejected(self):
+        self._upload('passaporte.pdf', b'\x89PNG\r\n\x1a\n' + b'0' * 100)
+        self.assertFalse(Attachment.objects.exists())
+
+    def test_oversized_file_is_rejected(self):
+        self._upload('passaporte.pdf', b'%PDF-1.4\n' + b'0' * (5 * 1024 * 1024))
+        self.assertFalse(Attachment.objects.exists())
+
+    def test_handler_stops_reading_past_the_limit(self):
+        handler = ValidatingUploadHandler(max_bytes=100)
+        handler.new_file('file', 'a.pdf', 'application/pdf', None)
+        handler.receive_data_chunk(b'%PDF-1.4' + b'0' * 50, 0)
+        with self.assertRaises(StopUpload):
+            handler.receive_data_chunk(b'0' * 60, 58)
+
+    def _jpeg(self, size, orientation, quality=95):
+        exif = Image.Exif()
+        exif[0x0112] = orientation  # Orientation
+        exif[0x010F] = 'Telemóvel'  # Make
+        buffer = io.BytesIO()
+        Image.effect_noise(size, 40).convert('RGB').save(buffer, 'JPEG', quality=quality, exif=exif)
+        return buffer.getvalue()
+
+    @override_settings(INGEST_MAX_DIMENSION=800)
+    def test_photo_is_rotated_downscaled_and_stripped(self):
+        content = self._jpeg((2000, 1000), orientation=6)
+        self._upload('passaporte.jpg', content)
+        attachment = Attachment.objects.get(process=self.process)
+        self.assertEqual(attachment.original_size, len(content))
+        self.assertLess(attachment.stored_size, attachment.original_size)
+        self.assertEqual(attachment.stored_size, attachment.file.size)
+        with Image.open(attachment.file.path) as stored:
+            self.assertEqual(stored.size, (400, 800))
+            self.assertEqual(len(stored.getexif()), 0)
+        # O hash é o do ficheiro guardado (e o do nome no storage), não o do original enviado
+        with open(attachment.file.path, 'rb') as fh:
+            self.assertEqual(attachment.sha256, hashlib.sha256(fh.read()).hexdigest())
+        self.assertEqual(attachment.file.name, blob_name(attachment.sha256, '.jpg'))
+
+    def test_image_is_stripped_even_when_not_smaller(self):
+        # Original já muito comprimido: a versão normalizada fica maior, mas é a gravada
+        content = self._jpeg((60, 30), orientation=6, quality=10)
+        self._upload('foto.jpg', content)
+        attachment = Attachment.objects.get(process=self.process)
+        self.assertGreater(attachment.stored_size, attachment.original_size)
+        with Image.open(attachment.file.path) as stored:
+            self.assertEqual(stored.size, (30, 60))
+            self.assertEqual(len(stored.getexif()), 0)
+
+    def test_csrf_is_still_enforced(self):
+        client = Client(enforce_csrf_checks=True)
+        client.login(username='uploaduser', password='password123')
+        response = client.post(self.url, {'doc_type_id': self.doc.id})
+        self.assertEqual(response.status_code, 403)
+
+
+class ContentAddressedStorageTests(TestCase):
+    """Armazenamento deduplicado dos anexos, com contagem de referências."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=self.tmpdir)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.user = User.objects.create_user(username='blobuser', password='password123')
+        service = ServiceType.objects.create(name='Visto D7', description='Teste')
+        self.doc = RequiredDoc.objects.create(service_type=service, doc_name='Passaporte')
+        self.p1 = Process.objects.create(user=self.user, service_type=service)
+        self.p2 = Process.objects.create(user=self.user, service_type=service, status='approved')
+        self.content = b'%PDF-1.4\n passaporte'
+
+    def _attach(self, process):
+        return Attachment.objects.create(
+            process=process, required_doc=self.doc, file=SimpleUploadedFile('scan.pdf', self.content)
+        )
+
+    def test_identical_uploads_share_one_blob(self):
+        a1 = self._attach(self.p1)
+        a2 = self._attach(self.p2)
+        self.assertEqual(a1.file.name, a2.file.name)
+        self.assertEqual(StoredBlob.objects.get(name=a1.file.name).ref_count, 2)
+
+        path = a1.file.path
+        with self.captureOnCommitCallbacks(execute=True):
+            a1.delete()
+        self.assertTrue(os.path.exists(path))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            a2.delete()
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(StoredBlob.objects.exists())
+
+    def test_blob_reused_before_cleanup_is_kept(self):
+        a1 = self._attach(self.p1)
+        path = a1.file.path
+        with self.captureOnCommitCallbacks() as callbacks:
+            a1.delete()
+        real_link = os.link
+
+        def link_then_cleanup(src, dst):
+            # A limpeza corre depois de o upload ver que o ficheiro já existe, antes do seu commit
+            try:
+                real_link(src, dst)
+            finally:
+                for callback in callbacks:
+                    callback()
+
+        with mock.patch('website.storage.os.link', side_effect=link_then_cleanup):
+            a2 = self._attach(self.p2)
+        self.assertTrue(os.path.exists(path))
+        self.assertEqual(StoredBlob.objects.get(name=a2.file.name).ref_count, 1)
+
+    def test_deleting_a_process_releases_files_in_constant_queries(self):
+        docs = [self.doc] + [
+            RequiredDoc.objects.create(service_type=self.p1.service_type, doc_name=f'Extra {i}') for i in range(3)
+        ]
+        kept = self._attach(self.p2)
+
+        def attach_and_delete(contents):
+            process = Process.objects.create(user=self.user, service_type=self.p1.service_type)
+            for doc, content in zip(docs, contents):
+                Attachment.objects.create(
+                    process=process, required_doc=doc, file=SimpleUploadedFile('scan.pdf', content)
+                )
+            with CaptureQueriesContext(connection) as queries:
+                with self.captureOnCommitCallbacks(execute=True):
+                    process.delete()
+            return len(queries)
+
+        self.p1.delete()
+        one = attach_and_delete([b'%PDF-1.4\n a'])
+        # Dois anexos iguais, um partilhado com outro processo e um só deste
+        many = attach_and_delete([b'%PDF-1.4\n b', b'%PDF-1.4\n b', self.content, b'%PDF-1.4\n c'])
+        self.assertEqual(many, one + 1)  # Mais um UPDATE: há ficheiros com 1 e com 2 referências
+        self.assertEqual(list(StoredBlob.objects.values_list('name', 'ref_count')), [(kept.file.name, 1)])
+        self.assertEqual(len(list(Path(self.tmpdir, 'documents').rglob('*.pdf'))), 1)
+
+    def test_known_digest_is_used_as_the_blob_name(self):
+        upload = SimpleUploadedFile('scan.pdf', self.content)
+        upload.sha256 = hashlib.sha256(self.content).hexdigest()
+        with mock.patch('website.storage.hashlib.sha256') as rehash:
+            attachment = Attachment.objects.create(process=self.p1, required_doc=self.doc, file=upload)
+        rehash.assert_not_called()
+        self.assertEqual(attachment.file.name, blob_name(upload.sha256, '.pdf'))
+        self.assertEqual(StoredBlob.objects.get(name=attachment.file.name).ref_count, 1)
+
+    def test_dedupe_command_removes_files_left_by_rolled_back_uploads(self):
+        kept = self._attach(self.p2)
+        with self.assertRaises(IntegrityError):
+            with transaction.atomic():
+                orphan = Attachment.objects.create(
+                    process=self.p1, required_doc=self.doc, file=SimpleUploadedFile('scan.pdf', b'%PDF-1.4\n outro')
+                )
+                raise IntegrityError  # Ex: outro upload ganhou a corrida em upload_document
+        self.assertTrue(os.path.exists(orphan.file.path))
+        self.assertFalse(StoredBlob.objects.filter(name=orphan.file.name).exists())
+
+        out = io.StringIO()
+        call_command('dedupe_attachments', stdout=out)
+        self.assertIn('Ficheiros órfãos apagados: 1', out.getvalue())
+        self.assertFalse(os.path.exists(orphan.file.path))
+        self.assertTrue(os.path.exists(kept.file.path))
+        self.assertEqual(StoredBlob.objects.get().ref_count, 1)
+
+    def test_dedupe_command_merges_legacy_files(self):
+        legacy_dir = Path(self.tmpdir) / 'documents' / '2025' / '01'
+        legacy_dir.mkdir(parents=True)
+        for i, process in enumerate([self.p1, self.p2]):
+            (legacy_dir / f'scan_{i}.pdf').write_bytes(self.content)
+            Attachment.objects.bulk_create([Attachment(
+                process=process, required_doc=self.doc, file=f'documents/2025/01/scan_{i}.pdf'
+            )])
+
+        call_command('dedupe_attachments', stdout=io.StringIO())
+
+        names = set(Attachment.objects.values_list('file', flat=True))
+        self.assertEqual(len(names), 1)
+        self.assertEqual(StoredBlob.objects.get().ref_count, 2)
+        self.assertFalse(any(legacy_dir.iterdir()))
+
+
+class AttachmentPreviewTests(TestCase):
+    """Pré-visualizações dos anexos, geradas depois do commit."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=self.tmpdir, PREVIEW_WORKERS=0, PREVIEW_MAX_SIZE=200)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.user = User.objects.create_user(username='previewuser', password='password123')
+        service = ServiceType.objects.create(name='Visto D7', description='Teste')
+        self.doc = RequiredDoc.objects.create(service_type=service, doc_name='Passaporte')
+        self.process = Process.objects.create(user=self.user, service_type=service)
+        self.client.login(username='previewuser', password='password123')
+
+    def _attach(self, name, content):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Attachment.objects.create(
+                process=self.process, required_doc=self.doc, file=SimpleUploadedFile(name, content)
+            )
+
+    def _png(self, size):
+        buffer = io.BytesIO()
+        Image.new('RGB', size, 'navy').save(buffer, 'PNG')
+        return buffer.getvalue()
+
+    def test_missing_file_is_not_sent_to_the_pool(self):
+        with mock.patch('website.previews.build_preview') as build:
+            self.assertIsNone(enqueue_preview('documents/2025/01/perdido.pdf', attachment_storage()))
+        build.assert_not_called()
+
+    def test_image_preview_is_downscaled_and_cached(self):
+        attachment = self._attach('passaporte.png', self._png((1600, 800)))
+        self.assertTrue(attachment.has_preview)
+
+        url = reverse('document_preview', args=[attachment.id])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('private, max-age=', response['Cache-Control'])
+        with Image.open(io.BytesIO(b''.join(response.streaming_content))) as preview:
+            self.assertEqual(preview.size, (200, 100))
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_pdf_without_images_gets_text_card(self):
+        buffer = io.BytesIO()
+        writer = PdfWriter()
+        writer.add_blank_page(595, 842)
+        writer.write(buffer)
+        attachment = self._attach('registo.pdf', buffer.getvalue())
+        self.assertTrue(attachment.has_preview)
+
+    def test_preview_is_private_and_removed_with_blob(self):
+        attachment = self._attach('passaporte.png', self._png((50, 50)))
+        User.objects.create_user(username='intruso', password='password123')
+        self.client.login(username='intruso', password='password123')
+        self.assertEqual(self.client.get(reverse('document_preview', args=[attachment.id])).status_code, 403)
+
+        storage = attachment.file.storage
+        with self.captureOnCommitCallbacks(execute=True):
+            attachment.delete()
+        self.assertFalse(preview_exists(attachment.file.name, storage))
+
+
+@override_settings(
+    APPOINTMENT_LOCATIONS=['Loja A', 'Loja B'],
+    APPOINTMENT_OPENING_HOURS=('09:00', '10:00'),
+    APPOINTMENT_SLOT_MINUTES=30,
+    APPOINTMENT_SLOT_CAPACITY=2,
+    APPOINTMENT_HORIZON_DAYS=30,
+)
+class AppointmentSchedulingTests(TestCase):
+    """Alocação de vagas com capacidade limitada."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='slotuser', password='password123')
+        self.service = ServiceType.objects.create(name='Visto D7', description='Teste')
+
+    def test_single_allocation_respects_capacity(self):
+        first = scheduling.allocate_slot()
+        second = scheduling.allocate_slot()
+        third = scheduling.allocate_slot()
+        self.assertEqual(first.pk, second.pk)
+        self.assertNotEqual(third.pk, first.pk)
+        self.assertEqual(AppointmentSlot.objects.get(pk=first.pk).booked, 2)
+        # A vaga cheia nunca é ocupada outra vez, mesmo que alguém tente à força
+        self.assertFalse(
+            AppointmentSlot.objects.filter(pk=first.pk, booked__lt=F('capacity')).update(booked=F('booked') + 1)
+        )
+
+    def test_deleting_appointments_frees_their_seats(self):
+        processes = [
+            Process.objects.create(user=self.user, service_type=self.service, status='approved')
+            for _ in range(3)
+        ]
+        appointments = scheduling.book_appointments([p.id for p in processes])
+        slot = appointments[0].slot
+        self.assertEqual(AppointmentSlot.objects.get(pk=slot.pk).booked, 2)
+
+        appointments[0].delete()
+        processes[1].delete()  # Cascata do processo para o agendamento
+        Appointment.objects.filter(pk=appointments[2].pk).delete()
+        self.assertEqual(sum(AppointmentSlot.objects.values_list('booked', flat=True)), 0)
+
+    def test_admin_cannot_move_appointments_between_slots(self):
+        model_admin = admin.site._registry[Appointment]
+        self.assertTrue({'slot', 'appointment_date', 'location'} <= set(model_admin.get_readonly_fields(None)))
+        self.assertFalse(model_admin.has_add_permission(None))
+
+    def test_bulk_booking_fills_earliest_slots_in_order(self):
+        processes = [
+            Process.objects.create(user=self.user, service_type=self.service, status='approved')
+            for _ in range(5)
+        ]
+        appointments = scheduling.book_appointments([p.id for p in processes])
+        self.assertEqual(len(appointments), 5)
+        dates = [a.appointment_date for a in appointments]
+        self.assertEqual(dates, sorted(dates))
+        self.assertFalse(AppointmentSlot.objects.filter(booked__gt=F('capacity')).exists())
+        self.assertEqual(sum(AppointmentSlot.objects.values_list('booked', flat=True)), 5)
+        self.assertEqual(appointments[0].ticket_number, f'AIMA-{processes[0].id:06d}')
+
+        # Processos que já têm agendamento são ignorados
+        self.assertEqual(scheduling.book_appointments([processes[0].id]), [])
+
+    def test_horizon_exhausted_raises(self):
+        with override_settings(APPOINTMENT_HORIZON_DAYS=0):
+            with mock.patch('website.scheduling.first_bookable_date', return_value=datetime.date(2030, 1, 5)):
+                # Sábado com horizonte de zero dias: não há dias úteis
+                with self.assertRaises(scheduling.NoSlotsAvailable):
+                    scheduling.allocate_slot()
+
+    @override_settings(TICKET_RENDER_WORKERS=0)
+    def test_generate_appointment_assigns_slot(self):
+        process = Process.objects.create(user=self.user, service_type=self.service, status='approved')
+        self.client.login(username='slotuser', password='password123')
+        with mock.patch('website.views.enqueue_ticket_renders'):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.get(reverse('generate_appointment', args=[process.id]))
+        appointment = Appointment.objects.select_related('slot').get(process=process)
+        self.assertEqual(appointment.location, appointment.slot.location)
+        self.assertEqual(appointment.appointment_date, scheduling.slot_datetime(appointment.slot))
+        self.assertEqual(appointment.slot.booked, 1)
+
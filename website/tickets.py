@@ -0,0 +1,240 @@
+# ==============================================================================
+# IMIGRAÁGIL - TICKETS.PY (SENHAS DE AGENDAMENTO EM PDF)
+# ==============================================================================
+# Geração do PDF da senha (xhtml2pdf) com cache em disco.
+# O PDF só é gerado quando não existe na cache; caso contrário são servidos
+# os bytes já guardados. Ao marcar o agendamento, o PDF é pré-gerado num
+# pool de processos (ver enqueue_ticket_render).
+
+import hashlib
+import io
+import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from pathlib import Path
+
+from django.conf import settings
+from django.template.loader import get_template
+from xhtml2pdf import pisa
+
+from .metrics import PDF_RENDER, REGISTRY
+from .pdf_cache import DiskLRUCache
+
+TICKET_TEMPLATE = 'ticket_pdf.html'
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=1)
+def get_ticket_cache():
+    """Cache partilhada das senhas (configurada em settings)."""
+    return DiskLRUCache(
+        getattr(settings, 'PDF_CACHE_DIR', Path(tempfile.gettempdir()) / 'imigraima' / 'tickets'),
+        getattr(settings, 'PDF_CACHE_MAX_BYTES', 256 * 1024 * 1024),
+        pending_timeout=getattr(settings, 'TICKET_RENDER_TIMEOUT', 60),
+    )
+
+
+@lru_cache(maxsize=8)
+def _template_hash(origin_name, mtime):
+    with open(origin_name, 'rb') as fh:
+        return hashlib.sha256(fh.read()).hexdigest()
+
+
+def template_hash(template_name=TICKET_TEMPLATE):
+    """Hash do ficheiro do template: alterar o layout invalida todos os PDFs."""
+    origin = get_template(template_name).origin.name
+    return _template_hash(origin, os.path.getmtime(origin))
+
+
+def ticket_cache_key(appointment):
+    """
+    Chave de conteúdo: todos os campos mostrados no PDF + hash do template.
+    Espera o agendamento carregado com process__user__profile e process__service_type.
+    """
+    process = appointment.process
+    user = process.user
+    profile = getattr(user, 'profile', None)
+    parts = [
+        template_hash(),
+        appointment.id,
+        appointment.ticket_number,
+        appointment.location,
+        appointment.appointment_date.isoformat(),
+        process.id,
+        process.submission_date.isoformat(),
+        process.service_type.name,
+        user.first_name,
+        user.last_name,
+        profile.passport if profile else '',
+    ]
+    return hashlib.sha256('\x1f'.join(str(p) for p in parts).encode()).hexdigest()
+
+
+def ticket_context(appointment):
+    """
+    Contexto do template só com tipos simples (dicionários, strings, datas),
+    para poder ser enviado para outro processo (pickle) sem modelos nem BD.
+    """
+    process = appointment.process
+    user = process.user
+    profile = getattr(user, 'profile', None)
+    return {'appointment': {
+        'id': appointment.id,
+        'ticket_number': appointment.ticket_number,
+        'location': appointment.location,
+        'appointment_date': appointment.appointment_date,
+        'process': {
+            'id': process.id,
+            'submission_date': process.submission_date,
+            'service_type': {'name': process.service_type.name},
+            'user': {
+                'first_name': user.first_name,
+                'last_name': user.last_name,
+                'profile': {'passport': profile.passport if profile else ''},
+            },
+        },
+    }}
+
+
+def render_ticket_pdf(context):
+    """Gera o PDF (CPU intensivo). Devolve os bytes ou None em caso de erro."""
+    html = get_template(TICKET_TEMPLATE).render(context)
+    buffer = io.BytesIO()
+    started = time.perf_counter()
+    pisa_status = pisa.CreatePDF(html, dest=buffer)
+    PDF_RENDER.observe(time.perf_counter() - started, outcome='error' if pisa_status.err else 'ok')
+    if pisa_status.err:
+        return None
+    return buffer.getvalue()
+
+
+class TicketPending(Exception):
+    """O PDF está a ser gerado em segundo plano e ainda não está pronto."""
+
+
+def get_ticket_pdf(appointment):
+    """
+    Devolve (pdf_bytes, etag), usando a cache quando possível.
+    pdf_bytes é None se a geração falhar.
+    Lança TicketPending se o PDF estiver a ser gerado em segundo plano.
+    """
+    key = ticket_cache_key(appointment)
+    cache = get_ticket_cache()
+    pdf = cache.get(appointment.process_id, key)
+    if pdf is None:
+        if cache.is_pending(appointment.process_id, key, getattr(settings, 'TICKET_RENDER_TIMEOUT', 60)):
+            raise TicketPending()
+        pdf = render_ticket_pdf(ticket_context(appointment))
+        if pdf is not None:
+            cache.set(appointment.process_id, key, pdf)
+    return pdf, key
+
+
+def invalidate_ticket(process_id):
+    """Apaga os PDFs em cache do processo (chamado pelos sinais)."""
+    get_ticket_cache().invalidate(process_id)
+
+
+# ==========================================
+# PRÉ-GERAÇÃO EM SEGUNDO PLANO (PROCESS POOL)
+# ==========================================
+# O xhtml2pdf ocupa o CPU (e o GIL) durante centenas de ms. Ao marcar o
+# agendamento, o PDF é enviado para um pool de processos, para já existir
+# em disco quando o utilizador o pedir.
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _init_worker():
+    """Cada processo do pool arranca o Django (settings, templates)."""
+    import django
+    django.setup()
+
+
+def _render_to_cache(cache_dir, max_bytes, pending_timeout, group, key, context):
+    """Corre dentro do pool: gera o PDF e grava-o na cache. Devolve True se correu bem."""
+    cache = DiskLRUCache(cache_dir, max_bytes, pending_timeout=pending_timeout)
+    try:
+        pdf = render_ticket_pdf(context)
+        if pdf is not None:
+            cache.set(group, key, pdf)
+        return pdf is not None
+    finally:
+        cache.clear_pending(group, key)
+        # Processo do pool: as métricas só chegam ao /metrics pelo ficheiro em METRICS_DIR
+        REGISTRY.flush()
+
+
+def get_render_executor():
+    """Pool partilhado (criado na primeira utilização). None se TICKET_RENDER_WORKERS = 0."""
+    global _executor
+    workers = getattr(settings, 'TICKET_RENDER_WORKERS', 2)
+    if workers <= 0:
+        return None
+    with _executor_lock:
+        if _executor is None:
+            # 'spawn' evita herdar ligações à BD e locks de threads do servidor
+            _executor = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+            )
+        return _executor
+
+
+def enqueue_ticket_render(appointment):
+    """
+    Pede a geração do PDF em segundo plano e marca-o como "a gerar".
+    Devolve o Future (ou None se já estava em cache ou foi gerado aqui mesmo).
+    """
+    key = ticket_cache_key(appointment)
+    group = appointment.process_id
+    cache = get_ticket_cache()
+    if cache.contains(group, key):
+        return None
+
+    executor = get_render_executor()
+    if executor is None:
+        # Sem pool (ex: testes): gera já, no processo atual
+        _render_to_cache(
+            cache.directory, cache.max_bytes, cache.pending_timeout, group, key, ticket_context(appointment)
+        )
+        return None
+
+    cache.mark_pending(group, key)
+    try:
+        return executor.submit(
+            _render_to_cache, cache.directory, cache.max_bytes, cache.pending_timeout,
+            group, key, ticket_context(appointment),
+        )
+    except Exception:
+        # Pool indisponível: o PDF será gerado no pedido de download, como antes
+        logger.exception("Não foi possível enviar a senha %s para o pool de PDFs.", appointment.ticket_number)
+        cache.clear_pending(group, key)
+        return None
+
+
+def enqueue_ticket_renders(appointment_ids, batch_size=None):
+    """
+    Versão em massa (ex: aprovações em lote). Os agendamentos são carregados
+    em blocos de TICKET_PRERENDER_BATCH_SIZE (uma query por bloco), para a
+    memória não crescer com o número de senhas.
+    """
+    from .models import Appointment
+
+    appointment_ids = list(appointment_ids)
+    batch_size = batch_size or getattr(settings, 'TICKET_PRERENDER_BATCH_SIZE', 200)
+    futures = []
+    for start in range(0, len(appointment_ids), batch_size):
+        appointments = Appointment.objects.filter(id__in=appointment_ids[start:start + batch_size]).select_related(
+            'process__user__profile', 'process__service_type'
+        )
+        futures.extend(enqueue_ticket_render(appointment) for appointment in appointments)
+    return [future for future in futures if future is not None]
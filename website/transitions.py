@@ -0,0 +1,137 @@
+# ==============================================================================
+# IMIGRAÁGIL - TRANSITIONS.PY (MUDANÇAS DE ESTADO EM MASSA)
+# ==============================================================================
+# Aprovar/rejeitar milhares de processos de uma vez (ações do admin) com um só
+# queryset.update() bloqueava a BD (em SQLite, toda a escrita do site) durante
+# a operação inteira e não tinha efeitos secundários.
+#
+# Aqui a mudança é feita em blocos de TRANSITION_CHUNK_SIZE processos, cada um
+# na sua transação curta. Em cada bloco:
+#   - só mudam os processos cuja transição é permitida (Process.ALLOWED_TRANSITIONS);
+#   - o updated_at e as datas de submissão/decisão são atualizados e os
+#     contadores por estado acertados;
+#   - o histórico (ProcessStatusChange) é criado com bulk_create;
+#   - ao aprovar, os agendamentos são marcados em massa (book_appointments)
+#     e, depois do commit do bloco, as senhas são enviadas para pré-geração
+#     (enqueue_ticket_renders, em lotes de TICKET_PRERENDER_BATCH_SIZE).
+
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import DateTimeField, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .counters import apply_deltas, status_deltas
+from .models import Process, ProcessStatusChange
+from .scheduling import NoSlotsAvailable, book_appointments
+from .tickets import enqueue_ticket_renders
+
+
+class TransitionReport:
+    """Resultado de transition_processes(): quantos mudaram, quantos foram ignorados e a que ritmo."""
+
+    def __init__(self, to_status):
+        self.to_status = to_status
+        self.changed = 0
+        self.skipped = 0
+        self.appointments = 0
+        self.chunks = 0
+        self.elapsed = 0.0
+        self.error = None
+
+    @property
+    def rate(self):
+        """Processos alterados por segundo."""
+        return self.changed / self.elapsed if self.elapsed else 0.0
+
+    def summary(self):
+        label = dict(Process.STATUS_CHOICES).get(self.to_status, self.to_status)
+        text = (
+            f"{self.changed} processos passaram a '{label}' em {self.elapsed:.1f}s "
+            f"({self.rate:,.0f}/s, {self.chunks} blocos)."
+        )
+        if self.appointments:
+            text += f" {self.appointments} agendamentos marcados."
+        if self.skipped:
+            text += f" {self.skipped} ignorados (mudança de estado não permitida)."
+        return text
+
+
+def allowed_sources(to_status):
+    """Estados a partir dos quais se pode passar para `to_status`."""
+    return [source for source, targets in Process.ALLOWED_TRANSITIONS.items() if to_status in targets]
+
+
+def status_dates(to_status, now):
+    """Campos submitted_at/decided_at para um update() em massa (o mesmo que Process.stamp_status_dates)."""
+    dates = {}
+    if to_status != 'draft':
+        dates['submitted_at'] = Coalesce('submitted_at', Value(now, output_field=DateTimeField()))
+    dates['decided_at'] = now if to_status in Process.CLOSED_STATUSES else None
+    return dates
+
+
+def transition_processes(queryset, to_status, user=None, chunk_size=None):
+    """
+    Muda o estado dos processos do queryset para `to_status`, em blocos.
+    Cada bloco é independente: se um falhar (ex: faltam vagas), os anteriores
+    ficam aplicados e report.error explica onde parou.
+    """
+    if to_status not in dict(Process.STATUS_CHOICES):
+        raise ValueError(f"Estado desconhecido: {to_status}")
+    chunk_size = chunk_size or getattr(settings, 'TRANSITION_CHUNK_SIZE', 500)
+    sources = allowed_sources(to_status)
+    report = TransitionReport(to_status)
+    started = time.perf_counter()
+
+    report.skipped = queryset.exclude(status__in=sources).exclude(status=to_status).count()
+    candidates = queryset.filter(status__in=sources).order_by('id').values_list('id', flat=True)
+
+    last_id = 0
+    while True:
+        # Paginação por id (keyset): nunca se mantém um cursor aberto entre transações
+        ids = list(candidates.filter(id__gt=last_id)[:chunk_size])
+        if not ids:
+            break
+        last_id = ids[-1]
+        try:
+            _apply_chunk(ids, sources, to_status, user, report)
+        except NoSlotsAvailable as exc:
+            report.error = str(exc)
+            break
+        report.chunks += 1
+
+    report.elapsed = time.perf_counter() - started
+    return report
+
+
+def _apply_chunk(ids, sources, to_status, user, report):
+    with transaction.atomic():
+        # Volta a confirmar o estado com as linhas bloqueadas (podem ter mudado desde a leitura)
+        rows = list(
+            Process.objects.filter(id__in=ids, status__in=sources)
+            .select_for_update()
+            .values_list('id', 'status', 'service_type_id')
+        )
+        if not rows:
+            return
+        now = timezone.now()
+        changed_ids = [pk for pk, _, _ in rows]
+        Process.objects.filter(id__in=changed_ids).update(status=to_status, updated_at=now, **status_dates(to_status, now))
+        apply_deltas(status_deltas(rows, to_status))
+        ProcessStatusChange.objects.bulk_create([
+            ProcessStatusChange(
+                process_id=pk, from_status=old_status, to_status=to_status, changed_by=user, changed_at=now
+            )
+            for pk, old_status, _ in rows
+        ])
+
+        appointments = book_appointments(changed_ids) if to_status == 'approved' else []
+        if appointments:
+            appointment_ids = [appointment.id for appointment in appointments]
+            transaction.on_commit(lambda: enqueue_ticket_renders(appointment_ids))
+
+    report.changed += len(rows)
+    report.appointments += len(appointments)
@@ -0,0 +1,123 @@
+# ==============================================================================
+# IMIGRAÁGIL - UPLOADS.PY (VALIDAÇÃO DE UPLOADS EM STREAMING)
+# ==============================================================================
+# O validador do modelo (validate_file_extension_and_size) só corre depois de
+# o Django ter recebido o ficheiro inteiro. Este upload handler corre ANTES,
+# à medida que os blocos chegam:
+#   - corta a ligação assim que o ficheiro passa o limite de tamanho;
+#   - confirma o tipo real pelos "magic bytes" do primeiro bloco (PDF/JPEG/PNG);
+#   - calcula o SHA-256 de forma incremental (sem voltar a ler o ficheiro).
+#
+# Uso (a view tem de instalar o handler antes de ler request.POST/FILES):
+#   handler = ValidatingUploadHandler(request)
+#   request.upload_handlers.insert(0, handler)
+
+import hashlib
+import os
+
+from django.core.files.uploadhandler import FileUploadHandler, StopUpload
+
+from .models import MAX_UPLOAD_BYTES, MAX_UPLOAD_MB, VALID_UPLOAD_EXTENSIONS
+
+# Assinaturas no início de cada tipo de ficheiro aceite
+MAGIC_BYTES = {
+    'pdf': [b'%PDF-'],
+    'jpeg': [b'\xff\xd8\xff'],
+    'png': [b'\x89PNG\r\n\x1a\n'],
+}
+
+# Extensão -> tipo real esperado
+EXTENSION_KINDS = {'.pdf': 'pdf', '.jpg': 'jpeg', '.jpeg': 'jpeg', '.png': 'png'}
+
+# Folga para os campos de texto do formulário (token CSRF, doc_type_id, cabeçalhos multipart)
+FORM_OVERHEAD_BYTES = 64 * 1024
+
+
+def sniff_kind(head):
+    """Devolve 'pdf', 'jpeg' ou 'png' conforme os primeiros bytes, ou None."""
+    for kind, signatures in MAGIC_BYTES.items():
+        if any(head.startswith(signature) for signature in signatures):
+            return kind
+    return None
+
+
+class ValidatingUploadHandler(FileUploadHandler):
+    """
+    Primeiro handler da cadeia: valida e calcula o hash, e passa os blocos
+    aos handlers seguintes (memória/ficheiro temporário) sem os copiar.
+
+    Depois do upload:
+      - self.error: mensagem para o utilizador se o ficheiro foi recusado
+        (e self.error_reason: 'extension', 'too_large' ou 'content', para as métricas)
+      - self.results[field_name]: {'sha256', 'size', 'kind'} dos ficheiros aceites
+    """
+
+    def __init__(self, request=None, max_bytes=MAX_UPLOAD_BYTES):
+        super().__init__(request)
+        self.max_bytes = max_bytes
+        self.error = None
+        self.error_reason = None
+        self.results = {}
+        self._request_length = None
+
+    def _reject(self, message, reason):
+        # connection_reset=True: o Django deixa de ler o resto do pedido
+        self.error = message
+        self.error_reason = reason
+        raise StopUpload(connection_reset=True)
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        self._request_length = content_length
+
+    def new_file(self, field_name, file_name, *args, **kwargs):
+        super().new_file(field_name, file_name, *args, **kwargs)
+        ext = os.path.splitext(file_name)[1].lower()
+        if ext not in VALID_UPLOAD_EXTENSIONS:
+            self._reject('Ficheiro não suportado. Por segurança, envie apenas PDF, JPG ou PNG.', 'extension')
+        # Se o próprio pedido já é maior do que o permitido, nem começamos a ler
+        if self._request_length and self._request_length > self.max_bytes + FORM_OVERHEAD_BYTES:
+            self._reject(self._too_big_message(), 'too_large')
+
+        self._expected_kind = EXTENSION_KINDS[ext]
+        self._kind = None
+        self._head = b''
+        self._size = 0
+        self._hash = hashlib.sha256()
+
+    def receive_data_chunk(self, raw_data, start):
+        self._size += len(raw_data)
+        if self._size > self.max_bytes:
+            self._reject(self._too_big_message(), 'too_large')
+
+        if self._kind is None:
+            self._check_kind(raw_data)
+
+        self._hash.update(raw_data)
+        return raw_data
+
+    def _check_kind(self, raw_data):
+        # Normalmente o primeiro bloco (64KB) chega; guardamos o início até ter 8 bytes
+        self._head += raw_data[:8 - len(self._head)]
+        if len(self._head) < 8:
+            return
+        self._kind = sniff_kind(self._head)
+        if self._kind != self._expected_kind:
+            self._reject('O conteúdo do ficheiro não corresponde a um PDF, JPG ou PNG válido.', 'content')
+
+    def file_complete(self, file_size):
+        if self._kind is None:
+            # Ficheiro com menos de 8 bytes: decide com o que houver
+            self._kind = sniff_kind(self._head)
+            if self._kind != self._expected_kind:
+                self.error = 'O conteúdo do ficheiro não corresponde a um PDF, JPG ou PNG válido.'
+                self.error_reason = 'content'
+                return None
+        self.results[self.field_name] = {
+            'sha256': self._hash.hexdigest(),
+            'size': self._size,
+            'kind': self._kind,
+        }
+        return None  # O ficheiro em si é criado pelo handler seguinte
+
+    def _too_big_message(self):
+        return f'O ficheiro é muito grande. O tamanho máximo permitido é {MAX_UPLOAD_MB}MB.'
@@ -29,6 +29,7 @@ urlpatterns = [
 
     # Ações Específicas de Documentos
     path('documento/<int:doc_id>/apagar/', views.delete_document, name='delete_document'),
+    path('documento/<int:doc_id>/pre-visualizacao/', views.document_preview, name='document_preview'),
 
     # ==========================================
     # 4. AGENDAMENTOS & OUTPUTS (PDF)
@@ -40,4 +41,12 @@ urlpatterns = [
     # 5. ÁREA DE GESTÃO (STAFF)
     # ==========================================
     path('gestao/', views.manager_dashboard, name='manager_dashboard'),
+    path('gestao/estatisticas/', views.manager_analytics, name='manager_analytics'),
+    path('gestao/exportar/', views.manager_export, name='manager_export'),
+
+    # ==========================================
+    # 6. MONITORIZAÇÃO
+    # ==========================================
+    # Sem barra final: é o caminho por omissão do Prometheus
+    path('metrics', views.metrics, name='metrics'),
 ]
\ No newline at end of file
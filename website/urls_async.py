@@ -0,0 +1,12 @@
+from django.urls import path
+from . import async_views
+
+# Versões async das páginas de leitura (website/async_views.py).
+# Mesmos caminhos e nomes que em website/urls.py: usadas no lugar das síncronas
+# quando o site corre com ASYNC_VIEWS=1 (ver core/urls_asgi.py).
+urlpatterns = [
+    path('api/processos/', async_views.api_get_processes, name='api_get_processes'),
+    path('dashboard/', async_views.dashboard, name='dashboard'),
+    path('processo/<int:process_id>/', async_views.process_detail, name='process_detail'),
+    path('gestao/', async_views.manager_dashboard, name='manager_dashboard'),
+]
@@ -8,19 +8,36 @@ from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib.auth import login
 from django.contrib import messages
 from django.utils import timezone
-from django.http import HttpResponse, JsonResponse
-from django.template.loader import get_template
-from django.db.models import Count, Q
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.db import IntegrityError, transaction
+from django.db.models import Exists
 from django.core.paginator import Paginator # Importado no topo para organização
 from django.core.exceptions import PermissionDenied # 🔒 NOVO IMPORT PARA SEGURANÇA IDOR
+from django.conf import settings
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
 
 # --- Imports Externos ---
-import random
-from xhtml2pdf import pisa 
+import hmac
+import json
+import os
 
 # --- Meus Imports (Modelos e Formulários) ---
 from .models import Process, RequiredDoc, Attachment, Appointment, Profile, ServiceType
 from .forms import ProcessForm, CustomUserCreationForm, UserUpdateForm, ProfileUpdateForm
+from .analytics import build_report
+from .catalog import get_requirement
+from .counters import status_totals
+from .exports import FORMATS, InvalidExportFilter, export_queryset, stream_export
+from .metrics import REGISTRY, UPLOAD_BYTES, UPLOAD_REJECTIONS
+from .previews import enqueue_preview, preview_content_type, preview_name
+from .scheduling import NoSlotsAvailable, book_appointment
+from .search import search_processes
+from .tickets import TicketPending, enqueue_ticket_renders, get_ticket_pdf
+from .uploads import ValidatingUploadHandler
+from .pagination import (
+    CountFreePaginator, InvalidCursor, decode_cursor, encode_cursor, keyset_filter, parse_page_size,
+)
 
 # ==============================================================================
 # 1. ÁREA PÚBLICA & API
@@ -36,18 +53,109 @@ def home(request):
 def api_get_processes(request):
     """
     API REST para integração de sistemas externos.
-    Retorna uma lista JSON dos últimos 10 processos públicos (anonimizados).
+    Retorna uma lista JSON de processos públicos (anonimizados), paginada por cursor.
+
+    Parâmetros GET:
+      - page_size: número de resultados por página (limitado a API_MAX_PAGE_SIZE)
+      - cursor: token devolvido em 'next_cursor' na resposta anterior
+
+    Cada pedido custa uma única query, independentemente da profundidade da página.
     """
-    processes = Process.objects.all().order_by('-submission_date')[:10]
-    data = []
-    for p in processes:
-        data.append({
-            'id': p.id,
-            'service': p.service_type.name,
-            'status': p.get_status_display(),
-            'date': p.submission_date.strftime('%Y-%m-%d')
-        })
-    return JsonResponse({'results': data, 'count': len(data)})
+    try:
+        page_size, rows = _api_page_query(request)
+    except InvalidCursor as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+
+    if page_size >= getattr(settings, 'API_STREAM_THRESHOLD', 200):
+        # Páginas grandes: envia o JSON aos bocados, sem montar tudo em memória
+        return StreamingHttpResponse(
+            _stream_process_page(request, rows.iterator(chunk_size=500), page_size),
+            content_type='application/json',
+        )
+
+    return JsonResponse(_page_payload(request, list(rows), page_size))
+
+def _api_page_query(request):
+    """
+    (page_size, queryset da página) a partir dos parâmetros GET.
+    Lança InvalidCursor se o cursor for inválido. Partilhado com website/async_views.py.
+    """
+    page_size = parse_page_size(
+        request.GET.get('page_size'),
+        default=getattr(settings, 'API_PAGE_SIZE', 10),
+        maximum=getattr(settings, 'API_MAX_PAGE_SIZE', 500),
+    )
+
+    cursor_token = request.GET.get('cursor')
+    cursor = decode_cursor(cursor_token) if cursor_token else None
+
+    # Só as colunas necessárias, com o nome do serviço via JOIN (sem N+1).
+    # Pedimos page_size + 1 linhas para saber se existe página seguinte.
+    rows = keyset_filter(Process.objects.all(), cursor).order_by('-submission_date', '-id').values_list(
+        'id', 'service_type__name', 'status', 'submission_date'
+    )[:page_size + 1]
+    return page_size, rows
+
+def _page_payload(request, rows, page_size):
+    """Resposta JSON (não-streaming) da API para as linhas já lidas."""
+    data = [_serialize_process_row(row) for row in rows[:page_size]]
+    next_cursor = _next_cursor(rows, page_size)
+    return {
+        'results': data,
+        'count': len(data),
+        'next_cursor': next_cursor,
+        'next': _next_url(request, next_cursor),
+    }
+
+# Mapa para traduzir os códigos de estado sem instanciar modelos
+_STATUS_LABELS = dict(Process.STATUS_CHOICES)
+
+def _serialize_process_row(row):
+    """Converte um tuplo (id, serviço, estado, data) no formato público da API."""
+    pk, service_name, status, submission_date = row
+    return {
+        'id': pk,
+        'service': service_name,
+        'status': _STATUS_LABELS.get(status, status),
+        'date': submission_date.strftime('%Y-%m-%d'),
+    }
+
+def _next_cursor(rows, page_size):
+    """Devolve o cursor da página seguinte, ou None se esta for a última."""
+    if len(rows) <= page_size:
+        return None
+    last = rows[page_size - 1]
+    return encode_cursor(last[3], last[0])
+
+def _next_url(request, next_cursor):
+    """URL absoluto para a página seguinte (mantém o page_size pedido)."""
+    if next_cursor is None:
+        return None
+    params = request.GET.copy()
+    params['cursor'] = next_cursor
+    return request.build_absolute_uri(f"{request.path}?{params.urlencode()}")
+
+def _stream_process_page(request, rows, page_size):
+    """
+    Gerador que escreve a resposta JSON linha a linha.
+    Produz o mesmo formato que a versão não-streaming da API.
+    """
+    yield '{"results": ['
+    count = 0
+    last = None
+    has_more = False
+    for row in rows:
+        if count == page_size:
+            has_more = True
+            break
+        yield (',' if count else '') + json.dumps(_serialize_process_row(row), ensure_ascii=False)
+        last = row
+        count += 1
+
+    next_cursor = encode_cursor(last[3], last[0]) if has_more else None
+    yield '], "count": %d, "next_cursor": %s, "next": %s}' % (
+        count, json.dumps(next_cursor), json.dumps(_next_url(request, next_cursor))
+    )
 
 # ==============================================================================
 # 2. ÁREA DO UTILIZADOR (CONTA E DASHBOARD)
@@ -72,33 +180,62 @@ def signup(request):
         form = CustomUserCreationForm()
     return render(request, 'registration/signup.html', {'form': form})
 
-@login_required
-def dashboard(request):
+def user_has_open_process(request):
     """
-    Painel Principal do Imigrante.
-    Mostra os processos, permite pesquisar e verificar se pode criar novos pedidos.
+    O utilizador tem um processo em aberto? (no máximo um: restrição
+    'one_open_process_per_user'). O resultado fica guardado no request,
+    por isso várias verificações no mesmo pedido custam uma só query.
     """
-    # 1. Buscar processos apenas do utilizador logado
-    processos = Process.objects.filter(user=request.user).order_by('-submission_date')
+    if not hasattr(request, '_has_open_process'):
+        request._has_open_process = (
+            Process.objects.filter(user=request.user).exclude(status__in=Process.CLOSED_STATUSES).exists()
+        )
+    return request._has_open_process
+
+def _dashboard_paginator(request, user):
+    """Paginador dos processos do dashboard (partilhado com website/async_views.py)."""
+    # REGRA DE NEGÓCIO: Só pode criar novo se não tiver pendências ativas
+    # (Consideramos pendência tudo o que não seja 'Rejeitado' ou 'Aprovado')
+    # Assim evita-se spam de pedidos
+    processos_abertos = Process.objects.filter(user=user).exclude(status__in=Process.CLOSED_STATUSES)
+
+    # 1. Buscar processos apenas do utilizador logado, já com serviço e agendamento (JOIN)
+    #    A regra acima vem na mesma query, como subquery EXISTS em cada linha
+    processos = (
+        Process.objects.filter(user=user)
+        .select_related('service_type', 'appointment')
+        .annotate(user_has_open=Exists(processos_abertos))
+        .order_by('-submission_date')
+    )
     
     # 2. Lógica da Pesquisa (Search Bar)
     query = request.GET.get('q')
     if query:
-        # Pesquisa por Nome do Serviço OU por ID do processo
-        processos = processos.filter(
-            Q(service_type__name__icontains=query) | 
-            Q(id__icontains=query)
-        )
+        # Pesquisa pela referência (PT/AAAA/NNNN) OU pelo nome do serviço, via índice de texto
+        processos = search_processes(processos, query)
 
     # 3. Paginação (5 itens por página)
-    paginator = Paginator(processos, 5)
+    # Por omissão usa "anterior/seguinte" sem COUNT(*); o Paginator clássico continua disponível
+    if getattr(settings, 'DASHBOARD_COUNT_FREE_PAGINATION', True):
+        return CountFreePaginator(processos, 5)
+    return Paginator(processos, 5)
+
+@login_required
+def dashboard(request):
+    """
+    Painel Principal do Imigrante.
+    Mostra os processos, permite pesquisar e verificar se pode criar novos pedidos.
+    """
+    # 1-3. Processos do utilizador (com pesquisa) e paginação
+    paginator = _dashboard_paginator(request, request.user)
     page = request.GET.get('page')
     processos_paginados = paginator.get_page(page)
 
-    # 4. REGRA DE NEGÓCIO: Só pode criar novo se não tiver pendências ativas
-    # (Consideramos pendência tudo o que não seja 'Rejeitado' ou 'Aprovado')
-    # Assim evita-se spam de pedidos
-    pode_criar_novo = not Process.objects.filter(user=request.user).exclude(status__in=['rejected', 'approved']).exists()
+    # 4. Se a página tiver linhas, a regra já veio com elas (fica guardada no request);
+    #    senão pergunta à BD
+    if len(processos_paginados):
+        request._has_open_process = processos_paginados[0].user_has_open
+    pode_criar_novo = not user_has_open_process(request)
 
     context = {
         'processos': processos_paginados,
@@ -142,10 +279,9 @@ def create_process(request):
     """
     Inicia um novo pedido.
     """
-    # Verifica novamente se já tem processos pendentes (segurança extra backend)
-    tem_pendencia = Process.objects.filter(user=request.user).exclude(status__in=['rejected', 'approved']).exists()
-    
-    if tem_pendencia:
+    # A regra "um processo em aberto de cada vez" é garantida pela BD
+    # (restrição 'one_open_process_per_user'); aqui só se evita mostrar o formulário
+    if request.method != 'POST' and user_has_open_process(request):
         messages.warning(request, '⚠️ Já tens um processo em aberto. Finaliza-o antes de criar outro.')
         return redirect('dashboard')
 
@@ -155,7 +291,13 @@ def create_process(request):
             process = form.save(commit=False)
             process.user = request.user
             process.status = 'draft' # Força estado inicial
-            process.save()
+            try:
+                with transaction.atomic():
+                    process.save()
+            except IntegrityError:
+                # Já existe um processo em aberto (ex: dois cliques seguidos em "Criar")
+                messages.warning(request, '⚠️ Já tens um processo em aberto. Finaliza-o antes de criar outro.')
+                return redirect('dashboard')
             
             messages.success(request, 'Pedido iniciado! Agora carrega os documentos necessários.')
             return redirect('process_detail', process_id=process.id)
@@ -169,43 +311,45 @@ def process_detail(request, process_id):
     """
     Página principal do processo.
     """
-    # Busca o processo
-    process = get_object_or_404(Process, id=process_id)
+    # Busca o processo já com o tipo de serviço e o agendamento (JOIN, sem queries extra no template)
+    process = get_object_or_404(
+        Process.objects.select_related('service_type', 'appointment'),
+        id=process_id
+    )
     
     # 🔒 MEDIDA DE SEGURANÇA (IDOR): Garante que o processo é do utilizador logado OU que é um membro Staff (AIMA)
-    if process.user != request.user and not request.user.is_staff:
+    # (Compara pelo id para não carregar o utilizador dono do processo)
+    if process.user_id != request.user.id and not request.user.is_staff:
         raise PermissionDenied("Acesso Negado: Não tem permissão para visualizar este processo.")
     
-    # 1. Quais documentos este tipo de visto exige?
-    required_docs = RequiredDoc.objects.filter(service_type=process.service_type)
-    
-    # 2. Montar a lista inteligente (Status + Ficheiro se existir)
-    documents_status = []
-    
-    for doc_type in required_docs:
-        # Tenta encontrar o ficheiro já enviado para este requisito
-        attachment = Attachment.objects.filter(process=process, required_doc=doc_type).first()
-        
-        documents_status.append({
-            'doc_type': doc_type, 
-            'attachment': attachment
-        })
+    # Lista inteligente (Requisito + Ficheiro se existir) e resumo dos obrigatórios
+    documents_status, docs_summary = process.document_checklist()
 
     context = {
         'process': process,
         'documents_status': documents_status,
+        'docs_summary': docs_summary,
     }
     return render(request, 'process_detail.html', context)
 
+@csrf_exempt
 @login_required
 def upload_document(request, process_id):
     """
     Upload de ficheiros para o processo.
+    O ficheiro é validado em streaming (tamanho, tipo real, SHA-256) pelo
+    ValidatingUploadHandler, que tem de ser instalado antes de o CSRF ler o POST.
     """
+    upload_handler = ValidatingUploadHandler(request)
+    request.upload_handlers.insert(0, upload_handler)
+    return _upload_document(request, process_id, upload_handler)
+
+@csrf_protect
+def _upload_document(request, process_id, upload_handler):
     process = get_object_or_404(Process, id=process_id)
     
     # 🔒 MEDIDA DE SEGURANÇA (IDOR)
-    if process.user != request.user and not request.user.is_staff:
+    if process.user_id != request.user.id and not request.user.is_staff:
         raise PermissionDenied("Acesso Negado: Não tem permissão para alterar este processo.")
     
     if process.status != 'draft':
@@ -216,20 +360,40 @@ def upload_document(request, process_id):
         doc_type_id = request.POST.get('doc_type_id')
         file = request.FILES.get('file')
 
-        if doc_type_id and file:
-            doc_type = get_object_or_404(RequiredDoc, id=doc_type_id)
+        if upload_handler.error:
+            # 🔒 Recusado durante a receção (demasiado grande ou tipo falso)
+            UPLOAD_REJECTIONS.inc(reason=upload_handler.error_reason or 'invalid')
+            messages.error(request, upload_handler.error)
+        elif doc_type_id and file:
+            # Requisito pelo catálogo em memória; tem de ser do serviço deste processo
+            doc_type = get_requirement(int(doc_type_id)) if doc_type_id.isdigit() else None
+            if doc_type is None or doc_type.service_type_id != process.service_type_id:
+                raise Http404("Documento não encontrado.")
+            digest = upload_handler.results.get('file', {}).get('sha256', '')
+            if digest:
+                file.sha256 = digest  # Vai para Attachment.sha256 e para o nome no storage, sem reler o ficheiro
             
-            # Remove ficheiro antigo se existir (para poupar espaço)
-            Attachment.objects.filter(process=process, required_doc=doc_type).delete()
-            
-            # Cria o novo registo
-            Attachment.objects.create(
-                process=process,
-                required_doc=doc_type,
-                file=file
-            )
-            messages.success(request, 'Documento carregado com sucesso!')
+            try:
+                # Troca atómica: a BD só aceita um anexo por requisito
+                with transaction.atomic():
+                    # Remove ficheiro antigo se existir (para poupar espaço)
+                    Attachment.objects.filter(process=process, required_doc_id=doc_type.id).delete()
+                    
+                    # Cria o novo registo
+                    Attachment.objects.create(
+                        process=process,
+                        required_doc_id=doc_type.id,
+                        file=file,
+                    )
+            except IntegrityError:
+                # Outro envio simultâneo para o mesmo requisito ganhou a corrida
+                UPLOAD_REJECTIONS.inc(reason='conflict')
+                messages.error(request, 'Este documento acabou de ser carregado noutro pedido. Tenta novamente.')
+            else:
+                UPLOAD_BYTES.inc(file.size)
+                messages.success(request, 'Documento carregado com sucesso!')
         else:
+            UPLOAD_REJECTIONS.inc(reason='missing')
             messages.error(request, 'Erro ao carregar documento.')
             
     return redirect('process_detail', process_id=process_id)
@@ -239,10 +403,10 @@ def delete_document(request, doc_id):
     """
     Remove um documento específico.
     """
-    attachment = get_object_or_404(Attachment, id=doc_id)
+    attachment = get_object_or_404(Attachment.objects.select_related('process'), id=doc_id)
     
     # 🔒 SEGURANÇA (IDOR): Garante que o documento pertence ao utilizador logado ou a um Staff
-    if attachment.process.user != request.user and not request.user.is_staff:
+    if attachment.process.user_id != request.user.id and not request.user.is_staff:
         raise PermissionDenied("Acesso Negado: Não tem permissão para remover este documento.")
 
     if attachment.process.status == 'draft':
@@ -254,6 +418,35 @@ def delete_document(request, doc_id):
         messages.error(request, 'Não pode remover documentos de um processo submetido.')
         return redirect('dashboard')
 
+@login_required
+def document_preview(request, doc_id):
+    """
+    Imagem pequena do documento (website/previews.py), para ver de relance
+    sem descarregar o original. Se ainda não existir, pede-a e devolve 404.
+    """
+    attachment = get_object_or_404(Attachment.objects.select_related('process'), id=doc_id)
+
+    # 🔒 SEGURANÇA (IDOR): Só o dono do processo ou um Staff
+    if attachment.process.user_id != request.user.id and not request.user.is_staff:
+        raise PermissionDenied("Acesso Negado: Não tem permissão para ver este documento.")
+
+    storage = attachment.file.storage
+    name = preview_name(attachment.file.name)
+    if not storage.exists(name):
+        enqueue_preview(attachment.file.name, storage)
+        raise Http404("Pré-visualização ainda não disponível.")
+
+    # O original é guardado por conteúdo, por isso o nome identifica a versão
+    etag = f'"{os.path.basename(name)}"'
+    not_modified = get_conditional_response(request, etag=etag)
+    if not_modified is not None:
+        return not_modified
+
+    response = FileResponse(storage.open(name, 'rb'), content_type=preview_content_type(name))
+    response['ETag'] = etag
+    response['Cache-Control'] = f"private, max-age={getattr(settings, 'PREVIEW_CACHE_MAX_AGE', 604800)}"
+    return response
+
 @login_required
 def submit_process_final(request, process_id):
     """
@@ -262,15 +455,14 @@ def submit_process_final(request, process_id):
     process = get_object_or_404(Process, id=process_id)
     
     # 🔒 MEDIDA DE SEGURANÇA (IDOR)
-    if process.user != request.user and not request.user.is_staff:
+    if process.user_id != request.user.id and not request.user.is_staff:
         raise PermissionDenied("Acesso Negado: Não tem permissão para submeter este processo.")
     
     if process.status == 'draft':
         # Validação: Verifica se TODOS os documentos obrigatórios foram enviados
-        required_count = RequiredDoc.objects.filter(service_type=process.service_type, is_mandatory=True).count()
-        uploaded_count = Attachment.objects.filter(process=process, required_doc__is_mandatory=True).count()
+        _, docs_summary = process.document_checklist()
 
-        if uploaded_count < required_count:
+        if not docs_summary['complete']:
             messages.error(request, 'Faltam documentos obrigatórios! Por favor carregue todos antes de submeter.')
             return redirect('process_detail', process_id=process.id)
 
@@ -289,7 +481,7 @@ def cancel_process(request, process_id):
     process = get_object_or_404(Process, id=process_id)
     
     # 🔒 MEDIDA DE SEGURANÇA (IDOR)
-    if process.user != request.user and not request.user.is_staff:
+    if process.user_id != request.user.id and not request.user.is_staff:
         raise PermissionDenied("Acesso Negado: Não tem permissão para cancelar este processo.")
     
     if process.status == 'draft':
@@ -312,7 +504,7 @@ def generate_appointment(request, process_id):
     process = get_object_or_404(Process, id=process_id)
     
     # 🔒 MEDIDA DE SEGURANÇA (IDOR)
-    if process.user != request.user and not request.user.is_staff:
+    if process.user_id != request.user.id and not request.user.is_staff:
         raise PermissionDenied("Acesso Negado: Não tem permissão para efetuar este agendamento.")
     
     if process.status != 'approved':
@@ -324,18 +516,21 @@ def generate_appointment(request, process_id):
         messages.warning(request, 'Já tens um agendamento para este processo.')
         return redirect('dashboard')
 
-    # Lógica de Agendamento (Simulação)
-    nova_senha = f"AIMA-{random.randint(1000, 9999)}"
-    data_estimada = timezone.now() + timezone.timedelta(days=random.randint(10, 30))
+    # Reserva a vaga livre mais cedo (com limite de capacidade por local/dia/hora)
+    try:
+        appointment = book_appointment(process)
+    except NoSlotsAvailable as exc:
+        messages.error(request, str(exc))
+        return redirect('dashboard')
+    except IntegrityError:
+        # Pedido duplicado em simultâneo: o outro já criou o agendamento (e a vaga foi libertada)
+        messages.warning(request, 'Já tens um agendamento para este processo.')
+        return redirect('dashboard')
 
-    Appointment.objects.create(
-        process=process,
-        appointment_date=data_estimada,
-        ticket_number=nova_senha,
-        location="Loja AIMA Lisboa - Campus de Justiça"
-    )
+    # Pré-gera o PDF da senha em segundo plano (pool de processos)
+    transaction.on_commit(lambda: enqueue_ticket_renders([appointment.id]))
     
-    messages.success(request, f'Agendamento confirmado! Senha: {nova_senha}.')
+    messages.success(request, f'Agendamento confirmado! Senha: {appointment.ticket_number}.')
     return redirect('dashboard')
 
 @login_required
@@ -343,26 +538,34 @@ def generate_pdf(request, appointment_id):
     """
     Gera um ficheiro PDF oficial com os dados do agendamento.
     """
-    appointment = get_object_or_404(Appointment, id=appointment_id)
+    # Tudo o que o PDF mostra vem numa só query (processo, utilizador, perfil e serviço)
+    appointment = get_object_or_404(
+        Appointment.objects.select_related('process__user__profile', 'process__service_type'),
+        id=appointment_id
+    )
     
     # 🔒 MEDIDA DE SEGURANÇA (IDOR): Verifica no processo associado ao agendamento
-    if appointment.process.user != request.user and not request.user.is_staff:
+    if appointment.process.user_id != request.user.id and not request.user.is_staff:
          raise PermissionDenied("Acesso Negado: Esta senha não lhe pertence.")
     
-    template_path = 'ticket_pdf.html'
-    context = {'appointment': appointment}
-    
-    response = HttpResponse(content_type='application/pdf')
+    # O PDF vem da cache em disco; só é gerado (pisa) se ainda não existir
+    try:
+        pdf, etag = get_ticket_pdf(appointment)
+    except TicketPending:
+        messages.info(request, 'A tua senha em PDF está a ser gerada. Tenta novamente dentro de alguns segundos.')
+        return redirect('dashboard')
+    if pdf is None:
+        return HttpResponse('Erro ao gerar PDF.', status=500)
+
+    etag = f'"{etag}"'
+    not_modified = get_conditional_response(request, etag=etag)
+    if not_modified is not None:
+        return not_modified
+
+    response = HttpResponse(pdf, content_type='application/pdf')
     response['Content-Disposition'] = f'attachment; filename="Senha_{appointment.ticket_number}.pdf"'
-    
-    template = get_template(template_path)
-    html = template.render(context)
-    
-    pisa_status = pisa.CreatePDF(html, dest=response)
-    
-    if pisa_status.err:
-        return HttpResponse('Erro ao gerar PDF: ' + html)
-        
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
     return response
 
 # ==============================================================================
@@ -379,26 +582,92 @@ def manager_dashboard(request):
     """
     Dashboard exclusivo para gestores (Staff).
     """
-    total_processos = Process.objects.count()
+    # Lê os contadores mantidos em website/counters.py (sem varrer a tabela de processos)
+    return render(request, 'manager_dashboard.html', _manager_context(status_totals()))
+
+def _manager_context(totals):
+    """Contexto do painel de gestão a partir de {estado: total}."""
+    total_processos = sum(totals.values())
     
     labels = []
     data = []
     
-    # Agrupa processos por estado para o gráfico
-    queryset = Process.objects.values('status').annotate(total=Count('status'))
-    
     # Mapa para traduzir códigos para texto legível
     status_map = dict(Process.STATUS_CHOICES)
     
-    for entry in queryset:
-        status_code = entry['status']
+    for status_code, total in totals.items():
         status_name = status_map.get(status_code, status_code) # Tenta traduzir
         
         labels.append(status_name)
-        data.append(entry['total'])
+        data.append(total)
     
-    return render(request, 'manager_dashboard.html', {
+    return {
         'labels': labels, 
         'data': data,
         'total_processos': total_processos
-    })
\ No newline at end of file
+    }
+
+
+@login_required
+@user_passes_test(is_manager)
+def manager_analytics(request):
+    """
+    Séries diárias (criados/aprovados/rejeitados por serviço) e tempo até à
+    decisão, em JSON para os gráficos do painel de gestão.
+    Parâmetros: ?days=N (últimos N dias) e ?service=<id> (opcional).
+    """
+    days = parse_page_size(
+        request.GET.get('days'),
+        getattr(settings, 'ANALYTICS_DEFAULT_DAYS', 30),
+        getattr(settings, 'ANALYTICS_MAX_DAYS', 365),
+    )
+    service_id = request.GET.get('service') or None
+    if service_id is not None:
+        if not service_id.isdigit():
+            return JsonResponse({'error': 'Serviço inválido.'}, status=400)
+        service_id = int(service_id)
+    return JsonResponse(build_report(days, service_id))
+
+
+@login_required
+@user_passes_test(is_manager)
+def manager_export(request):
+    """
+    Exportação de processos em CSV ou JSONL (?format=csv|jsonl), em streaming.
+    Filtros opcionais: ?status=submitted,review &service=<id> &from=AAAA-MM-DD &to=AAAA-MM-DD
+    """
+    fmt = request.GET.get('format', 'csv')
+    if fmt not in FORMATS:
+        return JsonResponse({'error': 'Formato inválido (use csv ou jsonl).'}, status=400)
+    try:
+        queryset = export_queryset(
+            status=request.GET.get('status'),
+            service=request.GET.get('service'),
+            date_from=request.GET.get('from'),
+            date_to=request.GET.get('to'),
+        )
+    except InvalidExportFilter as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+
+    response = StreamingHttpResponse(stream_export(queryset, fmt), content_type=FORMATS[fmt])
+    filename = f"processos_{timezone.localdate():%Y%m%d}.{fmt}"
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+
+# ==============================================================================
+# 6. MONITORIZAÇÃO (MÉTRICAS PROMETHEUS)
+# ==============================================================================
+
+def metrics(request):
+    """
+    Métricas no formato de texto do Prometheus (website/metrics.py).
+    Acesso: staff com sessão iniciada, ou o cabeçalho "Authorization: Bearer <METRICS_TOKEN>".
+    """
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    authorization = request.headers.get('Authorization', '')
+    has_token = bool(token) and hmac.compare_digest(authorization.encode(), f'Bearer {token}'.encode())
+    if not has_token and not request.user.is_staff:
+        raise PermissionDenied("Acesso Negado: métricas só para a equipa.")
+    return HttpResponse(REGISTRY.exposition(), content_type='text/plain; version=0.0.4; charset=utf-8')